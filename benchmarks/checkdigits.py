@@ -0,0 +1,49 @@
+"""Time per call of the check digit classes.
+
+Usage:
+
+    python benchmarks/checkdigits.py --number 100000
+
+Does not need a database. The batch timings use NumPy if
+installed.
+"""
+import argparse
+import random
+import string
+import sys
+
+from utils import BASE_DIR, report, time_calls
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--number', type=int, default=100000)
+    parser.add_argument('--length', type=int, default=12)
+    options = parser.parse_args()
+    if BASE_DIR not in sys.path:
+        sys.path.insert(0, BASE_DIR)
+    from edc_identifier.checkdigit_mixins import DammAlphaMixin, DammMixin
+    from edc_identifier.checkdigit_mixins import LuhnMixin, LuhnOrdMixin, VerhoeffMixin
+
+    for label, mixin, alphabet in [
+            ('LuhnMixin', LuhnMixin(), string.digits),
+            ('LuhnOrdMixin', LuhnOrdMixin(), string.ascii_uppercase + string.digits),
+            ('DammMixin', DammMixin(), string.digits),
+            ('DammAlphaMixin', DammAlphaMixin(), string.ascii_uppercase + string.digits),
+            ('VerhoeffMixin', VerhoeffMixin(), string.digits)]:
+        identifiers = [''.join(random.choice(alphabet) for _ in range(0, options.length))
+                       for _ in range(0, 1000)]
+        funcs = [('', mixin.calculate_checkdigit)]
+        if hasattr(mixin, '_calculate_checkdigit'):
+            funcs.append((' (without tables)', mixin._calculate_checkdigit))
+        for suffix, func in funcs:
+            iterator = iter(identifiers * (options.number // len(identifiers) + 1))
+            report(f'{label}{suffix}',
+                   time_calls(lambda: func(next(iterator)), options.number))
+        identifiers = identifiers * (options.number // len(identifiers))
+        report(f'{label} (batch of {len(identifiers)})',
+               time_calls(lambda: mixin.calculate_checkdigits(identifiers), 5))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,155 @@
+"""Throughput, latency, query counts and duplicate detection for the
+identifier classes allocated concurrently from threads and processes.
+
+Usage:
+
+    python benchmarks/concurrency.py --threads 8 --processes 4 --number 250
+    python benchmarks/concurrency.py --allocators subject,tracking
+
+Each of the M processes runs N threads and each thread allocates
+`number` identifiers. Use a server database (set
+DJANGO_SETTINGS_MODULE) for meaningful numbers; sqlite serialises
+writers.
+"""
+import argparse
+import multiprocessing
+import sys
+import time
+
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from utils import percentile, setup_django
+
+ALLOCATORS = ['subject', 'infant', 'short', 'simple_unique', 'tracking', 'identifier']
+
+
+def get_allocator(name):
+    """Returns a function that allocates one identifier and returns
+    it as a string, and a setup function run before timing each call.
+    """
+    from edc_identifier.identifier import Identifier
+    from edc_identifier.infant_identifier import InfantIdentifier
+    from edc_identifier.model_mixins import TrackingIdentifier
+    from edc_identifier.short_identifier import ShortIdentifier
+    from edc_identifier.simple_identifier import SimpleUniqueIdentifier
+    from edc_identifier.subject_identifier import SubjectIdentifier
+
+    def subject(context=None):
+        return SubjectIdentifier(
+            identifier_type='subject',
+            requesting_model='edc_identifier.enrollment').identifier
+
+    def infant(context=None):
+        return InfantIdentifier(
+            maternal_identifier=context,
+            requesting_model='edc_identifier.maternallabdel',
+            birth_order=1,
+            live_infants=1).identifier
+
+    allocators = {
+        'subject': (subject, None),
+        'infant': (infant, subject),
+        'short': (lambda context=None: ShortIdentifier(prefix='22').identifier, None),
+        'simple_unique': (lambda context=None: SimpleUniqueIdentifier().identifier, None),
+        'tracking': (lambda context=None: TrackingIdentifier(
+            identifier_type='benchmark.tracking').identifier, None),
+        'identifier': (lambda context=None: Identifier().identifier, None),
+    }
+    return allocators[name]
+
+
+def run_thread(name, number):
+    """Allocates `number` identifiers and returns a list of
+    (identifier, seconds, queries, error).
+    """
+    from django.db import connection
+
+    allocate, setup = get_allocator(name)
+    queries = []
+
+    def count_queries(execute, sql, params, many, context):
+        queries.append(sql)
+        return execute(sql, params, many, context)
+
+    results = []
+    try:
+        for _ in range(0, number):
+            context = setup() if setup else None
+            queries.clear()
+            start = time.perf_counter()
+            try:
+                with connection.execute_wrapper(count_queries):
+                    identifier = allocate(context)
+            except Exception as e:
+                results.append((None, time.perf_counter() - start, len(queries),
+                                e.__class__.__name__))
+            else:
+                results.append((identifier, time.perf_counter() - start,
+                                len(queries), None))
+    finally:
+        connection.close()
+    return results
+
+
+def run_process(name, number, threads, migrate=None):
+    """Runs `threads` threads in this process and returns their
+    combined results.
+    """
+    if migrate is not None:
+        setup_django(migrate=migrate)
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        futures = [executor.submit(run_thread, name, number)
+                   for _ in range(0, threads)]
+        return [result for future in futures for result in future.result()]
+
+
+def report(name, results, elapsed):
+    identifiers = Counter(r[0] for r in results if r[0])
+    duplicates = {k: v for k, v in identifiers.items() if v > 1}
+    errors = Counter(r[3] for r in results if r[3])
+    timings = [r[1] for r in results if not r[3]]
+    queries = [r[2] for r in results if not r[3]]
+    allocated = len(timings)
+    sys.stdout.write(
+        f'{name:<14} allocated={allocated:<7} '
+        f'throughput={allocated / elapsed:9.1f}/s '
+        f'p50={percentile(timings, 50) * 1000:8.3f}ms '
+        f'p95={percentile(timings, 95) * 1000:8.3f}ms '
+        f'p99={percentile(timings, 99) * 1000:8.3f}ms '
+        f'queries={sum(queries) / (allocated or 1):5.1f} '
+        f'duplicates={len(duplicates)} errors={dict(errors)}\n')
+    return duplicates
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--allocators', default=','.join(ALLOCATORS))
+    parser.add_argument('--threads', type=int, default=4)
+    parser.add_argument('--processes', type=int, default=1)
+    parser.add_argument('--number', type=int, default=100,
+                        help='allocations per thread')
+    options = parser.parse_args()
+    setup_django()
+    from django.db import connection
+    connection.close()
+    failed = False
+    for name in options.allocators.split(','):
+        start = time.perf_counter()
+        if options.processes > 1:
+            context = multiprocessing.get_context('spawn')
+            with context.Pool(options.processes) as pool:
+                results = [
+                    result for results in pool.starmap(
+                        run_process,
+                        [(name, options.number, options.threads, False)] * options.processes)
+                    for result in results]
+        else:
+            results = run_process(name, options.number, options.threads)
+        if report(name, results, time.perf_counter() - start):
+            failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
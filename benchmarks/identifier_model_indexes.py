@@ -0,0 +1,95 @@
+"""Latency of the IdentifierModel queries used by the allocators
+with and without the composite indexes of migration 0021.
+
+The ShortIdentifier existence query filters on the unique
+`identifier` column and so is covered by its unique index either way.
+
+Usage:
+
+    python benchmarks/identifier_model_indexes.py --rows 1000000
+
+The table is filled once and reused by later runs.
+"""
+import argparse
+import random
+
+from utils import report, setup_django, time_calls
+
+NAMES = ['subjectidentifier', 'infantidentifier', 'shortidentifier', 'identifier']
+DEVICE_IDS = 20
+
+
+def populate(rows, batch_size=10000):
+    from django.contrib.sites.models import Site
+    from edc_identifier.models import IdentifierModel
+
+    site = Site.objects.get_current()
+    start = IdentifierModel.objects.filter(identifier__startswith='BM').count()
+    for offset in range(start, rows, batch_size):
+        IdentifierModel.objects.bulk_create([
+            IdentifierModel(
+                name=NAMES[n % len(NAMES)],
+                identifier_type=NAMES[n % len(NAMES)],
+                identifier=f'BM{n:010d}',
+                sequence_number=n,
+                device_id=n % DEVICE_IDS,
+                site=site)
+            for n in range(offset, min(offset + batch_size, rows))])
+
+
+def set_indexes(enabled):
+    from django.db import connection
+    from edc_identifier.models import IdentifierModel
+
+    with connection.schema_editor() as editor:
+        for index in IdentifierModel._meta.indexes:
+            if enabled:
+                editor.add_index(IdentifierModel, index)
+            else:
+                editor.remove_index(IdentifierModel, index)
+
+
+def run(rows, number):
+    from django.contrib.sites.models import Site
+    from edc_identifier.models import IdentifierModel
+
+    site = Site.objects.get_current()
+
+    def research_identifier():
+        IdentifierModel.objects.filter(
+            name='subjectidentifier',
+            device_id=random.randrange(DEVICE_IDS),
+            site=site).order_by('-sequence_number').first()
+
+    def last_identifier():
+        IdentifierModel.objects.filter(
+            identifier_type=random.choice(NAMES)).last()
+
+    def short_identifier():
+        IdentifierModel.objects.filter(
+            identifier=f'BM{random.randrange(rows * 2):010d}',
+            identifier_type='shortidentifier').exists()
+
+    for label, func in [('ResearchIdentifier sequence', research_identifier),
+                        ('Identifier.last_identifier', last_identifier),
+                        ('ShortIdentifier existence', short_identifier)]:
+        report(label, time_calls(func, number))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=1000000)
+    parser.add_argument('--number', type=int, default=200)
+    options = parser.parse_args()
+    setup_django()
+    populate(options.rows)
+    set_indexes(False)
+    print(f'Without composite indexes ({options.rows} rows)')
+    run(options.rows, options.number)
+    set_indexes(True)
+    print(f'With composite indexes ({options.rows} rows)')
+    run(options.rows, options.number)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,43 @@
+"""Time per call of `random.choice` per character and of
+RandomStringGenerator, for one string and for a batch of strings.
+
+Usage:
+
+    python benchmarks/random_strings.py --number 100000 --length 5
+
+Does not need a database.
+"""
+import argparse
+import random
+import sys
+
+from utils import BASE_DIR, report, time_calls
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--number', type=int, default=100000)
+    parser.add_argument('--length', type=int, default=5)
+    parser.add_argument('--batch-size', type=int, default=1000)
+    options = parser.parse_args()
+    if BASE_DIR not in sys.path:
+        sys.path.insert(0, BASE_DIR)
+    from edc_identifier.random_string import ALPHABET, RandomStringGenerator
+
+    length = options.length
+    generator = RandomStringGenerator(ALPHABET)
+    seeded = RandomStringGenerator(ALPHABET, seed=1)
+    report('random.choice', time_calls(
+        lambda: ''.join([random.choice(ALPHABET) for _ in range(0, length)]),
+        number=options.number))
+    report('RandomStringGenerator', time_calls(
+        lambda: generator.get_random_string(length), number=options.number))
+    report('RandomStringGenerator (seeded)', time_calls(
+        lambda: seeded.get_random_string(length), number=options.number))
+    batches = max(1, options.number // options.batch_size)
+    report(f'RandomStringGenerator ({options.batch_size} per call)', time_calls(
+        lambda: generator.get_random_strings(length, options.batch_size), number=batches))
+
+
+if __name__ == '__main__':
+    main()
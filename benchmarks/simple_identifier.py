@@ -0,0 +1,34 @@
+"""Time per identifier of the Python work of TrackingIdentifier and
+SimpleUniqueIdentifier, excluding the database: instantiate, draw a
+new identifier and build the model options.
+
+Usage:
+
+    python benchmarks/simple_identifier.py --number 100000
+"""
+import argparse
+
+from utils import report, setup_django, time_calls
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--number', type=int, default=100000)
+    options = parser.parse_args()
+    setup_django(migrate=False)
+    from edc_identifier.model_mixins import TrackingIdentifier
+    from edc_identifier.simple_identifier import SimpleUniqueIdentifier
+
+    for cls in [TrackingIdentifier, SimpleUniqueIdentifier]:
+
+        def allocate():
+            obj = cls(identifier_type='benchmark', lazy=True)
+            identifier = obj._get_new_identifier()
+            obj.model_cls(**obj.get_identifier_model_options(identifier))
+
+        report(f'{cls.__name__} (without database)', time_calls(
+            allocate, number=options.number))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,63 @@
+"""Helpers shared by the benchmark scripts.
+
+The scripts use the project settings (edc_identifier.settings) unless
+DJANGO_SETTINGS_MODULE is set. With the default sqlite settings the
+database file is taken from EDC_IDENTIFIER_BENCHMARK_DB.
+"""
+import os
+import sys
+import time
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def setup_django(migrate=True):
+    """Configures Django for a benchmark run and migrates the
+    benchmark database.
+    """
+    if BASE_DIR not in sys.path:
+        sys.path.insert(0, BASE_DIR)
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'edc_identifier.settings')
+    import django
+    from django.conf import settings
+    database = settings.DATABASES['default']
+    if database['ENGINE'] == 'django.db.backends.sqlite3':
+        database['NAME'] = os.environ.get(
+            'EDC_IDENTIFIER_BENCHMARK_DB',
+            os.path.join(BASE_DIR, 'benchmark.sqlite3'))
+    django.setup()
+    if migrate:
+        from django.core.management import call_command
+        call_command('migrate', verbosity=0)
+
+
+def percentile(timings, pct):
+    """Returns the pct percentile of a list of timings.
+    """
+    if not timings:
+        return 0.0
+    timings = sorted(timings)
+    index = min(len(timings) - 1, int(round(pct / 100 * (len(timings) - 1))))
+    return timings[index]
+
+
+def time_calls(func, number=None):
+    """Returns a list of the duration, in seconds, of `number`
+    calls to func.
+    """
+    timings = []
+    for _ in range(0, number or 100):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def report(label, timings):
+    """Writes a one line summary of timings in milliseconds.
+    """
+    sys.stdout.write(
+        f'{label:<45} n={len(timings):<7} '
+        f'p50={percentile(timings, 50) * 1000:8.3f}ms '
+        f'p95={percentile(timings, 95) * 1000:8.3f}ms '
+        f'p99={percentile(timings, 99) * 1000:8.3f}ms\n')
@@ -3,7 +3,8 @@ from edc_base.constants import DEFAULT_BASE_FIELDS
 from edc_model_admin import audit_fieldset_tuple
 
 from .admin_site import edc_identifier_admin
-from .models import IdentifierModel
+from .models import IdentifierModel, IdentifierSequence, IdentifierSequenceGap
+from .models import IdentifierSequenceRange, ShortIdentifierPool, ShortIdentifierSequence
 
 
 @admin.register(IdentifierModel, site=edc_identifier_admin)
@@ -47,3 +48,94 @@ class IdentifierModelAdmin(admin.ModelAdmin):
             'linked_identifier',
             'device_id',
             'identifier_prefix') + tuple(DEFAULT_BASE_FIELDS)
+
+
+@admin.register(IdentifierSequence, site=edc_identifier_admin)
+class IdentifierSequenceAdmin(admin.ModelAdmin):
+
+    fieldsets = (
+        [None, {
+            'fields': (
+                'label',
+                'site',
+                'device_id',
+                'sequence_number')}],
+        audit_fieldset_tuple,
+    )
+
+    list_display = (
+        'label', 'site', 'device_id', 'sequence_number', 'modified')
+    list_filter = ('label', 'site', 'device_id')
+    search_fields = ('label', )
+
+    def get_readonly_fields(self, request, obj=None):
+        return (
+            'label',
+            'site',
+            'device_id',
+            'sequence_number') + tuple(DEFAULT_BASE_FIELDS)
+
+
+@admin.register(IdentifierSequenceGap, site=edc_identifier_admin)
+class IdentifierSequenceGapAdmin(admin.ModelAdmin):
+
+    list_display = (
+        'label', 'site', 'device_id', 'first_sequence_number',
+        'last_sequence_number', 'created', 'hostname_created')
+    list_filter = ('label', 'site', 'device_id', 'created')
+    search_fields = ('label', )
+
+    def get_readonly_fields(self, request, obj=None):
+        return (
+            'label',
+            'site',
+            'device_id',
+            'first_sequence_number',
+            'last_sequence_number') + tuple(DEFAULT_BASE_FIELDS)
+
+
+@admin.register(IdentifierSequenceRange, site=edc_identifier_admin)
+class IdentifierSequenceRangeAdmin(admin.ModelAdmin):
+
+    list_display = (
+        'label', 'site', 'device_id', 'first_sequence_number',
+        'last_sequence_number', 'next_sequence_number', 'created')
+    list_filter = ('label', 'site', 'device_id', 'created')
+    search_fields = ('label', )
+
+    def get_readonly_fields(self, request, obj=None):
+        return (
+            'label',
+            'site',
+            'device_id',
+            'first_sequence_number',
+            'last_sequence_number',
+            'next_sequence_number') + tuple(DEFAULT_BASE_FIELDS)
+
+
+@admin.register(ShortIdentifierSequence, site=edc_identifier_admin)
+class ShortIdentifierSequenceAdmin(admin.ModelAdmin):
+
+    list_display = ('name', 'prefix', 'sequence_number', 'modified')
+    list_filter = ('name', 'prefix')
+    search_fields = ('name', )
+
+    def get_readonly_fields(self, request, obj=None):
+        return (
+            'name',
+            'prefix',
+            'sequence_number') + tuple(DEFAULT_BASE_FIELDS)
+
+
+@admin.register(ShortIdentifierPool, site=edc_identifier_admin)
+class ShortIdentifierPoolAdmin(admin.ModelAdmin):
+
+    list_display = ('identifier', 'name', 'prefix', 'created')
+    list_filter = ('name', 'prefix')
+    search_fields = ('identifier', 'name')
+
+    def get_readonly_fields(self, request, obj=None):
+        return (
+            'identifier',
+            'name',
+            'prefix') + tuple(DEFAULT_BASE_FIELDS)
@@ -10,6 +10,15 @@ class AppConfig(DjangoAppConfig):
     verbose_name = 'Edc Identifier'
     identifier_prefix = '999'  # e.g. 066 for BHP066
     identifier_modulus = 7
+    sequence_block_size = 10  # see BlockSequenceAllocator
+    sequence_range_low_watermark = 100  # see ReservedRangeSequenceAllocator
+    identifier_filter = False  # see IdentifierFilter
+    identifier_filter_capacity = 100000
+    identifier_filter_error_rate = 0.001
+    keyspace_escalation_threshold = None  # e.g. 0.5, see get_random_string_length
+    keyspace_max_random_string_length = None
+    snowflake_lock_dir = None  # default: tempfile.gettempdir(), see Snowflake
+    snowflake_worker_id = None  # e.g. without fcntl, must be unique per process on the device
     messages_written = False
 
     def ready(self):
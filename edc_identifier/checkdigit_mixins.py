@@ -1,8 +1,219 @@
+from abc import ABC, abstractmethod
 
+try:
+    import numpy as np
+except ImportError:
+    np = None
 
-class LuhnMixin:
 
+class CheckdigitMixin(ABC):
+
+    """Base class for check digit classes.
+
+    A subclass implements `calculate_checkdigit`.
+    """
+
+    @abstractmethod
     def calculate_checkdigit(self, identifier):
+        """Returns the check digit of identifier as a string.
+
+        Raises ValueError if identifier is not valid input.
+        """
+
+    def calculate_checkdigits(self, identifiers):
+        """Returns a list of the check digits of identifiers.
+
+        Identifiers not calculated by `_calculate_groups` are
+        calculated one at a time.
+        """
+        return self._calculate_checkdigits(identifiers, strict=True)
+
+    def verify_checkdigits(self, identifiers):
+        """Returns a list of True/False for identifiers where the last
+        character of each is its check digit.
+
+        Identifiers that are empty or not valid input are False.
+        """
+        identifiers = [str(identifier) for identifier in identifiers]
+        checkdigits = self._calculate_checkdigits(
+            [identifier[:-1] for identifier in identifiers], strict=False)
+        return [bool(identifier) and checkdigit is not None and checkdigit == identifier[-1]
+                for identifier, checkdigit in zip(identifiers, checkdigits)]
+
+    def _calculate_checkdigits(self, identifiers, strict=None):
+        identifiers = [str(identifier) for identifier in identifiers]
+        checkdigits = [None] * len(identifiers)
+        self._calculate_groups(identifiers, checkdigits)
+        for index, checkdigit in enumerate(checkdigits):
+            if checkdigit is None:
+                try:
+                    checkdigits[index] = self.calculate_checkdigit(identifiers[index])
+                except ValueError:
+                    if strict:
+                        raise
+        return checkdigits
+
+    def _calculate_groups(self, identifiers, checkdigits):
+        """Updates checkdigits for identifiers that can be calculated
+        together, override.
+        """
+        pass
+
+
+class LuhnMixin(CheckdigitMixin):
+
+    """Calculates a Luhn check digit.
+
+    The identifier's ASCII bytes are read once, right to left, and
+    each byte's contribution to the checksum is looked up in tables
+    built from `_digits_of`, see `get_tables`. Input that is not
+    ASCII or not valid for `_digits_of` falls back to
+    `_calculate_checkdigit`.
+
+    For many identifiers at once use `calculate_checkdigits` and
+    `verify_checkdigits`.
+    """
+
+    batch_min_size = 32  # see _calculate_groups
+
+    def calculate_checkdigit(self, identifier):
+        tables = self.get_tables()
+        data = self._encode(identifier, tables)
+        if data is None:
+            return self._calculate_checkdigit(identifier)
+        plain, doubled, shifts, zero = tables[:4]
+        checksum = zero
+        parity = 1
+        for b in reversed(data):
+            if parity:
+                checksum += doubled[b]
+            else:
+                checksum += plain[b]
+            parity ^= shifts[b]
+        checksum %= 10
+        return str(checksum if checksum == 0 else 10 - checksum)
+
+    def _calculate_groups(self, identifiers, checkdigits):
+        """Updates checkdigits for groups of at least `batch_min_size`
+        ASCII identifiers of equal length.
+
+        If NumPy is installed, each group is packed into a uint8 matrix
+        and calculated column-wise, see `_calculate_matrix`.
+        """
+        if np is None or len(identifiers) < self.batch_min_size:
+            return
+        groups = {}
+        for index, identifier in enumerate(identifiers):
+            groups.setdefault(len(identifier), []).append(index)
+        for length, indexes in groups.items():
+            if length and len(indexes) >= self.batch_min_size:
+                try:
+                    data = ''.join(identifiers[index] for index in indexes).encode('ascii')
+                except UnicodeEncodeError:
+                    continue
+                for index, checkdigit in zip(indexes, self._calculate_matrix(data, length)):
+                    checkdigits[index] = checkdigit
+
+    def _calculate_matrix(self, data, length):
+        """Returns a list of check digits for bytes of identifiers of
+        equal length, None for those that must be calculated one at
+        a time.
+        """
+        plain, doubled, shifts, zero, invalid, strip = self.get_array_tables()
+        matrix = np.frombuffer(data, dtype=np.uint8).reshape(-1, length)
+        row_shifts = shifts[matrix]
+        if row_shifts.all():
+            parity = np.arange(length - 1, -1, -1) % 2 == 0
+            checksum = (doubled[matrix[:, parity]].sum(axis=1, dtype=np.int64)
+                        + plain[matrix[:, ~parity]].sum(axis=1, dtype=np.int64))
+        elif not row_shifts.any():
+            checksum = doubled[matrix].sum(axis=1, dtype=np.int64)
+        else:
+            after = np.cumsum(row_shifts[:, ::-1], axis=1)[:, ::-1] - row_shifts
+            checksum = np.where(after % 2 == 0, doubled[matrix], plain[matrix]).sum(
+                axis=1, dtype=np.int64)
+        checksum = (10 - (checksum + zero) % 10) % 10
+        skip = invalid[matrix].any(axis=1) | strip[matrix[:, 0]]
+        checkdigits = list((checksum + ord('0')).astype(np.uint8).tobytes().decode())
+        if skip.any():
+            for index in np.flatnonzero(skip).tolist():
+                checkdigits[index] = None
+        return checkdigits
+
+    @classmethod
+    def get_array_tables(cls):
+        """Returns, built once per class, `get_tables` as NumPy
+        arrays (plain, doubled, shifts, zero, invalid, strip) where
+        invalid and strip flag the bytes that are not accepted by
+        `_digits_of` and the leading zeros that change the checksum.
+        """
+        tables = cls.__dict__.get('_array_tables')
+        if tables is None:
+            plain, doubled, shifts, zero, invalid, zeros = cls.get_tables()
+            invalid = np.isin(np.arange(256), list(invalid))
+            strip = np.isin(np.arange(256), [b for b in zeros if plain[b] or doubled[b]])
+            tables = (
+                np.array([v or 0 for v in plain], dtype=np.uint8),
+                np.array([v or 0 for v in doubled], dtype=np.uint8),
+                np.array(shifts, dtype=np.uint8),
+                zero, invalid, strip)
+            cls._array_tables = tables
+        return tables
+
+    @classmethod
+    def get_tables(cls):
+        """Returns, built once per class, a tuple of
+        (plain, doubled, shifts, zero, invalid, zeros) where:
+
+            * plain and doubled are, for each byte, its contribution
+              modulo 10 to the checksum when its last digit is not
+              doubled or doubled, or None if not accepted by
+              `_digits_of`;
+            * shifts is, for each byte, 1 if it expands to an odd
+              number of digits otherwise 0;
+            * zero is the contribution of the trailing 0 of the
+              checksum input;
+            * invalid and zeros are the bytes not accepted by
+              `_digits_of` and the bytes that expand to '0'.
+        """
+        tables = cls.__dict__.get('_tables')
+        if tables is None:
+            instance = cls.__new__(cls)
+            values = [instance._digits_of(d)[0] for d in '0123456789']
+            weights = (values, [sum(instance._digits_of(v * 2)) for v in values])
+            plain, doubled, shifts = [None] * 256, [None] * 256, [0] * 256
+            invalid, zeros = bytearray(range(128, 256)), bytearray()
+            for b in range(0, 128):
+                try:
+                    digits = ''.join(map(str, instance._digits_of(chr(b))))
+                except ValueError:
+                    invalid.append(b)
+                    continue
+                for parity, table in [(0, plain), (1, doubled)]:
+                    table[b] = sum(
+                        weights[(parity + i) % 2][int(d)]
+                        for i, d in enumerate(reversed(digits))) % 10
+                shifts[b] = len(digits) % 2
+                if digits == '0':
+                    zeros.append(b)
+            tables = (tuple(plain), tuple(doubled), tuple(shifts), values[0],
+                      bytes(invalid), bytes(zeros))
+            cls._tables = tables
+        return tables
+
+    def _encode(self, identifier, tables):
+        """Returns the identifier as bytes without leading zeros or
+        None if the tables cannot be used.
+        """
+        try:
+            data = str(identifier).encode('ascii')
+        except UnicodeEncodeError:
+            return None
+        if not data or len(data.translate(None, tables[4])) != len(data):
+            return None
+        return data.lstrip(tables[5])
+
+    def _calculate_checkdigit(self, identifier):
         check_digit = self._luhn_checksum(
             int(''.join(map(str, self._digits_of(identifier)))) * 10)
         check_digit = check_digit if check_digit == 0 else 10 - check_digit
@@ -27,3 +238,168 @@ class LuhnOrdMixin(LuhnMixin):
 
     def _digits_of(self, n):
         return [ord(d) for d in str(n)]
+
+
+class DammMixin(CheckdigitMixin):
+
+    """Calculates a Damm check digit.
+
+    Detects all single character errors and all adjacent
+    transpositions. The identifier is read once, left to right, with
+    one table lookup per character. Raises ValueError for characters
+    not in `symbols`.
+    """
+
+    symbols = '0123456789'
+    table = (
+        (0, 3, 1, 7, 5, 9, 8, 6, 4, 2),
+        (7, 0, 9, 2, 1, 5, 4, 8, 6, 3),
+        (4, 2, 0, 6, 8, 7, 1, 3, 5, 9),
+        (1, 7, 5, 0, 9, 8, 3, 4, 2, 6),
+        (6, 1, 2, 3, 0, 4, 5, 9, 7, 8),
+        (3, 6, 7, 4, 2, 0, 9, 5, 8, 1),
+        (5, 8, 6, 9, 7, 2, 0, 1, 3, 4),
+        (8, 9, 4, 5, 3, 6, 2, 0, 1, 7),
+        (9, 4, 3, 8, 6, 1, 7, 2, 0, 5),
+        (2, 5, 8, 1, 4, 3, 6, 7, 9, 0))
+
+    def calculate_checkdigit(self, identifier):
+        steps, checks = self.get_tables()
+        interim = 0
+        try:
+            for b in str(identifier).encode('ascii'):
+                interim = steps[interim][b]
+            return checks[interim]
+        except (TypeError, UnicodeEncodeError):
+            raise ValueError(
+                f'Invalid identifier for {self.__class__.__name__}. '
+                f'Expected characters in \'{self.symbols}\'. Got {identifier}.')
+
+    @classmethod
+    def get_table(cls):
+        """Returns the quasigroup operation as a tuple of rows.
+        """
+        return cls.table
+
+    @classmethod
+    def get_tables(cls):
+        """Returns, built once per class, a tuple of (steps, checks)
+        where steps[interim] maps each byte to the next interim
+        (None if not a symbol) and checks[interim] is the check
+        digit that brings the interim to 0.
+        """
+        tables = cls.__dict__.get('_tables')
+        if tables is None:
+            table = cls.get_table()
+            steps = []
+            for row in table:
+                step = [None] * 256
+                for index, symbol in enumerate(cls.symbols):
+                    step[ord(symbol)] = row[index]
+                steps.append(tuple(step))
+            checks = tuple(cls.symbols[row.index(0)] for row in table)
+            tables = (tuple(steps), checks)
+            cls._tables = tables
+        return tables
+
+
+class DammAlphaMixin(DammMixin):
+
+    """Calculates a Damm check character for identifiers of digits
+    and upper case letters.
+
+    The 36 symbols are the elements (u, v) of GF(4) x GF(9) and
+    x * y = a.x + y with a = (w, 1 + i) so that no a is 0 or 1 in
+    either field. The check character brings the interim to 0.
+    """
+
+    symbols = '0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ'
+
+    @classmethod
+    def get_table(cls):
+        # GF(4) = {0, 1, w, w + 1} as bits; GF(9) = {p + qi : i^2 = -1} as p + 3q
+        def gf4_mul(x, y):
+            product = 0
+            for bit in range(0, 2):
+                if y & (1 << bit):
+                    product ^= x << bit
+            return product ^ 0b111 if product & 0b100 else product
+
+        def gf9_mul(x, y):
+            p1, q1, p2, q2 = x % 3, x // 3, y % 3, y // 3
+            return (p1 * p2 - q1 * q2) % 3 + 3 * ((p1 * q2 + p2 * q1) % 3)
+
+        def gf9_add(x, y):
+            return (x % 3 + y % 3) % 3 + 3 * ((x // 3 + y // 3) % 3)
+
+        a4, a9 = 0b10, 4
+        return tuple(
+            tuple(9 * (gf4_mul(a4, x // 9) ^ (y // 9)) + gf9_add(gf9_mul(a9, x % 9), y % 9)
+                  for y in range(0, 36))
+            for x in range(0, 36))
+
+
+class VerhoeffMixin(CheckdigitMixin):
+
+    """Calculates a Verhoeff check digit.
+
+    Detects all single digit errors and all adjacent transpositions.
+    The identifier is read once, right to left, with one table
+    lookup per digit. Raises ValueError for characters that are not
+    digits.
+    """
+
+    multiplication = (
+        (0, 1, 2, 3, 4, 5, 6, 7, 8, 9),
+        (1, 2, 3, 4, 0, 6, 7, 8, 9, 5),
+        (2, 3, 4, 0, 1, 7, 8, 9, 5, 6),
+        (3, 4, 0, 1, 2, 8, 9, 5, 6, 7),
+        (4, 0, 1, 2, 3, 9, 5, 6, 7, 8),
+        (5, 9, 8, 7, 6, 0, 4, 3, 2, 1),
+        (6, 5, 9, 8, 7, 1, 0, 4, 3, 2),
+        (7, 6, 5, 9, 8, 2, 1, 0, 4, 3),
+        (8, 7, 6, 5, 9, 3, 2, 1, 0, 4),
+        (9, 8, 7, 6, 5, 4, 3, 2, 1, 0))
+    permutation = (
+        (0, 1, 2, 3, 4, 5, 6, 7, 8, 9),
+        (1, 5, 7, 6, 2, 8, 3, 0, 9, 4),
+        (5, 8, 0, 3, 7, 9, 6, 1, 4, 2),
+        (8, 9, 1, 6, 0, 4, 3, 5, 2, 7),
+        (9, 4, 5, 3, 1, 2, 6, 8, 7, 0),
+        (4, 2, 8, 6, 5, 7, 3, 9, 0, 1),
+        (2, 7, 9, 3, 8, 0, 6, 4, 1, 5),
+        (7, 0, 4, 6, 9, 1, 3, 2, 5, 8))
+    inverse = '0432156789'
+
+    def calculate_checkdigit(self, identifier):
+        steps = self.get_tables()
+        checksum = 0
+        try:
+            for position, b in enumerate(reversed(str(identifier).encode('ascii'))):
+                checksum = steps[(position & 7) * 10 + checksum][b]
+            return self.inverse[checksum]
+        except (TypeError, UnicodeEncodeError):
+            raise ValueError(
+                f'Invalid identifier for {self.__class__.__name__}. '
+                f'Expected digits. Got {identifier}.')
+
+    @classmethod
+    def get_tables(cls):
+        """Returns, built once per class, a tuple of steps where
+        steps[position % 8 * 10 + checksum] maps each byte to the
+        next checksum (None if not a digit).
+        """
+        tables = cls.__dict__.get('_tables')
+        if tables is None:
+            steps = []
+            for position in range(0, 8):
+                permutation = cls.permutation[(position + 1) % 8]
+                for checksum in range(0, 10):
+                    step = [None] * 256
+                    for digit in range(0, 10):
+                        step[ord('0') + digit] = cls.multiplication[checksum][
+                            permutation[digit]]
+                    steps.append(tuple(step))
+            tables = tuple(steps)
+            cls._tables = tables
+        return tables
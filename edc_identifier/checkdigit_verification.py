@@ -0,0 +1,36 @@
+def setup_worker():
+    """Sets up Django in a worker process of verify_identifiers.
+
+    This module does not import Django models, so a worker started
+    with the spawn or forkserver start method can import it before
+    Django is set up. The settings module is read from
+    DJANGO_SETTINGS_MODULE, which the worker inherits from the
+    parent. A no-op if the worker was forked from a process where
+    Django is set up.
+    """
+    import django
+
+    django.setup()
+
+
+def verify_chunk(registry, rows):
+    """Returns the rows, as (pk, name, identifier_type, identifier),
+    where the check digit is not valid.
+    """
+    invalid = []
+    by_label = {}
+    for row in rows:
+        by_label.setdefault(row[1], []).append(row)
+    for label, rows in by_label.items():
+        checkdigit, separator = registry[label]
+        values = []
+        for row in rows:
+            identifier, _, digit = (row[3] or '').rpartition(separator)
+            if identifier and len(digit) == 1:
+                values.append(identifier.replace(separator, '') + digit)
+            else:
+                values.append('')
+        for row, valid in zip(rows, checkdigit.verify_checkdigits(values)):
+            if not valid:
+                invalid.append(row)
+    return invalid
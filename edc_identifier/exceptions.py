@@ -24,6 +24,10 @@ class IndentifierFormatKeyError(Exception):
     pass
 
 
+class IdentifierMissingTemplateValue(Exception):
+    pass
+
+
 class SubjectIdentifierError(Exception):
     pass
 
@@ -32,5 +36,9 @@ class ResearchIdentifierError(Exception):
     pass
 
 
+class IdentifierSequenceRangeError(Exception):
+    pass
+
+
 class BirthModelError(Exception):
     pass
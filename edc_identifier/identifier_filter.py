@@ -0,0 +1,183 @@
+import threading
+import time
+
+from hashlib import blake2b
+from math import ceil, exp, log
+
+from django.apps import apps as django_apps
+
+from .metrics import metrics
+
+
+class BloomFilter:
+
+    """A Bloom filter of strings sized for `capacity` items at
+    `error_rate` false positives.
+    """
+
+    def __init__(self, capacity=None, error_rate=None):
+        self.capacity = max(1, capacity or 1)
+        self.error_rate = error_rate or 0.001
+        self.size = max(8, ceil(-self.capacity * log(self.error_rate) / log(2) ** 2))
+        self.hashes = max(1, round(self.size / self.capacity * log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def __repr__(self):
+        return (f'{self.__class__.__name__}(capacity={self.capacity}, '
+                f'error_rate={self.error_rate})')
+
+    def __contains__(self, value):
+        bits = self.bits
+        for position in self.positions(value):
+            if not bits[position >> 3] & (1 << (position & 7)):
+                return False
+        return True
+
+    def add(self, value):
+        bits = self.bits
+        for position in self.positions(value):
+            bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def positions(self, value):
+        digest = blake2b(value.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        size = self.size
+        return [(h1 + i * h2) % size for i in range(0, self.hashes)]
+
+    @property
+    def false_positive_rate(self):
+        """Returns the expected false positive rate for the number
+        of values added.
+        """
+        return (1 - exp(-self.hashes * self.count / self.size)) ** self.hashes
+
+
+class IdentifierFilter:
+
+    """A per-process Bloom filter of the identifiers issued for an
+    identifier_type.
+
+    The filter is filled from the model on first use with a streamed
+    `values_list`, see `warm`. An identifier not in the filter has
+    not been issued by this process or before the filter was filled,
+    so the caller inserts it without a query, in a savepoint, and the
+    unique identifier field catches one issued by another process
+    since. An identifier in the filter may have been issued and is
+    checked in the database.
+
+    Metrics are named `identifier_filter.<identifier_type>.<name>`:
+        bytes, count, false_positive_rate, warmup_seconds (gauges)
+        hits, false_positives, conflicts (counters)
+    """
+
+    chunk_size = 10000
+
+    def __init__(self, model_cls=None, identifier_attr=None, identifier_type=None,
+                 capacity=None, error_rate=None):
+        self.model_cls = model_cls
+        self.identifier_attr = identifier_attr
+        self.identifier_type = identifier_type
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.bloom_filter = None
+        self.lock = threading.Lock()
+
+    def __repr__(self):
+        return (f'{self.__class__.__name__}({self.model_cls._meta.label_lower}, '
+                f'{self.identifier_attr}, {self.identifier_type})')
+
+    def __contains__(self, identifier):
+        """Returns True if the identifier may have been issued.
+        """
+        if not self.bloom_filter:
+            self.warm()
+        if identifier in self.bloom_filter:
+            metrics.incr(self.metric_name('hits'))
+            return True
+        return False
+
+    def warm(self):
+        """Fills a new Bloom filter with the identifiers in the model.
+
+        Sized for twice the number of rows or `capacity`, whichever
+        is larger.
+        """
+        with self.lock:
+            if self.bloom_filter:
+                return
+            start = time.perf_counter()
+            queryset = self.model_cls.objects.filter(identifier_type=self.identifier_type)
+            bloom_filter = BloomFilter(
+                capacity=max(self.capacity, queryset.count() * 2),
+                error_rate=self.error_rate)
+            for identifier in queryset.values_list(
+                    self.identifier_attr, flat=True).iterator(chunk_size=self.chunk_size):
+                bloom_filter.add(identifier)
+            self.bloom_filter = bloom_filter
+            metrics.set(self.metric_name('warmup_seconds'), time.perf_counter() - start)
+            metrics.set(self.metric_name('bytes'), len(bloom_filter.bits))
+            self.update_metrics()
+
+    def add(self, identifier):
+        """Adds an issued identifier.
+
+        Once the filter holds more than its capacity it is filled
+        again, larger, on next use.
+        """
+        bloom_filter = self.bloom_filter
+        if bloom_filter:
+            with self.lock:
+                bloom_filter.add(identifier)
+                if bloom_filter.count > bloom_filter.capacity:
+                    self.capacity = bloom_filter.capacity * 2
+                    self.bloom_filter = None
+            self.update_metrics(bloom_filter)
+
+    def record(self, identifier, exists):
+        """Records the result of the database check of an identifier
+        that may have been issued.
+        """
+        if not exists:
+            metrics.incr(self.metric_name('false_positives'))
+
+    def conflict(self, identifier):
+        """Records an identifier that was not in the filter but is in
+        the database.
+        """
+        metrics.incr(self.metric_name('conflicts'))
+        self.add(identifier)
+
+    def update_metrics(self, bloom_filter=None):
+        bloom_filter = bloom_filter or self.bloom_filter
+        metrics.set(self.metric_name('count'), bloom_filter.count)
+        metrics.set(self.metric_name('false_positive_rate'), bloom_filter.false_positive_rate)
+
+    def metric_name(self, name):
+        return f'identifier_filter.{self.identifier_type}.{name}'
+
+
+identifier_filters = {}
+identifier_filters_lock = threading.Lock()
+
+
+def get_identifier_filter(model_cls, identifier_attr, identifier_type):
+    """Returns the IdentifierFilter for this model, field and
+    identifier_type or None if not enabled on edc_identifier.AppConfig.
+    """
+    app_config = django_apps.get_app_config('edc_identifier')
+    if not app_config.identifier_filter:
+        return None
+    key = (model_cls._meta.label_lower, identifier_attr, identifier_type)
+    identifier_filter = identifier_filters.get(key)
+    if not identifier_filter:
+        with identifier_filters_lock:
+            identifier_filter = identifier_filters.setdefault(key, IdentifierFilter(
+                model_cls=model_cls,
+                identifier_attr=identifier_attr,
+                identifier_type=identifier_type,
+                capacity=app_config.identifier_filter_capacity,
+                error_rate=app_config.identifier_filter_error_rate))
+    return identifier_filter
@@ -0,0 +1,101 @@
+from functools import lru_cache
+from operator import attrgetter
+from string import Formatter
+
+from .exceptions import IdentifierMissingTemplateValue
+
+
+class IdentifierTemplate:
+
+    """A research identifier template parsed once into a format
+    string of positional fields, e.g.
+
+        '{protocol_number}-{site_id}{device_id}{sequence}'
+
+    is compiled to '{0}-{1}{2}{3}' with fields
+    ['protocol_number', 'site_id', 'device_id'] read with a single
+    `attrgetter` and the `sequence` field padded with zeros to
+    `padding`.
+    """
+
+    sequence_field = 'sequence'
+    separator = '-'
+
+    def __init__(self, template=None, padding=None):
+        self.template = template
+        self.padding = padding or 0
+        self.fields = []
+        format_string = []
+        for literal, field_name, format_spec, conversion in Formatter().parse(template):
+            if literal:
+                format_string.append(literal.replace('{', '{{').replace('}', '}}'))
+            if field_name is None:
+                continue
+            if field_name != self.sequence_field:
+                if field_name not in self.fields:
+                    self.fields.append(field_name)
+                index = self.fields.index(field_name)
+            else:
+                index = 'sequence'
+            conversion = f'!{conversion}' if conversion else ''
+            format_spec = f':{format_spec}' if format_spec else ''
+            format_string.append(f'{{{index}{conversion}{format_spec}}}')
+        self.format_string = ''.join(format_string)
+        self.getter = attrgetter(*self.fields) if self.fields else None
+
+    def __repr__(self):
+        return f'{self.__class__.__name__}({self.template!r}, padding={self.padding})'
+
+    def validate(self, cls):
+        """Raises if a template field is not an attribute of cls.
+        """
+        for field in self.fields:
+            if not hasattr(cls, field):
+                raise IdentifierMissingTemplateValue(
+                    f'Template field not an attribute of {cls.__name__}. '
+                    f'Got \'{field}\' in template \'{self.template}\'.')
+
+    def values(self, obj):
+        """Returns a tuple of the field values of obj, None for a
+        missing attribute.
+
+        The values are not validated, see `format`.
+        """
+        if not self.getter:
+            return ()
+        try:
+            values = self.getter(obj)
+        except AttributeError:
+            return tuple(getattr(obj, field, None) for field in self.fields)
+        return (values, ) if len(self.fields) == 1 else values
+
+    def format(self, template_opts):
+        """Returns the identifier for a dict of template key/values,
+        including the padded `sequence`, without a check digit.
+
+        Raises if a value is missing or None. This is the only place
+        the values are validated. See ResearchIdentifier.template_opts.
+        """
+        values = [template_opts.get(field) for field in self.fields]
+        if not all(values):
+            for field in self.fields:
+                if field not in template_opts:
+                    raise IdentifierMissingTemplateValue(
+                        f'Required option not provided. Got \'{field}\'.')
+                if not template_opts[field]:
+                    raise IdentifierMissingTemplateValue(
+                        f'Required option cannot be None. Got \'{field}\'.')
+        return self.format_string.format(
+            *values, sequence=template_opts.get(self.sequence_field))
+
+    def checkdigit_input(self, identifier):
+        """Returns the identifier without separators.
+        """
+        return identifier.replace(self.separator, '')
+
+
+@lru_cache(maxsize=None)
+def compile_template(template, padding=None):
+    """Returns a cached IdentifierTemplate.
+    """
+    return IdentifierTemplate(template, padding)
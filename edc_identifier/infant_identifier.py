@@ -1,6 +1,7 @@
 from django.apps import apps as django_apps
 from django.contrib.sites.models import Site
 from django.core.exceptions import ObjectDoesNotExist
+from django.db import transaction
 from edc_base import get_utcnow
 from edc_registration.models import RegisteredSubject
 
@@ -41,18 +42,13 @@ class InfantIdentifier:
     def __init__(self, maternal_identifier=None, requesting_model=None,
                  birth_order=None, live_infants=None, template=None,
                  first_name=None, initials=None, last_name=None, registration_status=None,
-                 registration_datetime=None, subject_type=None):
+                 registration_datetime=None, subject_type=None, registered_subject=None,
+                 lazy=None):
         self._first_name = first_name
         self._identifier = None
         self._infant_suffix = None
         # check maternal identifier
-        try:
-            rs = RegisteredSubject.objects.get(
-                subject_identifier=maternal_identifier)
-        except ObjectDoesNotExist:
-            raise InfantIdentifierError(
-                f'Failed to create infant identifier. Invalid maternal '
-                f'identifier. Got {maternal_identifier}')
+        rs = registered_subject or self.get_maternal_registered_subject(maternal_identifier)
         self.last_name = last_name or rs.last_name
         self.maternal_identifier = maternal_identifier
         self.birth_order = birth_order
@@ -64,59 +60,135 @@ class InfantIdentifier:
         self.subject_type = subject_type or self.subject_type
         self.template = template or self.template
 
-        self.identifier
+        if not lazy:
+            self.identifier
 
     def __str__(self):
         return self.identifier
 
+    @classmethod
+    def allocate(cls, maternal_identifier=None, live_infants=None, birth_orders=None,
+                 **kwargs):
+        """Returns a list of InfantIdentifier instances, in birth
+        order, for the infants of one delivery.
+
+        The maternal RegisteredSubject is fetched once and the new
+        identifiers are checked with one query per table. In one
+        transaction, the IdentifierModel instances are written with
+        `bulk_create` and the RegisteredSubject instances with
+        `create`, so that their save() and signals run.
+
+        Usage:
+
+            >>> infants = InfantIdentifier.allocate(
+                    maternal_identifier='000-40990001-6', live_infants=2,
+                    requesting_model='edc_example.maternallabdel')
+            >>> [infant.identifier for infant in infants]
+            ['000-40990001-6-25', '000-40990001-6-26']
+        """
+        birth_orders = sorted(birth_orders or range(1, (live_infants or 0) + 1))
+        if (not live_infants or not birth_orders
+                or len(set(birth_orders)) != len(birth_orders)
+                or birth_orders[0] < 1 or birth_orders[-1] > live_infants):
+            raise InfantIdentifierError(
+                f'Unable to allocate infant identifiers. Ensure number of infants '
+                f'is greater than 0 and birth orders are unique and from 1 to the '
+                f'number of infants. '
+                f'Got live_infants={live_infants}, birth_orders={birth_orders}.')
+        registered_subject = cls.get_maternal_registered_subject(maternal_identifier)
+        infants = [
+            cls(maternal_identifier=maternal_identifier, birth_order=birth_order,
+                live_infants=live_infants, registered_subject=registered_subject,
+                lazy=True, **kwargs)
+            for birth_order in birth_orders]
+        identifiers = [infant.make_identifier() for infant in infants]
+        cls.raise_on_existing(identifiers)
+        site = Site.objects.get_current()
+        with transaction.atomic():
+            cls.identifier_model_cls.objects.bulk_create([
+                cls.identifier_model_cls(**infant.get_identifier_model_options(identifier, site))
+                for infant, identifier in zip(infants, identifiers)])
+            for infant, identifier in zip(infants, identifiers):
+                RegisteredSubject.objects.create(
+                    **infant.get_registered_subject_options(identifier, site))
+        for infant, identifier in zip(infants, identifiers):
+            infant._identifier = identifier
+        return infants
+
     @property
     def identifier(self):
         if not self._identifier:
-            identifier = self.template.format(
-                maternal_identifier=self.maternal_identifier,
-                infant_suffix=self.infant_suffix)
-            try:
-                self.identifier_model_cls.objects.get(identifier=identifier)
-            except ObjectDoesNotExist:
-                pass
-            else:
-                raise InfantIdentifierError(
-                    f'Infant identifier unexpectedly exists. '
-                    f'See model {self.identifier_model_cls._meta.label_lower}. '
-                    f'Got {identifier}')
-            try:
-                RegisteredSubject.objects.get(subject_identifier=identifier)
-            except ObjectDoesNotExist:
-                pass
-            else:
-                raise InfantIdentifierError(
-                    f'Infant identifier unexpectedly exists. '
-                    f'See {RegisteredSubject._meta.label_lower}. '
-                    f'Got {identifier}')
+            identifier = self.make_identifier()
+            self.raise_on_existing([identifier])
+            site = Site.objects.get_current()
             # update identifier model
             self.identifier_model_cls.objects.create(
-                name=self.label,
-                sequence_number=self.infant_suffix,
-                identifier=identifier,
-                linked_identifier=self.maternal_identifier,
-                protocol_number=edc_protocol_app_config.protocol_number,
-                device_id=edc_device_app_config.device_id,
-                model=self.requesting_model,
-                site=Site.objects.get_current(),
-                identifier_type=self.subject_type)
+                **self.get_identifier_model_options(identifier, site))
             # update RegisteredSubject
             RegisteredSubject.objects.create(
-                subject_identifier=identifier,
-                subject_type=self.subject_type,
-                site=Site.objects.get_current(),
-                relative_identifier=self.maternal_identifier,
-                first_name=self.first_name,
-                initials=self.initials,
-                registration_status=self.registration_status,
-                registration_datetime=self.registration_datetime)
+                **self.get_registered_subject_options(identifier, site))
             self._identifier = identifier
         return self._identifier
 
+    def make_identifier(self):
+        return self.template.format(
+            maternal_identifier=self.maternal_identifier,
+            infant_suffix=self.infant_suffix)
+
+    @staticmethod
+    def get_maternal_registered_subject(maternal_identifier):
+        try:
+            return RegisteredSubject.objects.get(
+                subject_identifier=maternal_identifier)
+        except ObjectDoesNotExist:
+            raise InfantIdentifierError(
+                f'Failed to create infant identifier. Invalid maternal '
+                f'identifier. Got {maternal_identifier}')
+
+    @classmethod
+    def raise_on_existing(cls, identifiers):
+        """Raises an exception if any of the identifiers exist in
+        IdentifierModel or RegisteredSubject.
+        """
+        existing = list(cls.identifier_model_cls.objects.filter(
+            identifier__in=identifiers).values_list('identifier', flat=True)[:1])
+        if existing:
+            raise InfantIdentifierError(
+                f'Infant identifier unexpectedly exists. '
+                f'See model {cls.identifier_model_cls._meta.label_lower}. '
+                f'Got {existing[0]}')
+        existing = list(RegisteredSubject.objects.filter(
+            subject_identifier__in=identifiers).values_list(
+                'subject_identifier', flat=True)[:1])
+        if existing:
+            raise InfantIdentifierError(
+                f'Infant identifier unexpectedly exists. '
+                f'See {RegisteredSubject._meta.label_lower}. '
+                f'Got {existing[0]}')
+
+    def get_identifier_model_options(self, identifier, site=None):
+        return dict(
+            name=self.label,
+            sequence_number=self.infant_suffix,
+            identifier=identifier,
+            linked_identifier=self.maternal_identifier,
+            protocol_number=edc_protocol_app_config.protocol_number,
+            device_id=edc_device_app_config.device_id,
+            model=self.requesting_model,
+            site=site,
+            identifier_type=self.subject_type)
+
+    def get_registered_subject_options(self, identifier, site=None):
+        return dict(
+            subject_identifier=identifier,
+            subject_type=self.subject_type,
+            site=site,
+            relative_identifier=self.maternal_identifier,
+            first_name=self.first_name,
+            initials=self.initials,
+            registration_status=self.registration_status,
+            registration_datetime=self.registration_datetime)
+
     @property
     def first_name(self):
         if not self._first_name:
@@ -0,0 +1,110 @@
+import logging
+import threading
+
+from django.apps import apps as django_apps
+
+from .metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class Keyspace:
+
+    """The occupancy of the random strings of `random_string_length`
+    characters from `alphabet` for an identifier_type and prefix.
+
+    An allocation draws random strings until it finds one not used,
+    so at a fill ratio f it takes 1 / (1 - f) tries on average.
+    """
+
+    def __init__(self, identifier_type=None, prefix=None, random_string_length=None,
+                 alphabet=None, used=None):
+        self.identifier_type = identifier_type
+        self.prefix = prefix or ''
+        self.random_string_length = random_string_length
+        self.alphabet = alphabet
+        self.used = used or 0
+
+    def __repr__(self):
+        return (f'{self.__class__.__name__}(identifier_type={self.identifier_type}, '
+                f'prefix={self.prefix}, random_string_length={self.random_string_length}, '
+                f'used={self.used})')
+
+    @property
+    def size(self):
+        return len(self.alphabet) ** self.random_string_length
+
+    @property
+    def fill_ratio(self):
+        return min(1.0, self.used / self.size)
+
+    @property
+    def expected_tries(self):
+        """Returns the expected number of random strings drawn per
+        allocation or None if all are used.
+        """
+        if self.fill_ratio >= 1.0:
+            return None
+        return 1.0 / (1.0 - self.fill_ratio)
+
+    def as_dict(self):
+        return dict(
+            identifier_type=self.identifier_type,
+            prefix=self.prefix,
+            random_string_length=self.random_string_length,
+            used=self.used,
+            size=self.size,
+            fill_ratio=self.fill_ratio,
+            expected_tries=self.expected_tries)
+
+    def update_metrics(self):
+        name = f'keyspace.{self.identifier_type}.{self.prefix}.{self.random_string_length}'
+        metrics.set(f'{name}.used', self.used)
+        metrics.set(f'{name}.fill_ratio', self.fill_ratio)
+
+
+random_string_lengths = {}
+random_string_lengths_lock = threading.Lock()
+
+
+def get_random_string_length(obj):
+    """Returns the random string length for a new identifier of
+    obj, a ShortIdentifier or SimpleUniqueIdentifier.
+
+    If `keyspace_escalation_threshold` is set on
+    edc_identifier.AppConfig, the length is increased, up to
+    `keyspace_max_random_string_length`, while the fill ratio of the
+    keyspace is at or above the threshold, see `obj.get_keyspace`.
+
+    The length is kept per process. The keyspace is only counted
+    again once the collision rate observed by obj for that length
+    reaches the threshold, see `obj.get_collision_rate`.
+    """
+    app_config = django_apps.get_app_config('edc_identifier')
+    threshold = app_config.keyspace_escalation_threshold
+    if not threshold:
+        return obj.random_string_length
+    keyspace = obj.get_keyspace(count=False)
+    if not keyspace:
+        return obj.random_string_length
+    key = (keyspace.identifier_type, keyspace.prefix, keyspace.alphabet,
+           obj.random_string_length)
+    length = random_string_lengths.get(key)
+    if length and obj.get_collision_rate(length) < threshold:
+        return length
+    length = length or obj.random_string_length
+    max_length = app_config.keyspace_max_random_string_length
+    while not max_length or length < max_length:
+        keyspace = obj.get_keyspace(random_string_length=length)
+        keyspace.update_metrics()
+        if keyspace.fill_ratio < threshold:
+            break
+        length += 1
+        metrics.incr(f'keyspace.{keyspace.identifier_type}.{keyspace.prefix}.escalations')
+        logger.warning(
+            f'Keyspace is {keyspace.fill_ratio:.0%} used. Increasing the random '
+            f'string length to {length}. Got identifier_type={keyspace.identifier_type}, '
+            f'prefix={keyspace.prefix}, used={keyspace.used}, size={keyspace.size}.')
+    with random_string_lengths_lock:
+        random_string_lengths[key] = length
+    return length
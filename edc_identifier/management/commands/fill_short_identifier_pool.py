@@ -0,0 +1,57 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from ...short_identifier import ShortIdentifier, ShortIdentifierPrefixError
+from ...short_identifier_allocators import PoolAllocator
+
+
+def get_short_identifier_cls(name):
+    """Returns the imported ShortIdentifier class for this name,
+    preferring one with a PoolAllocator, or None.
+    """
+    found = None
+    classes = [ShortIdentifier]
+    while classes:
+        cls = classes.pop(0)
+        classes.extend(cls.__subclasses__())
+        if cls.name == name:
+            if isinstance(cls.identifier_allocator, PoolAllocator):
+                return cls
+            found = found or cls
+    return found
+
+
+class Command(BaseCommand):
+
+    help = (
+        'Fill the pool of unclaimed short identifiers for a name and prefix '
+        'to its target size, see PoolAllocator.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'name', help='short identifier name, e.g. shortidentifier')
+        parser.add_argument(
+            '--prefix', action='append', default=None,
+            help='prefix to fill, may be repeated (default: no prefix)')
+        parser.add_argument(
+            '--size', type=int, default=None,
+            help='target number of identifiers in the pool '
+                 '(default: the size of the PoolAllocator)')
+
+    def handle(self, *args, **options):
+        cls = get_short_identifier_cls(options['name'])
+        if not cls:
+            raise CommandError(f'Unknown short identifier name. Got {options["name"]}.')
+        if options['size'] is not None and options['size'] < 1:
+            raise CommandError(f'Invalid size. Got {options["size"]}.')
+        allocator = cls.identifier_allocator
+        if not isinstance(allocator, PoolAllocator):
+            allocator = PoolAllocator()
+        for prefix in options['prefix'] or [None]:
+            try:
+                short_identifier = cls(prefix=prefix, lazy=True)
+            except ShortIdentifierPrefixError as e:
+                raise CommandError(e)
+            added = allocator.fill(short_identifier, size=options['size'])
+            self.stderr.write(
+                f'Added {added} identifiers to the pool for {short_identifier.name} '
+                f'prefix={short_identifier.prefix or "-"}.')
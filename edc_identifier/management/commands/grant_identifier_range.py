@@ -0,0 +1,53 @@
+from django.conf import settings
+from django.contrib.sites.models import Site
+from django.core import serializers
+from django.core.management.base import BaseCommand, CommandError
+
+from ...models import IdentifierSequenceRange
+
+
+class Command(BaseCommand):
+
+    help = (
+        'Grant a range of identifier sequence numbers to a client device '
+        'and write it as a fixture to load on the client with `loaddata`.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'label', help='identifier label, e.g. subjectidentifier')
+        parser.add_argument(
+            'device_id', type=int, help='device_id of the client device')
+        parser.add_argument(
+            'count', type=int, help='number of sequence numbers to grant')
+        parser.add_argument(
+            '--site', type=int, default=None,
+            help='site id (default: settings.SITE_ID)')
+        parser.add_argument(
+            '--output', default=None,
+            help='fixture file name (default: stdout)')
+
+    def handle(self, *args, **options):
+        if options['count'] < 1:
+            raise CommandError(f'Invalid count. Got {options["count"]}.')
+        try:
+            site = Site.objects.get(pk=options['site'] or settings.SITE_ID)
+        except Site.DoesNotExist:
+            raise CommandError(f'Invalid site. Got {options["site"]}.')
+        obj = IdentifierSequenceRange.objects.grant(
+            label=options['label'],
+            site=site,
+            device_id=options['device_id'],
+            count=options['count'])
+        fixture = serializers.serialize(
+            'json', [obj], indent=2,
+            use_natural_foreign_keys=True,
+            use_natural_primary_keys=True)
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                f.write(fixture)
+        else:
+            self.stdout.write(fixture)
+        self.stderr.write(
+            f'Granted {obj.label} sequence numbers {obj.first_sequence_number}-'
+            f'{obj.last_sequence_number} to device {obj.device_id} '
+            f'at site {site.pk}.')
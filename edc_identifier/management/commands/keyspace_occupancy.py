@@ -0,0 +1,102 @@
+import json
+
+from django.apps import apps as django_apps
+from django.core.management.base import BaseCommand, CommandError
+
+from ...short_identifier import ShortIdentifier, ShortIdentifierPrefixError
+from ...simple_identifier import SimpleUniqueIdentifier
+
+
+def get_registry():
+    """Returns a dictionary of {identifier_type: [obj, ...]} with a
+    lazy instance of the imported ShortIdentifier classes, one per
+    prefix issued, and SimpleUniqueIdentifier classes.
+
+    If subclasses share an identifier_type, the first found is used.
+    Classes with a timestamp in the template are skipped.
+    """
+    registry = {}
+    classes = [ShortIdentifier, SimpleUniqueIdentifier]
+    while classes:
+        cls = classes.pop(0)
+        classes.extend(cls.__subclasses__())
+        if issubclass(cls, ShortIdentifier):
+            if cls.name in registry:
+                continue
+            registry[cls.name] = []
+            prefixes = cls.identifier_model_cls.objects.filter(
+                identifier_type=cls.name).values_list(
+                    'identifier_prefix', flat=True).distinct().order_by('identifier_prefix')
+            for prefix in prefixes:
+                try:
+                    registry[cls.name].append(cls(prefix=prefix, lazy=True))
+                except ShortIdentifierPrefixError:
+                    pass
+        elif cls.identifier_type not in registry:
+            obj = cls(lazy=True)
+            if obj.get_keyspace(count=False):
+                registry[cls.identifier_type] = [obj]
+    return registry
+
+
+def get_keyspaces(obj, threshold=None, max_length=None):
+    """Returns a list of Keyspaces for obj starting at its random
+    string length and, if `threshold` is set, continuing with longer
+    lengths while the fill ratio is at or above `threshold`.
+    """
+    keyspaces = []
+    length = obj.random_string_length
+    while True:
+        keyspace = obj.get_keyspace(random_string_length=length)
+        keyspaces.append(keyspace)
+        if (not threshold or keyspace.fill_ratio < threshold
+                or (max_length and length >= max_length)):
+            break
+        length += 1
+    return keyspaces
+
+
+class Command(BaseCommand):
+
+    help = (
+        'Report the fill ratio and the expected tries per allocation of the '
+        'keyspace of each ShortIdentifier and SimpleUniqueIdentifier type and prefix.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--identifier-type', action='append', default=None,
+            help='identifier type to report, e.g. shortidentifier '
+                 '(default: all registered, may be repeated)')
+        parser.add_argument(
+            '--json', action='store_true', default=False,
+            help='write one JSON object per keyspace')
+
+    def handle(self, *args, **options):
+        registry = get_registry()
+        identifier_types = options['identifier_type'] or list(registry)
+        for identifier_type in identifier_types:
+            if identifier_type not in registry:
+                raise CommandError(
+                    f'Unknown identifier type. Expected one of {list(registry)}. '
+                    f'Got {identifier_type}.')
+        app_config = django_apps.get_app_config('edc_identifier')
+        for identifier_type in identifier_types:
+            for obj in registry[identifier_type]:
+                for keyspace in get_keyspaces(
+                        obj,
+                        threshold=app_config.keyspace_escalation_threshold,
+                        max_length=app_config.keyspace_max_random_string_length):
+                    keyspace.update_metrics()
+                    self.write(keyspace, options['json'])
+
+    def write(self, keyspace, as_json=None):
+        if as_json:
+            self.stdout.write(json.dumps(keyspace.as_dict()))
+        else:
+            expected_tries = keyspace.expected_tries
+            self.stdout.write(
+                f'{keyspace.identifier_type} prefix={keyspace.prefix or "-"} '
+                f'length={keyspace.random_string_length} used={keyspace.used} '
+                f'size={keyspace.size} fill={keyspace.fill_ratio:.1%} '
+                'expected_tries='
+                f'{"inf" if expected_tries is None else f"{expected_tries:.2f}"}')
@@ -0,0 +1,121 @@
+import json
+
+from concurrent.futures import ProcessPoolExecutor
+from django.core.management.base import BaseCommand, CommandError
+
+from ...checkdigit_verification import setup_worker, verify_chunk
+from ...identifier_template import IdentifierTemplate
+from ...models import IdentifierModel
+from ...research_identifier import ResearchIdentifier
+# imported so it is registered, see get_registry
+from ...subject_identifier import SubjectIdentifier  # noqa: F401
+
+
+def get_registry():
+    """Returns a dictionary of {label: (checkdigit, separator)} for
+    the imported ResearchIdentifier classes, at least SubjectIdentifier.
+
+    If subclasses share a label, the first found is used.
+    """
+    registry = {}
+    classes = [ResearchIdentifier]
+    while classes:
+        cls = classes.pop(0)
+        classes.extend(cls.__subclasses__())
+        if cls.label and cls.label not in registry:
+            template = cls.identifier_template or IdentifierTemplate
+            registry[cls.label] = (cls.checkdigit, template.separator)
+    return registry
+
+
+class Command(BaseCommand):
+
+    help = (
+        'Verify the check digit of each research identifier in IdentifierModel '
+        'and write the invalid rows to a JSON lines report.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--label', action='append', default=None,
+            help='identifier label to verify, e.g. subjectidentifier '
+                 '(default: all registered, may be repeated)')
+        parser.add_argument(
+            '--chunk-size', type=int, default=2000,
+            help='rows read per query (default: 2000)')
+        parser.add_argument(
+            '--workers', type=int, default=0,
+            help='verify chunks in this many worker processes (default: 0)')
+        parser.add_argument(
+            '--report', default=None,
+            help='report file name (default: stdout)')
+
+    def handle(self, *args, **options):
+        registry = get_registry()
+        labels = options['label'] or list(registry)
+        for label in labels:
+            if label not in registry:
+                raise CommandError(
+                    f'Unknown identifier label. Expected one of {list(registry)}. '
+                    f'Got {label}.')
+        if options['chunk_size'] < 1:
+            raise CommandError(f'Invalid chunk size. Got {options["chunk_size"]}.')
+        registry = {label: registry[label] for label in labels}
+        report = open(options['report'], 'w') if options['report'] else self.stdout
+        try:
+            checked, invalid = self.verify(
+                registry, report, options['chunk_size'], options['workers'])
+        finally:
+            if options['report']:
+                report.close()
+        self.stderr.write(
+            f'Verified {checked} identifiers for {", ".join(labels)}. '
+            f'{invalid} invalid.')
+
+    def verify(self, registry, report, chunk_size, workers):
+        """Verifies the chunks in this process or in a pool of
+        workers. At most two chunks per worker are in flight.
+
+        Each worker calls `django.setup()` before its first chunk so
+        the pool also works with the spawn and forkserver start
+        methods, see setup_worker.
+        """
+        checked, invalid = 0, 0
+        if workers:
+            with ProcessPoolExecutor(max_workers=workers, initializer=setup_worker) as executor:
+                futures = []
+                for rows in self.chunks(registry, chunk_size):
+                    checked += len(rows)
+                    futures.append(executor.submit(verify_chunk, registry, rows))
+                    if len(futures) >= workers * 2:
+                        invalid += self.write(report, futures.pop(0).result())
+                for future in futures:
+                    invalid += self.write(report, future.result())
+        else:
+            for rows in self.chunks(registry, chunk_size):
+                checked += len(rows)
+                invalid += self.write(report, verify_chunk(registry, rows))
+        return checked, invalid
+
+    def chunks(self, registry, chunk_size):
+        """Yields lists of rows from IdentifierModel using keyset
+        pagination on the primary key.
+        """
+        queryset = IdentifierModel.objects.filter(name__in=list(registry)).order_by('pk')
+        last_pk = None
+        while True:
+            page = queryset if last_pk is None else queryset.filter(pk__gt=last_pk)
+            rows = list(page.values_list(
+                'pk', 'name', 'identifier_type', 'identifier')[:chunk_size].iterator(
+                    chunk_size=chunk_size))
+            if not rows:
+                break
+            last_pk = rows[-1][0]
+            yield rows
+
+    def write(self, report, rows):
+        for pk, name, identifier_type, identifier in rows:
+            report.write(json.dumps(dict(
+                id=str(pk), name=name,
+                identifier_type=identifier_type,
+                identifier=identifier)) + '\n')
+        return len(rows)
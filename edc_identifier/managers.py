@@ -1,4 +1,6 @@
-from django.db import models
+from django.db import models, router, transaction
+
+from .simple_identifier import IdentifierError
 
 
 class SubjectIdentifierManager(models.Manager):
@@ -17,3 +19,39 @@ class TrackingIdentifierManager(models.Manager):
 
     def get_by_natural_key(self, tracking_identifier):
         return self.get(tracking_identifier=tracking_identifier,)
+
+    def bulk_create(self, objs, *args, **kwargs):
+        """Assigns a tracking identifier to each instance without one,
+        see `assign_tracking_identifiers`, and inserts the instances
+        in the same transaction, on the database of this manager.
+        """
+        objs = list(objs)
+        using = self._db or router.db_for_write(self.model)
+        with transaction.atomic(using=using):
+            self.assign_tracking_identifiers(objs, using=using)
+            return super().bulk_create(objs, *args, **kwargs)
+
+    def assign_tracking_identifiers(self, objs, using=None):
+        """Sets a new tracking identifier on each unsaved instance
+        without one and returns them.
+
+        The identifiers are allocated together on the database
+        `using`, see SimpleUniqueIdentifier.allocate. Collisions are
+        only caught by the unique constraint, so
+        `tracking_identifier_cls` must insert first, as
+        TrackingIdentifier does.
+        """
+        objs = [obj for obj in objs if not obj.tracking_identifier]
+        if objs:
+            if not self.model.tracking_identifier_cls.insert_first:
+                raise IdentifierError(
+                    'Expected a tracking_identifier_cls with insert_first to bulk_create. '
+                    f'Got {self.model._meta.label_lower}.tracking_identifier_cls='
+                    f'{self.model.tracking_identifier_cls.__name__}.')
+            identifiers = self.model.tracking_identifier_cls(
+                identifier_prefix=self.model.tracking_identifier_prefix,
+                identifier_type=self.model._meta.label_lower,
+                lazy=True).allocate(len(objs), using=using)
+            for obj, identifier in zip(objs, identifiers):
+                obj.tracking_identifier = identifier
+        return objs
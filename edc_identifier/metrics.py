@@ -0,0 +1,58 @@
+import threading
+
+from collections import defaultdict
+
+
+class Metrics:
+
+    """A per-process registry of named counters and gauges.
+
+    Usage:
+
+        from edc_identifier.metrics import metrics
+
+        >>> metrics.get('research_identifier.subjectidentifier.retries')
+        3
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counters = defaultdict(int)
+        self.gauges = {}
+
+    def __repr__(self):
+        return f'{self.__class__.__name__}()'
+
+    def incr(self, name, value=None):
+        """Increments the counter `name` by value (default 1).
+        """
+        with self.lock:
+            self.counters[name] += 1 if value is None else value
+
+    def set(self, name, value):
+        """Sets the gauge `name` to value.
+        """
+        with self.lock:
+            self.gauges[name] = value
+
+    def get(self, name, default=None):
+        """Returns the value of a counter or gauge.
+        """
+        with self.lock:
+            if name in self.counters:
+                return self.counters[name]
+            return self.gauges.get(name, 0 if default is None else default)
+
+    def as_dict(self):
+        """Returns a copy of all counters and gauges.
+        """
+        with self.lock:
+            return {**self.counters, **self.gauges}
+
+    def reset(self):
+        with self.lock:
+            self.counters.clear()
+            self.gauges.clear()
+
+
+metrics = Metrics()
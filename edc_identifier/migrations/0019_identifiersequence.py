@@ -0,0 +1,64 @@
+import _socket
+from django.db import migrations, models
+from django.db.models import Max
+import django.db.models.deletion
+import django_revision.revision_field
+import edc_base.model_fields.hostname_modification_field
+import edc_base.model_fields.userfield
+import edc_base.model_fields.uuid_auto_field
+import edc_base.utils
+
+
+def seed_identifier_sequence(apps, schema_editor):
+    """Seeds the counters from the highest sequence number in
+    IdentifierModel per name, site and device_id.
+    """
+    IdentifierModel = apps.get_model('edc_identifier', 'identifiermodel')
+    IdentifierSequence = apps.get_model('edc_identifier', 'identifiersequence')
+    rows = (
+        IdentifierModel.objects.exclude(name='')
+        .values('name', 'site', 'device_id')
+        .annotate(max_sequence_number=Max('sequence_number'))
+        .order_by())
+    IdentifierSequence.objects.bulk_create([
+        IdentifierSequence(
+            label=row['name'],
+            site_id=row['site'],
+            device_id=row['device_id'],
+            sequence_number=row['max_sequence_number'] or 0)
+        for row in rows])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sites', '0002_alter_domain_unique'),
+        ('edc_identifier', '0018_auto_20180128_1054'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IdentifierSequence',
+            fields=[
+                ('created', models.DateTimeField(blank=True, default=edc_base.utils.get_utcnow)),
+                ('modified', models.DateTimeField(blank=True, default=edc_base.utils.get_utcnow)),
+                ('user_created', edc_base.model_fields.userfield.UserField(blank=True, help_text='Updated by admin.save_model', max_length=50, verbose_name='user created')),
+                ('user_modified', edc_base.model_fields.userfield.UserField(blank=True, help_text='Updated by admin.save_model', max_length=50, verbose_name='user modified')),
+                ('hostname_created', models.CharField(blank=True, default=_socket.gethostname, help_text='System field. (modified on create only)', max_length=60)),
+                ('hostname_modified', edc_base.model_fields.hostname_modification_field.HostnameModificationField(blank=True, help_text='System field. (modified on every save)', max_length=50)),
+                ('revision', django_revision.revision_field.RevisionField(blank=True, editable=False, help_text='System field. Git repository tag:branch:commit.', max_length=75, null=True, verbose_name='Revision')),
+                ('device_created', models.CharField(blank=True, max_length=10)),
+                ('device_modified', models.CharField(blank=True, max_length=10)),
+                ('id', edc_base.model_fields.uuid_auto_field.UUIDAutoField(blank=True, editable=False, help_text='System auto field. UUID primary key.', primary_key=True, serialize=False)),
+                ('label', models.CharField(max_length=100)),
+                ('device_id', models.IntegerField()),
+                ('sequence_number', models.IntegerField(default=0)),
+                ('site', models.ForeignKey(editable=False, null=True, on_delete=django.db.models.deletion.PROTECT, to='sites.Site')),
+            ],
+            options={
+                'unique_together': {('label', 'site', 'device_id')},
+            },
+        ),
+        migrations.RunPython(
+            seed_identifier_sequence, reverse_code=migrations.RunPython.noop),
+    ]
@@ -0,0 +1,24 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sites', '0002_alter_domain_unique'),
+        ('edc_identifier', '0020_identifiersequencegap'),
+    ]
+
+    operations = [
+        migrations.AlterUniqueTogether(
+            name='identifiermodel',
+            unique_together=set(),
+        ),
+        migrations.AddIndex(
+            model_name='identifiermodel',
+            index=models.Index(fields=['name', 'device_id', 'site', 'sequence_number'], name='edc_ident_name_seq_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='identifiermodel',
+            index=models.Index(fields=['identifier_type', 'sequence_number'], name='edc_ident_type_seq_idx'),
+        ),
+    ]
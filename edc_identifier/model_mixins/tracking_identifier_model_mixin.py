@@ -9,6 +9,7 @@ class TrackingIdentifier(SimpleUniqueIdentifier):
     template = '{device_id}{timestamp}{random_string}'
     identifier_cls = SimpleTimestampIdentifier
     make_human_readable = True
+    insert_first = True
 
 
 class TrackingIdentifierModelMixin(models.Model):
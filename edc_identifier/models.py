@@ -1,4 +1,8 @@
-from django.db import models
+import secrets
+
+from django.core.exceptions import ObjectDoesNotExist
+from django.db import IntegrityError, models, transaction
+from django.db.models import F, Max, Sum
 from edc_base.model_mixins import BaseUuidModel
 from edc_base.sites.site_model_mixin import SiteModelMixin
 
@@ -8,6 +12,14 @@ class IdentifierModelManager(models.Manager):
     def get_by_natural_key(self, identifier):
         return self.get(identifier=identifier)
 
+    def last_sequence_number(self, name=None, site=None, device_id=None):
+        """Returns the highest sequence number issued for this name,
+        site and device_id or 0.
+        """
+        return self.filter(
+            name=name, site=site, device_id=device_id).aggregate(
+                Max('sequence_number'))['sequence_number__max'] or 0
+
     @property
     def formatted_sequence(self):
         """Returns a padded sequence segment for the identifier
@@ -53,4 +65,337 @@ class IdentifierModel(SiteModelMixin, BaseUuidModel):
     class Meta:
         app_label = 'edc_identifier'
         ordering = ['sequence_number', ]
-        unique_together = ('name', 'identifier')
+        indexes = [
+            # ResearchIdentifier, IdentifierSequence
+            models.Index(
+                fields=['name', 'device_id', 'site', 'sequence_number'],
+                name='edc_ident_name_seq_idx'),
+            # Identifier.last_identifier
+            models.Index(
+                fields=['identifier_type', 'sequence_number'],
+                name='edc_ident_type_seq_idx'),
+        ]
+
+
+class IdentifierSequenceManager(models.Manager):
+
+    def get_by_natural_key(self, label, device_id, domain):
+        return self.get(label=label, device_id=device_id, site__domain=domain)
+
+    def reserve(self, label=None, site=None, device_id=None, count=None,
+                reconcile=None, after=None):
+        """Returns the first of `count` consecutive sequence numbers
+        reserved for this label, site and device_id.
+
+        The counter row is locked with `select_for_update` for the
+        duration of the transaction. A missing counter is seeded
+        from the highest sequence number in IdentifierModel. If
+        `reconcile`, an existing counter is first moved up to that
+        number, e.g. after identifiers were allocated without the
+        counter, see OptimisticSequenceAllocator. The numbers
+        reserved are always greater than `after`, if given.
+        """
+        count = count or 1
+        with transaction.atomic():
+            try:
+                obj = self.select_for_update().get(
+                    label=label, site=site, device_id=device_id)
+            except ObjectDoesNotExist:
+                obj = self._create_for_update(
+                    label=label, site=site, device_id=device_id)
+            else:
+                if reconcile:
+                    obj.sequence_number = max(
+                        obj.sequence_number,
+                        IdentifierModel.objects.last_sequence_number(
+                            name=label, site=site, device_id=device_id))
+            obj.sequence_number = max(obj.sequence_number, after or 0)
+            first = obj.sequence_number + 1
+            obj.sequence_number += count
+            obj.save(update_fields=['sequence_number', 'modified'])
+        return first
+
+    def _create_for_update(self, label=None, site=None, device_id=None):
+        """Returns a new, locked counter seeded from IdentifierModel or,
+        if another process created it first, the existing one.
+        """
+        sequence_number = IdentifierModel.objects.last_sequence_number(
+            name=label, site=site, device_id=device_id)
+        try:
+            with transaction.atomic():
+                self.create(
+                    label=label, site=site, device_id=device_id,
+                    sequence_number=sequence_number)
+        except IntegrityError:
+            pass
+        return self.select_for_update().get(
+            label=label, site=site, device_id=device_id)
+
+
+class IdentifierSequence(SiteModelMixin, BaseUuidModel):
+
+    """A counter of the last sequence number allocated per
+    label, site and device_id.
+
+    See ResearchIdentifier.
+    """
+
+    label = models.CharField(max_length=100)
+
+    device_id = models.IntegerField()
+
+    sequence_number = models.IntegerField(default=0)
+
+    objects = IdentifierSequenceManager()
+
+    def __str__(self):
+        return f'{self.label} {self.device_id} {self.sequence_number}'
+
+    def natural_key(self):
+        return (self.label, self.device_id) + self.site.natural_key()
+    natural_key.dependencies = ['sites.Site']
+
+    class Meta:
+        app_label = 'edc_identifier'
+        unique_together = ('label', 'site', 'device_id')
+
+
+class IdentifierSequenceGapManager(models.Manager):
+
+    def get_by_natural_key(self, label, device_id, first_sequence_number, domain):
+        return self.get(label=label, device_id=device_id,
+                        first_sequence_number=first_sequence_number,
+                        site__domain=domain)
+
+
+class IdentifierSequenceGap(SiteModelMixin, BaseUuidModel):
+
+    """A range of sequence numbers reserved from IdentifierSequence
+    but never allocated.
+
+    See BlockSequenceAllocator.
+    """
+
+    label = models.CharField(max_length=100)
+
+    device_id = models.IntegerField()
+
+    first_sequence_number = models.IntegerField()
+
+    last_sequence_number = models.IntegerField()
+
+    objects = IdentifierSequenceGapManager()
+
+    def __str__(self):
+        return (f'{self.label} {self.device_id} '
+                f'{self.first_sequence_number}-{self.last_sequence_number}')
+
+    def natural_key(self):
+        return ((self.label, self.device_id, self.first_sequence_number)
+                + self.site.natural_key())
+    natural_key.dependencies = ['sites.Site']
+
+    class Meta:
+        app_label = 'edc_identifier'
+        ordering = ['label', 'first_sequence_number']
+
+
+class IdentifierSequenceRangeManager(models.Manager):
+
+    def get_by_natural_key(self, label, device_id, first_sequence_number, domain):
+        return self.get(label=label, device_id=device_id,
+                        first_sequence_number=first_sequence_number,
+                        site__domain=domain)
+
+    def grant(self, label=None, site=None, device_id=None, count=None):
+        """Returns a new range of `count` sequence numbers reserved
+        from the IdentifierSequence counter for a client device.
+
+        The range starts after the highest of the counter, the
+        sequence numbers issued in IdentifierModel and the ranges
+        already granted, so numbers in use are not granted again
+        if the counter is behind, e.g. after a fixture was reloaded.
+
+        Call on the server.
+        """
+        with transaction.atomic():
+            last_granted = self.filter(
+                label=label, site=site, device_id=device_id).aggregate(
+                    Max('last_sequence_number'))['last_sequence_number__max']
+            first = IdentifierSequence.objects.reserve(
+                label=label, site=site, device_id=device_id, count=count,
+                reconcile=True, after=last_granted)
+            return self.create(
+                label=label,
+                site=site,
+                device_id=device_id,
+                first_sequence_number=first,
+                last_sequence_number=first + count - 1,
+                next_sequence_number=first)
+
+    def available(self, label=None, site=None, device_id=None):
+        """Returns a queryset of ranges with unused sequence numbers,
+        oldest first.
+        """
+        return self.filter(
+            label=label, site=site, device_id=device_id,
+            next_sequence_number__lte=F('last_sequence_number')).order_by(
+                'first_sequence_number')
+
+    def remaining(self, label=None, site=None, device_id=None):
+        """Returns the number of unused sequence numbers.
+        """
+        return self.available(
+            label=label, site=site, device_id=device_id).aggregate(
+                remaining=Sum(F('last_sequence_number') - F('next_sequence_number') + 1)
+        )['remaining'] or 0
+
+
+class IdentifierSequenceRange(SiteModelMixin, BaseUuidModel):
+
+    """A range of sequence numbers granted by the server to a
+    client device to allocate from while offline.
+
+    See ReservedRangeSequenceAllocator.
+    """
+
+    label = models.CharField(max_length=100)
+
+    device_id = models.IntegerField()
+
+    first_sequence_number = models.IntegerField()
+
+    last_sequence_number = models.IntegerField()
+
+    next_sequence_number = models.IntegerField()
+
+    objects = IdentifierSequenceRangeManager()
+
+    def __str__(self):
+        return (f'{self.label} {self.device_id} '
+                f'{self.first_sequence_number}-{self.last_sequence_number}')
+
+    def natural_key(self):
+        return ((self.label, self.device_id, self.first_sequence_number)
+                + self.site.natural_key())
+    natural_key.dependencies = ['sites.Site']
+
+    @property
+    def remaining(self):
+        return max(0, self.last_sequence_number - self.next_sequence_number + 1)
+
+    class Meta:
+        app_label = 'edc_identifier'
+        ordering = ['label', 'first_sequence_number']
+        unique_together = ('label', 'site', 'device_id', 'first_sequence_number')
+
+
+class ShortIdentifierSequenceManager(models.Manager):
+
+    def get_by_natural_key(self, name, prefix):
+        return self.get(name=name, prefix=prefix)
+
+    def reserve(self, name=None, prefix=None, count=None):
+        """Returns a tuple of (sequence number, key) where sequence
+        number is the first of `count` consecutive sequence numbers
+        reserved for this name and prefix.
+
+        The counter row is locked with `select_for_update` for the
+        duration of the transaction. A missing counter is created
+        with a new random key.
+        """
+        count = count or 1
+        prefix = prefix or ''
+        with transaction.atomic():
+            try:
+                obj = self.select_for_update().get(name=name, prefix=prefix)
+            except ObjectDoesNotExist:
+                try:
+                    with transaction.atomic():
+                        self.create(name=name, prefix=prefix, key=secrets.token_hex(32))
+                except IntegrityError:
+                    pass
+                obj = self.select_for_update().get(name=name, prefix=prefix)
+            first = obj.sequence_number + 1
+            obj.sequence_number += count
+            obj.save(update_fields=['sequence_number', 'modified'])
+        return first, obj.key
+
+
+class ShortIdentifierSequence(BaseUuidModel):
+
+    """A counter of the last sequence number allocated per short
+    identifier name and prefix, and the key of the permutation that
+    maps it to an identifier.
+
+    See PermutationAllocator.
+    """
+
+    name = models.CharField(max_length=100)
+
+    prefix = models.CharField(max_length=25, blank=True, default='')
+
+    sequence_number = models.BigIntegerField(default=0)
+
+    key = models.CharField(max_length=64, editable=False)
+
+    objects = ShortIdentifierSequenceManager()
+
+    def __str__(self):
+        return f'{self.name} {self.prefix} {self.sequence_number}'
+
+    def natural_key(self):
+        return (self.name, self.prefix)
+
+    class Meta:
+        app_label = 'edc_identifier'
+        unique_together = ('name', 'prefix')
+
+
+class ShortIdentifierPoolManager(models.Manager):
+
+    def claim(self, name=None, prefix=None):
+        """Returns an identifier removed from the pool for this name
+        and prefix or None if the pool is empty.
+
+        Rows locked by another transaction are skipped so concurrent
+        claims do not wait on each other.
+        """
+        with transaction.atomic():
+            obj = self.select_for_update(skip_locked=True).filter(
+                name=name, prefix=prefix or '').order_by('created').first()
+            if not obj:
+                return None
+            obj.delete()
+        return obj.identifier
+
+    def available(self, name=None, prefix=None):
+        return self.filter(name=name, prefix=prefix or '').count()
+
+
+class ShortIdentifierPool(BaseUuidModel):
+
+    """Short identifiers issued to the pool of a name and prefix but
+    not yet claimed.
+
+    Each identifier is already in IdentifierModel. See PoolAllocator.
+    """
+
+    name = models.CharField(max_length=100)
+
+    prefix = models.CharField(max_length=25, blank=True, default='')
+
+    identifier = models.CharField(max_length=50, unique=True)
+
+    objects = ShortIdentifierPoolManager()
+
+    def __str__(self):
+        return f'{self.identifier} {self.name}'
+
+    class Meta:
+        app_label = 'edc_identifier'
+        indexes = [
+            models.Index(
+                fields=['name', 'prefix', 'created'],
+                name='edc_ident_pool_name_idx'),
+        ]
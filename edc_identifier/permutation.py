@@ -0,0 +1,52 @@
+from hashlib import blake2b
+from math import isqrt
+
+
+class FeistelPermutation:
+
+    """A keyed permutation of the integers 0 to size - 1.
+
+    A balanced Feistel network permutes the a x a grid that covers
+    `size` and values outside the range are walked along their cycle
+    until they fall back inside it (cycle walking).
+
+    Usage:
+
+        >>> permutation = FeistelPermutation(27 ** 5, key=b'secret')
+        >>> permutation.permute(0)
+        12863196
+    """
+
+    rounds = 6
+
+    def __init__(self, size=None, key=None, rounds=None):
+        self.size = size
+        self.key = key
+        self.rounds = rounds or self.rounds
+        self.side = isqrt(max(0, size - 1)) + 1
+
+    def __repr__(self):
+        return f'{self.__class__.__name__}(size={self.size}, rounds={self.rounds})'
+
+    def permute(self, value):
+        """Returns the image of value, 0 <= value < size.
+        """
+        if not 0 <= value < self.size:
+            raise ValueError(f'Value out of range. Expected 0-{self.size - 1}. Got {value}.')
+        value = self.encrypt(value)
+        while value >= self.size:
+            value = self.encrypt(value)
+        return value
+
+    def encrypt(self, value):
+        side = self.side
+        left, right = divmod(value, side)
+        for round_number in range(0, self.rounds):
+            left, right = right, (left + self.round_function(round_number, right)) % side
+        return left * side + right
+
+    def round_function(self, round_number, value):
+        digest = blake2b(
+            value.to_bytes(8, 'little') + bytes([round_number]),
+            key=self.key, digest_size=8).digest()
+        return int.from_bytes(digest, 'little')
@@ -0,0 +1,111 @@
+import os
+import random
+import threading
+
+ALPHABET = 'ABCDEFGHKMNPRTUVWXYZ2346789'
+
+
+class RandomStringGenerator:
+
+    """Draws random strings of characters from an alphabet.
+
+    Random bytes are read in bulk from `os.urandom`, or from
+    `random.Random(seed)` if seeded, and mapped to the alphabet with
+    `bytes.translate`. Bytes at or above the largest multiple of the
+    alphabet size are dropped (rejection sampling) so each character
+    is equally likely.
+
+    Characters drawn but not used are kept for the next call, up to
+    `buffer_size`. The buffer is emptied in a forked child process.
+
+    Usage:
+
+        >>> generator = get_generator(ALPHABET)
+        >>> generator.get_random_strings(5, 3)
+        ['K2MRT', 'ZH7AE', '4PXCU']
+    """
+
+    buffer_size = 4096
+
+    def __init__(self, alphabet=None, seed=None):
+        self.alphabet = alphabet or ALPHABET
+        self.seed = seed
+        try:
+            encoded = self.alphabet.encode('latin-1')
+        except UnicodeEncodeError:
+            raise ValueError(
+                f'Expected an alphabet of latin-1 characters. Got {self.alphabet}.')
+        size = len(encoded)
+        if not 0 < size <= 256:
+            raise ValueError(
+                f'Expected an alphabet of 1 to 256 characters. Got {self.alphabet}.')
+        self.limit = 256 - 256 % size
+        self.table = bytes(encoded[i % size] for i in range(0, 256))
+        self.rejected = bytes(range(self.limit, 256))
+        self.random = None if seed is None else random.Random(seed)
+        self.buffer = ''
+        self.lock = threading.Lock()
+
+    def __repr__(self):
+        return f'{self.__class__.__name__}(alphabet={self.alphabet!r}, seed={self.seed})'
+
+    def get_random_string(self, length):
+        return self.get_random_chars(length)
+
+    def get_random_strings(self, length, count):
+        """Returns a list of `count` random strings of `length`
+        characters.
+        """
+        chars = self.get_random_chars(length * count)
+        return [chars[i:i + length] for i in range(0, length * count, length)]
+
+    def get_random_chars(self, number):
+        with self.lock:
+            chars = self.buffer
+            while len(chars) < number:
+                # enough bytes, on average, for the characters still needed
+                needed = max(number - len(chars), self.buffer_size)
+                chars += self.get_random_bytes(needed * 256 // self.limit + 16).translate(
+                    self.table, self.rejected).decode('latin-1')
+            self.buffer = chars[number:number + self.buffer_size]
+            return chars[:number]
+
+    def get_random_bytes(self, number):
+        if self.random:
+            return self.random.getrandbits(number * 8).to_bytes(number, 'little')
+        return os.urandom(number)
+
+    def reset(self):
+        with self.lock:
+            self.buffer = ''
+
+
+generators = {}
+generators_lock = threading.Lock()
+
+
+def get_generator(alphabet=None, seed=None):
+    """Returns the shared RandomStringGenerator for this alphabet
+    and seed.
+    """
+    key = (alphabet or ALPHABET, seed)
+    generator = generators.get(key)
+    if not generator:
+        with generators_lock:
+            generator = generators.setdefault(key, RandomStringGenerator(*key))
+    return generator
+
+
+def reset_generators():
+    """Empties the buffer of each shared generator.
+
+    Called in a forked child so it does not repeat the characters
+    buffered by its parent.
+    """
+    for generator in list(generators.values()):
+        generator.lock = threading.Lock()
+        generator.reset()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=reset_generators)
@@ -1,42 +1,69 @@
+import random
+import time
+
+from asgiref.sync import sync_to_async
 from django.apps import apps as django_apps
 from django.contrib.sites.models import Site
-from string import Formatter
+from django.db import IntegrityError, transaction
 
 from .checkdigit_mixins import LuhnMixin
-from .exceptions import IdentifierError
+from .exceptions import IdentifierError, IdentifierMissingTemplateValue
+from .identifier_template import compile_template
+from .metrics import metrics
 from .models import IdentifierModel
+from .sequence_allocators import SequenceAllocator
 
 
-class IdentifierMissingTemplateValue(Exception):
-    pass
+class ResearchIdentifier:
 
+    """Base class for research identifiers.
 
-class ResearchIdentifier:
+    The `template` of a subclass is compiled once when the class is
+    defined, see IdentifierTemplate. Template fields must be
+    attributes of the class.
+    """
 
     label = None  # e.g. subject_identifier, plot_identifier, etc
     identifier_type = None  # e.g. 'subject', 'infant', 'plot', a.k.a subject_type
     template = None
+    identifier_template = None
     padding = 5
     checkdigit = LuhnMixin()
     identifier_model_cls = IdentifierModel
+    sequence_allocator = SequenceAllocator()
+
+    device_id = None
+    protocol_number = None
+    requesting_model = None
+    site = None
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        if cls.template:
+            cls.identifier_template = compile_template(cls.template, cls.padding)
+            cls.identifier_template.validate(cls)
 
     def __init__(self, identifier_type=None, template=None,
                  device_id=None, protocol_number=None, site=None,
-                 requesting_model=None, identifier=None):
+                 requesting_model=None, identifier=None, lazy=None):
 
         self._identifier = None
+        self._sequence_number = None
         self.requesting_model = requesting_model
         if not self.requesting_model:
             raise IdentifierError('Invalid requesting_model. Got None')
         self.identifier_type = identifier_type or self.identifier_type
         if not self.identifier_type:
             raise IdentifierError('Invalid identifier_type. Got None')
-        self.template = template or self.template
+        if template:
+            self.template = template
+            self.identifier_template = compile_template(template, self.padding)
+            self.identifier_template.validate(self.__class__)
         app_config = django_apps.get_app_config('edc_device')
         self.device_id = device_id or app_config.device_id
         app_config = django_apps.get_app_config('edc_protocol')
         self.protocol_number = protocol_number or app_config.protocol_number
-        self.site = site or Site.objects.get_current()
+        self.site = site if lazy else (site or Site.objects.get_current())
         if identifier:
             # load an existing identifier
             self.identifier_model = self.identifier_model_cls.objects.get(
@@ -44,7 +71,8 @@ class ResearchIdentifier:
             self._identifier = self.identifier_model.identifier
             self.subject_type = self.identifier_model.subject_type
             self.site = self.identifier_model.site
-        self.identifier
+        if not lazy:
+            self.identifier
 
     def __repr__(self):
         return f'{self.__class__.__name__}({self.label})'
@@ -52,74 +80,185 @@ class ResearchIdentifier:
     def __str__(self):
         return self.identifier
 
+    @classmethod
+    def bulk_allocate(cls, count, site=None, requesting_model=None, **kwargs):
+        """Returns a list of `count` new identifiers in allocation order.
+
+        The sequence range is reserved once and the IdentifierModel
+        instances are written with `bulk_create` in one transaction.
+        See also `bulk_post_identifier`.
+        """
+        obj = cls(site=site, requesting_model=requesting_model, lazy=True, **kwargs)
+        return obj.allocate(count)
+
     @property
     def identifier(self):
         """Returns a new and unique identifier and updates
         the IdentifierModel.
         """
         if not self._identifier:
+            self.site = self.site or Site.objects.get_current()
             self.pre_identifier()
-            self._identifier = self.template.format(**self.template_opts)
-            check_digit = self.checkdigit.calculate_checkdigit(
-                ''.join(self._identifier.split('-')))
-            self._identifier = f'{self._identifier}-{check_digit}'
-            self.identifier_model = self.identifier_model_cls.objects.create(
-                name=self.label,
-                sequence_number=self.sequence_number,
-                identifier=self._identifier,
-                protocol_number=self.protocol_number,
-                device_id=self.device_id,
-                model=self.requesting_model,
-                site=self.site,
-                identifier_type=self.identifier_type)
+            self.identifier_model = self.create_identifier_model()
             self.post_identifier()
         return self._identifier
 
+    async def aidentifier(self):
+        """Returns a new and unique identifier and updates
+        the IdentifierModel, see `identifier`.
+
+        The sync allocation, with its transaction and row locks, is
+        run with `sync_to_async(thread_sensitive=False)`, on a thread
+        and connection of its own, see README. Instantiate with
+        lazy=True, for example:
+
+            obj = SubjectIdentifier(lazy=True, **options)
+            identifier = await obj.aidentifier()
+        """
+        if not self._identifier:
+            await sync_to_async(lambda: self.identifier, thread_sensitive=False)()
+        return self._identifier
+
+    def create_identifier_model(self):
+        """Sets a new identifier and returns the IdentifierModel
+        instance created for it.
+
+        The sequence number is reserved and the identifier inserted
+        in one transaction. If the sequence allocator allows retries,
+        a conflict on the unique identifier is retried, after that
+        transaction has rolled back, with a new sequence number.
+        """
+        tries = 0
+        while True:
+            try:
+                with transaction.atomic():
+                    self._identifier = self.make_identifier(self.template_opts)
+                    return self.identifier_model_cls.objects.create(
+                        **self.get_identifier_model_options(
+                            self._identifier, self.sequence_number))
+            except IntegrityError:
+                self._identifier = None
+                tries += 1
+                if tries > self.sequence_allocator.retries:
+                    metrics.incr(f'research_identifier.{self.label}.failures')
+                    raise
+                self.retry()
+
+    def retry(self):
+        """Counts the retry and clears the sequence number so that a
+        new one is allocated.
+
+        Waits a random delay of up to `jitter` seconds unless called
+        within a transaction, e.g. ATOMIC_REQUESTS, so no locks are
+        held while waiting.
+        """
+        metrics.incr(f'research_identifier.{self.label}.retries')
+        self._sequence_number = None
+        if self.sequence_allocator.jitter and not transaction.get_connection().in_atomic_block:
+            time.sleep(random.uniform(0, self.sequence_allocator.jitter))
+
+    def make_identifier(self, template_opts):
+        """Returns an identifier with check digit for these template
+        key/values, see `template_opts`.
+        """
+        identifier = self.identifier_template.format(template_opts)
+        check_digit = self.checkdigit.calculate_checkdigit(
+            self.identifier_template.checkdigit_input(identifier))
+        return f'{identifier}-{check_digit}'
+
+    def allocate(self, count):
+        """Returns a list of `count` new identifiers reserved as one
+        sequence range.
+        """
+        self.site = self.site or Site.objects.get_current()
+        self.pre_identifier()
+        template_opts = self.get_template_opts()
+        tries = 0
+        while True:
+            try:
+                with transaction.atomic():
+                    first = self.sequence_allocator.reserve(
+                        label=self.label,
+                        site=self.site,
+                        device_id=self.device_id,
+                        count=count)
+                    identifiers = [
+                        self.make_identifier(dict(
+                            template_opts, sequence=self.format_sequence(sequence_number)))
+                        for sequence_number in range(first, first + count)]
+                    self.identifier_model_cls.objects.bulk_create([
+                        self.identifier_model_cls(
+                            **self.get_identifier_model_options(identifier, sequence_number))
+                        for sequence_number, identifier in enumerate(identifiers, first)])
+                    self.bulk_post_identifier(identifiers)
+            except IntegrityError:
+                tries += 1
+                if tries > self.sequence_allocator.retries:
+                    metrics.incr(f'research_identifier.{self.label}.failures')
+                    raise
+                self.retry()
+            else:
+                return identifiers
+
+    def get_identifier_model_options(self, identifier, sequence_number):
+        return dict(
+            name=self.label,
+            sequence_number=sequence_number,
+            identifier=identifier,
+            protocol_number=self.protocol_number,
+            device_id=self.device_id,
+            model=self.requesting_model,
+            site=self.site,
+            identifier_type=self.identifier_type)
+
     def pre_identifier(self):
         pass
 
     def post_identifier(self):
         pass
 
+    def bulk_post_identifier(self, identifiers):
+        """Called by `allocate` within the transaction that created
+        the IdentifierModel instances.
+        """
+        pass
+
     @property
     def template_opts(self):
         """Returns the template key/values, if a key from the template
         does not exist raises an exception.
         """
-        template_opts = {}
-        formatter = Formatter()
-        keys = [opt[1] for opt in formatter.parse(
-            self.template) if opt[1] not in ['sequence']]
-        template_opts.update(
-            sequence=str(self.sequence_number).rjust(self.padding, '0'))
-        for key in keys:
-            try:
-                value = getattr(self, key)
-            except AttributeError:
-                raise IdentifierMissingTemplateValue(
-                    f'Required option not provided. Got \'{key}\'.')
-            else:
-                if value:
-                    template_opts.update({key: value})
-                else:
-                    raise IdentifierMissingTemplateValue(
-                        f'Required option cannot be None. Got \'{key}\'.')
+        template_opts = self.get_template_opts()
+        template_opts.update(sequence=self.format_sequence(self.sequence_number))
         return template_opts
 
+    def get_template_opts(self):
+        """Returns the template key/values except `sequence`.
+
+        Override to change the values used in the template. The
+        values are read from the instance with the compiled template,
+        see IdentifierTemplate.
+        """
+        return dict(zip(
+            self.identifier_template.fields,
+            self.identifier_template.values(self)))
+
+    def format_sequence(self, sequence_number):
+        return str(sequence_number).rjust(self.padding, '0')
+
     @property
     def site_id(self):
         return str(self.site.pk)
 
     @property
     def sequence_number(self):
-        """Returns the next sequence number to use.
+        """Returns the sequence number reserved for this identifier.
+
+        See `sequence_allocator`.
         """
-        try:
-            identifier_model = IdentifierModel.objects.filter(
-                name=self.label,
-                device_id=self.device_id,
-                site=self.site).order_by('-sequence_number').first()
-            sequence_number = identifier_model.sequence_number + 1
-        except AttributeError:
-            sequence_number = 1
-        return sequence_number
+        if not self._sequence_number:
+            self._sequence_number = self.sequence_allocator.next_sequence_number(
+                label=self.label,
+                site=self.site,
+                device_id=self.device_id)
+        return self._sequence_number
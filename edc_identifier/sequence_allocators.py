@@ -0,0 +1,327 @@
+import atexit
+import logging
+import os
+import sys
+import threading
+import weakref
+
+from django.apps import apps as django_apps
+from django.db import DatabaseError, transaction
+
+from .exceptions import IdentifierSequenceRangeError
+from .metrics import metrics
+from .models import IdentifierModel, IdentifierSequence, IdentifierSequenceGap
+from .models import IdentifierSequenceRange
+
+logger = logging.getLogger(__name__)
+
+
+class SequenceAllocator:
+
+    """Allocates one sequence number per identifier from the
+    row-locked counter in IdentifierSequence.
+
+    The first reservation per label, site and device_id in a process
+    moves the counter up to the highest sequence number in
+    IdentifierModel. This picks up identifiers allocated without the
+    counter, for example, before switching from the
+    OptimisticSequenceAllocator.
+    """
+
+    identifier_sequence_cls = IdentifierSequence
+    retries = 0  # see ResearchIdentifier.create_identifier_model
+    jitter = 0
+
+    def __init__(self):
+        self.reconciled = set()
+
+    def __repr__(self):
+        return f'{self.__class__.__name__}()'
+
+    def next_sequence_number(self, label=None, site=None, device_id=None):
+        """Returns the next sequence number for this label, site
+        and device_id.
+        """
+        return self.reserve(label=label, site=site, device_id=device_id)
+
+    def reserve(self, label=None, site=None, device_id=None, count=None):
+        """Returns the first of `count` consecutive sequence numbers
+        reserved directly from the counter.
+        """
+        key = (label, getattr(site, 'pk', site), int(device_id))
+        first = self.identifier_sequence_cls.objects.reserve(
+            label=label, site=site, device_id=device_id, count=count,
+            reconcile=key not in self.reconciled)
+        transaction.on_commit(lambda: self.reconciled.add(key))
+        return first
+
+
+class BlockSequenceAllocator(SequenceAllocator):
+
+    """Allocates sequence numbers from blocks reserved per process
+    (hi-lo).
+
+    A block of `block_size` numbers is reserved from the counter in
+    one transaction and handed out from memory. The remainder of a
+    block only becomes available once the reserving transaction
+    commits so a rollback never leaks numbers that the counter
+    will issue again.
+
+    Numbers still unused when the process exits normally are
+    recorded in IdentifierSequenceGap, see `release`. This is best
+    effort: numbers held by a process that is killed (SIGKILL, OOM)
+    are not recorded and are never issued.
+
+    A forked child process starts with no blocks so it never hands
+    out numbers from a block held by its parent.
+
+    Usage:
+
+        class MySubjectIdentifier(SubjectIdentifier):
+            sequence_allocator = BlockSequenceAllocator()
+    """
+
+    identifier_sequence_gap_cls = IdentifierSequenceGap
+
+    def __init__(self, block_size=None):
+        super().__init__()
+        self._block_size = block_size
+        self.blocks = {}
+        self.lock = threading.Lock()
+        self.registered = False
+        block_sequence_allocators.add(self)
+
+    def __repr__(self):
+        return f'{self.__class__.__name__}(block_size={self._block_size})'
+
+    def reset(self):
+        """Forgets the blocks held in memory without recording them
+        as gaps.
+        """
+        self.lock = threading.Lock()
+        self.blocks = {}
+
+    @property
+    def block_size(self):
+        """Returns the block size, if not set on the instance, from
+        edc_identifier.AppConfig.
+        """
+        return self._block_size or django_apps.get_app_config(
+            'edc_identifier').sequence_block_size
+
+    def next_sequence_number(self, label=None, site=None, device_id=None):
+        key = (label, site.pk, int(device_id))
+        sequence_number = self._next_from_block(key)
+        if sequence_number:
+            return sequence_number
+        block_size = self.block_size
+        first = self.reserve(
+            label=label, site=site, device_id=device_id, count=block_size)
+        if block_size > 1:
+            transaction.on_commit(
+                lambda: self._add_block(key, first + 1, first + block_size - 1))
+        return first
+
+    def _next_from_block(self, key):
+        """Returns the next sequence number from the blocks held
+        for key or None.
+        """
+        with self.lock:
+            blocks = self.blocks.get(key)
+            if not blocks:
+                return None
+            block = blocks[0]
+            sequence_number = block[0]
+            if block[0] == block[1]:
+                blocks.pop(0)
+            else:
+                block[0] += 1
+            return sequence_number
+
+    def _add_block(self, key, first, last):
+        with self.lock:
+            self.blocks.setdefault(key, []).append([first, last])
+            if not self.registered:
+                atexit.register(self.release)
+                self.registered = True
+
+    def release(self):
+        """Records all unused sequence numbers held in memory as gaps
+        and empties the blocks.
+        """
+        with self.lock:
+            blocks, self.blocks = self.blocks, {}
+        gaps = []
+        for (label, site_id, device_id), ranges in blocks.items():
+            for first, last in ranges:
+                gaps.append(self.identifier_sequence_gap_cls(
+                    label=label,
+                    site_id=site_id,
+                    device_id=device_id,
+                    first_sequence_number=first,
+                    last_sequence_number=last))
+        if gaps:
+            try:
+                self.identifier_sequence_gap_cls.objects.bulk_create(gaps)
+            except DatabaseError as e:
+                ranges = [(gap.label, gap.first_sequence_number, gap.last_sequence_number)
+                          for gap in gaps]
+                sys.stderr.write(
+                    f'Unable to record unused identifier sequence numbers. '
+                    f'Got {ranges}. {e}\n')
+        return gaps
+
+
+block_sequence_allocators = weakref.WeakSet()
+
+
+def reset_block_sequence_allocators():
+    """Empties the blocks of each BlockSequenceAllocator.
+
+    Called in a forked child so it does not issue the sequence
+    numbers of its parent's blocks. The parent still holds them.
+    """
+    for allocator in list(block_sequence_allocators):
+        allocator.reset()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=reset_block_sequence_allocators)
+
+
+class OptimisticSequenceAllocator(SequenceAllocator):
+
+    """Allocates the next sequence number from the highest in
+    IdentifierModel without taking any locks.
+
+    A conflict on the unique identifier is resolved by the caller
+    retrying the insert in a savepoint up to `retries` times, each
+    after a random delay of up to `jitter` seconds. See
+    ResearchIdentifier.create_identifier_model.
+
+    The IdentifierSequence counter is not updated. If switching back
+    to a counter based allocator, the counter is reconciled on first
+    use, see SequenceAllocator. Do not run both at the same time for
+    the same label.
+    """
+
+    identifier_model_cls = IdentifierModel
+
+    def __init__(self, retries=None, jitter=None):
+        super().__init__()
+        self.retries = 5 if retries is None else retries
+        self.jitter = 0.05 if jitter is None else jitter
+
+    def __repr__(self):
+        return f'{self.__class__.__name__}(retries={self.retries}, jitter={self.jitter})'
+
+    def next_sequence_number(self, label=None, site=None, device_id=None):
+        return self.reserve(label=label, site=site, device_id=device_id)
+
+    def reserve(self, label=None, site=None, device_id=None, count=None):
+        sequence_number = self.identifier_model_cls.objects.filter(
+            name=label,
+            device_id=device_id,
+            site=site).order_by('-sequence_number').values_list(
+                'sequence_number', flat=True).first()
+        return (sequence_number or 0) + 1
+
+
+class ReservedRangeSequenceAllocator(SequenceAllocator):
+
+    """Allocates sequence numbers from ranges granted by the server
+    to this device, see IdentifierSequenceRange.
+
+    Allocation makes no server round trip. While fewer than
+    `low_watermark` numbers remain (default from
+    edc_identifier.AppConfig.sequence_range_low_watermark) each
+    allocation logs a warning. IdentifierSequenceRangeError is
+    raised when none remain.
+
+    Ranges are granted on the server with the management command
+    `grant_identifier_range` and loaded on the client with
+    `loaddata`.
+
+    Usage:
+
+        class MySubjectIdentifier(SubjectIdentifier):
+            sequence_allocator = ReservedRangeSequenceAllocator()
+    """
+
+    identifier_sequence_range_cls = IdentifierSequenceRange
+
+    def __init__(self, low_watermark=None):
+        super().__init__()
+        self._low_watermark = low_watermark
+
+    def __repr__(self):
+        return f'{self.__class__.__name__}(low_watermark={self._low_watermark})'
+
+    @property
+    def low_watermark(self):
+        if self._low_watermark is None:
+            return django_apps.get_app_config(
+                'edc_identifier').sequence_range_low_watermark
+        return self._low_watermark
+
+    def next_sequence_number(self, label=None, site=None, device_id=None):
+        opts = dict(label=label, site=site, device_id=device_id)
+        with transaction.atomic():
+            obj = self.identifier_sequence_range_cls.objects.available(
+                **opts).select_for_update().first()
+            if not obj:
+                self.raise_on_empty(**opts)
+            sequence_number = obj.next_sequence_number
+            obj.next_sequence_number += 1
+            obj.save(update_fields=['next_sequence_number', 'modified'])
+        if obj.remaining < self.low_watermark:
+            self.check_low_watermark(**opts)
+        return sequence_number
+
+    def reserve(self, label=None, site=None, device_id=None, count=None):
+        """Returns the first of `count` consecutive sequence numbers
+        taken from one reserved range.
+        """
+        count = count or 1
+        opts = dict(label=label, site=site, device_id=device_id)
+        with transaction.atomic():
+            for obj in self.identifier_sequence_range_cls.objects.available(
+                    **opts).select_for_update():
+                if obj.remaining >= count:
+                    break
+            else:
+                raise IdentifierSequenceRangeError(
+                    f'No reserved range has {count} unused sequence numbers. '
+                    f'Request a new range from the server. Got {opts}.')
+            first = obj.next_sequence_number
+            obj.next_sequence_number += count
+            obj.save(update_fields=['next_sequence_number', 'modified'])
+        self.check_low_watermark(**opts)
+        return first
+
+    def raise_on_empty(self, **opts):
+        metrics.set(self.metric_name(**opts), 0)
+        raise IdentifierSequenceRangeError(
+            'No reserved sequence numbers remain for this device. '
+            f'Request a new range from the server. Got {opts}.')
+
+    def check_low_watermark(self, label=None, site=None, device_id=None):
+        """Logs a warning if fewer than `low_watermark` sequence
+        numbers remain.
+        """
+        remaining = self.identifier_sequence_range_cls.objects.remaining(
+            label=label, site=site, device_id=device_id)
+        self.warn(remaining, label=label, site=site, device_id=device_id)
+        return remaining
+
+    def warn(self, remaining, **opts):
+        metrics.set(self.metric_name(**opts), remaining)
+        if remaining < self.low_watermark:
+            logger.warning(
+                f'Reserved identifier sequence numbers are running low. '
+                f'{remaining} remaining for label={opts.get("label")}, '
+                f'site={opts.get("site")}, device_id={opts.get("device_id")}. '
+                'Request a new range from the server.')
+
+    def metric_name(self, label=None, site=None, device_id=None):
+        return f'sequence_range.{label}.{getattr(site, "pk", site)}.{device_id}.remaining'
@@ -1,10 +1,16 @@
-import random
 import re
 
+from asgiref.sync import sync_to_async
+from math import ceil, log
+
 from django.apps import apps as django_apps
-from django.core.exceptions import ObjectDoesNotExist
+from django.db import IntegrityError, transaction
+from django.db.models.functions import Length
 
 from .checkdigit_mixins import LuhnOrdMixin
+from .identifier_filter import get_identifier_filter
+from .keyspace import Keyspace, get_random_string_length
+from .random_string import ALPHABET, get_generator
 from .models import IdentifierModel
 
 
@@ -34,16 +40,30 @@ class ShortIdentifier:
     identifier_model_cls = IdentifierModel
 
     prefix = None
-    seed = None
+    seed = None  # not used, see test_random_seed
+
+    # seeds the random strings in tests only, see get_generator
+    test_random_seed = None
 
     checkdigit = LuhnOrdMixin()
+    identifier_allocator = None  # e.g. PermutationAllocator()
+
+    # candidates checked per query, see get_candidate_count
+    min_candidates = 1
+    max_candidates = 64
+    candidate_confidence = 0.95
+    collision_rates = {}
+
+    # candidates inserted first by another process before giving up
+    max_conflicts = 3
 
     def __init__(self, name=None, prefix_pattern=None, prefix=None,
                  template=None, random_string_length=None,
-                 random_string_pattern=None):
+                 random_string_pattern=None, lazy=None):
         self._last_random_string = None
         self.name = name or self.name
         self.template = template or self.template
+        self.has_checkdigit = '{checkdigit}' in self.template
         self.random_string_length = random_string_length or self.random_string_length
         self.random_string_pattern = random_string_pattern or self.random_string_pattern
         self.random_string_pattern = re.compile(self.random_string_pattern)
@@ -74,44 +94,245 @@ class ShortIdentifier:
         edc_device_app_config = django_apps.get_app_config('edc_device')
         self.device_id = edc_device_app_config.device_id
 
-        self.identifier = self.get_identifier()
+        self.identifier = None if lazy else self.get_identifier()
 
     def __str__(self):
         return self.identifier
 
     def get_identifier(self):
         """Returns a new unique identifier.
+
+        Each round draws a batch of candidates and checks them in one
+        query, see `get_candidate_count`. If the identifier filter is
+        enabled, a candidate not in the filter is used without a query,
+        see IdentifierFilter.
+
+        If `identifier_allocator` is set it allocates the identifier
+        instead.
         """
+        if self.identifier_allocator:
+            return self.identifier_allocator.get_identifier(self)
+        return self.get_random_identifier()
+
+    def get_random_identifier(self):
+        """Returns a new unique identifier drawn at random.
+
+        The random string may be longer than `random_string_length`
+        if keyspace escalation is enabled, see get_random_string_length.
+        """
+        self.random_string_length = get_random_string_length(self)
         identifier = None
-        allowed_chars = self.random_string_pattern.match(
-            'ABCDEFGHKMNPRTUVWXYZ2346789').group()
+        identifier_filter = self.identifier_filter
+        allowed_chars = self.allowed_chars
         max_tries = len(allowed_chars) ** (self.random_string_length + 1)
         tries = 0
+        attempt = 0
+        conflicts = 0
         while not identifier:
-            tries += 1
-            random_string = ''.join([
-                random.choice(allowed_chars)
-                for _ in range(self.random_string_length)])
-            identifier = self.template.format(
-                random_string=random_string,
-                prefix=self.prefix)
-            try:
-                self.identifier_model_cls.objects.get(
-                    identifier=identifier,
-                    identifier_type=self.name)
-            except ObjectDoesNotExist:
-                pass
-            else:
+            candidates = self.make_candidates(
+                allowed_chars, self.get_candidate_count(allowed_chars, attempt))
+            tries += len(candidates)
+            attempt += 1
+            identifier = self.get_unfiltered_candidate(candidates, identifier_filter)
+            if not identifier:
+                existing = set(self.identifier_model_cls.objects.filter(
+                    identifier__in=candidates,
+                    identifier_type=self.name).values_list('identifier', flat=True))
+                identifier = self.get_candidate(
+                    allowed_chars, candidates, existing, identifier_filter)
+            if identifier and not self.create_identifier_model(identifier, identifier_filter):
                 identifier = None
-                if tries >= max_tries:
+                conflicts += 1
+                if conflicts > self.max_conflicts:
                     raise DuplicateIdentifierError(
-                        'Unable prepare a unique requisition identifier, '
-                        'all are taken. Increase the length of the random string. '
-                        f'tries={tries}, max_tries={max_tries}.')
+                        'Unable to insert a unique identifier, another process '
+                        f'inserted each candidate first. conflicts={conflicts}.')
+            if not identifier and tries >= max_tries:
+                self.raise_on_duplicate(tries, max_tries)
+        return identifier
+
+    async def aget_identifier(self):
+        """Sets and returns a new unique identifier, see `get_identifier`.
+
+        The sync path runs with `sync_to_async(thread_sensitive=False)`,
+        on a thread and connection of its own. Instantiate with
+        lazy=True, for example:
+
+            obj = ShortIdentifier(lazy=True, **options)
+            identifier = await obj.aget_identifier()
+        """
+        if self.identifier_allocator:
+            self.identifier = await self.identifier_allocator.aget_identifier(self)
+        else:
+            self.identifier = await sync_to_async(
+                self.get_random_identifier, thread_sensitive=False)()
+        return self.identifier
+
+    def create_identifier_model(self, identifier, identifier_filter=None):
+        """Creates the IdentifierModel instance and returns True.
+
+        If the identifier filter is enabled the insert is made in a
+        savepoint and False is returned if the identifier exists, for
+        example issued by another process since the filter was filled.
+        Any other IntegrityError is raised.
+        """
+        options = self.get_identifier_model_options(identifier)
+        if not identifier_filter:
+            self.identifier_model_cls.objects.create(**options)
+            return True
+        try:
+            with transaction.atomic():
+                self.identifier_model_cls.objects.create(**options)
+        except IntegrityError:
+            if not self.is_collision(identifier):
+                raise
+            identifier_filter.conflict(identifier)
+            return False
+        identifier_filter.add(identifier)
+        return True
+
+    def is_collision(self, identifier):
+        """Returns True if an IntegrityError on inserting identifier
+        was caused by the identifier already existing.
+        """
+        return self.identifier_model_cls.objects.filter(identifier=identifier).exists()
+
+    @property
+    def identifier_filter(self):
+        """Returns the IdentifierFilter for this identifier type or
+        None if not enabled.
+        """
+        return get_identifier_filter(self.identifier_model_cls, 'identifier', self.name)
+
+    def get_unfiltered_candidate(self, candidates, identifier_filter=None):
+        """Returns the first candidate not in the identifier filter or
+        None.
+        """
+        if identifier_filter:
+            for candidate in candidates:
+                if candidate not in identifier_filter:
+                    return candidate
+        return None
 
-        self.identifier_model_cls.objects.create(
+    def get_candidate_count(self, allowed_chars, attempt=None):
+        """Returns the number of candidates to check in one query.
+
+        The count is the smallest for which, at the collision rate
+        observed by this process for this keyspace, a round finds
+        an unused identifier with probability `candidate_confidence`.
+        The count doubles for each round of this call that found none.
+        """
+        rate = self.collision_rates.get(self.get_keyspace_key(allowed_chars), 0.0)
+        if rate <= 0.0:
+            count = self.min_candidates
+        elif rate >= 1.0:
+            count = self.max_candidates
+        else:
+            count = ceil(log(1.0 - self.candidate_confidence) / log(rate))
+        count *= 2 ** (attempt or 0)
+        return max(self.min_candidates, min(count, self.max_candidates))
+
+    def get_candidate(self, allowed_chars, candidates, existing, identifier_filter=None):
+        """Returns the first candidate not in existing, or None, and
+        updates the observed collision rate.
+        """
+        if identifier_filter:
+            for candidate in candidates:
+                identifier_filter.record(candidate, candidate in existing)
+        key = self.get_keyspace_key(allowed_chars)
+        rate = len(existing) / len(candidates)
+        self.collision_rates[key] = 0.5 * self.collision_rates.get(key, rate) + 0.5 * rate
+        for candidate in candidates:
+            if candidate not in existing:
+                return candidate
+        return None
+
+    def get_keyspace_key(self, allowed_chars, random_string_length=None):
+        return (self.name, self.prefix, allowed_chars,
+                random_string_length or self.random_string_length)
+
+    def get_collision_rate(self, random_string_length=None):
+        """Returns the collision rate observed by this process for
+        the keyspace.
+        """
+        return self.collision_rates.get(
+            self.get_keyspace_key(self.allowed_chars, random_string_length), 0.0)
+
+    def get_keyspace(self, random_string_length=None, count=True):
+        """Returns a Keyspace with the number of identifiers of this
+        name and prefix issued with a random string of
+        `random_string_length`.
+        """
+        random_string_length = random_string_length or self.random_string_length
+        keyspace = Keyspace(
+            identifier_type=self.name,
+            prefix=self.prefix,
+            random_string_length=random_string_length,
+            alphabet=self.allowed_chars)
+        if count:
+            length = len(self.format_identifier(self.allowed_chars[0] * random_string_length))
+            keyspace.used = self.identifier_model_cls.objects.annotate(
+                identifier_length=Length('identifier')).filter(
+                    identifier_type=self.name,
+                    identifier_prefix=self.prefix,
+                    identifier_length=length).count()
+        return keyspace
+
+    def make_candidates(self, allowed_chars, count):
+        """Returns a list of up to `count` unique candidate identifiers.
+        """
+        count = min(count, len(allowed_chars) ** self.random_string_length)
+        candidates = {}
+        draws = 0
+        while len(candidates) < count and draws < count * 4:
+            number = count - len(candidates)
+            draws += number
+            for candidate in self.make_identifiers(allowed_chars, number):
+                candidates[candidate] = None
+        return list(candidates)
+
+    @property
+    def allowed_chars(self):
+        """Returns the characters of the random string.
+        """
+        return self.random_string_pattern.match(ALPHABET).group()
+
+    def make_identifier(self, allowed_chars):
+        """Returns a candidate identifier.
+        """
+        return self.make_identifiers(allowed_chars, 1)[0]
+
+    def make_identifiers(self, allowed_chars, count):
+        """Returns a list of `count` candidate identifiers, not
+        necessarily unique.
+        """
+        random_strings = get_generator(allowed_chars, self.test_random_seed).get_random_strings(
+            self.random_string_length, count)
+        return [self.format_identifier(random_string) for random_string in random_strings]
+
+    def format_identifier(self, random_string):
+        """Returns the identifier for this random string.
+
+        If the template has a `{checkdigit}` field, it is the check
+        digit of the prefix and random string, see `checkdigit`.
+        """
+        checkdigit = ''
+        if self.has_checkdigit:
+            checkdigit = self.checkdigit.calculate_checkdigit(f'{self.prefix}{random_string}')
+        return self.template.format(
+            random_string=random_string,
+            prefix=self.prefix,
+            checkdigit=checkdigit)
+
+    def get_identifier_model_options(self, identifier):
+        return dict(
             identifier=identifier,
             identifier_type=self.name,
             identifier_prefix=self.prefix,
             device_id=self.device_id)
-        return identifier
+
+    def raise_on_duplicate(self, tries, max_tries):
+        raise DuplicateIdentifierError(
+            'Unable prepare a unique requisition identifier, '
+            'all are taken. Increase the length of the random string. '
+            f'tries={tries}, max_tries={max_tries}.')
@@ -0,0 +1,258 @@
+import logging
+import os
+import threading
+import time
+import weakref
+
+from asgiref.sync import sync_to_async
+from django.contrib.sites.models import Site
+from django.db import IntegrityError, connection, transaction
+
+from .metrics import metrics
+from .models import ShortIdentifierPool, ShortIdentifierSequence
+from .permutation import FeistelPermutation
+
+logger = logging.getLogger(__name__)
+
+
+class PermutationAllocator:
+
+    """Allocates short identifiers by mapping a counter per name and
+    prefix through a keyed permutation of all random strings of the
+    configured length.
+
+    Identifiers look random but are unique without an existence
+    query. The counter and the key are held in the row-locked
+    ShortIdentifierSequence table so all allocations for a name and
+    prefix must use the same database. An identifier that already
+    exists, for example one issued by random sampling before
+    changing to this allocator, is skipped.
+
+    Usage:
+
+        class RequisitionIdentifier(ShortIdentifier):
+            identifier_allocator = PermutationAllocator()
+    """
+
+    short_identifier_sequence_cls = ShortIdentifierSequence
+    permutation_cls = FeistelPermutation
+
+    def __init__(self):
+        self.permutations = {}
+
+    def __repr__(self):
+        return f'{self.__class__.__name__}()'
+
+    def get_identifier(self, short_identifier):
+        """Returns a new unique identifier for short_identifier after
+        creating its IdentifierModel instance.
+
+        An identifier that already exists is skipped, any other
+        IntegrityError is raised.
+        """
+        allowed_chars = short_identifier.allowed_chars
+        length = short_identifier.random_string_length
+        size = len(allowed_chars) ** length
+        while True:
+            sequence_number, key = self.short_identifier_sequence_cls.objects.reserve(
+                name=short_identifier.name, prefix=short_identifier.prefix)
+            if sequence_number > size:
+                short_identifier.raise_on_duplicate(sequence_number, size)
+            identifier = short_identifier.format_identifier(
+                self.get_random_string(sequence_number - 1, key, allowed_chars, length))
+            try:
+                with transaction.atomic():
+                    short_identifier.identifier_model_cls.objects.create(
+                        **short_identifier.get_identifier_model_options(identifier))
+            except IntegrityError:
+                if not short_identifier.is_collision(identifier):
+                    raise
+                metrics.incr(f'short_identifier.{short_identifier.name}.conflicts')
+            else:
+                return identifier
+
+    async def aget_identifier(self, short_identifier):
+        return await sync_to_async(
+            self.get_identifier, thread_sensitive=False)(short_identifier)
+
+    def get_random_string(self, index, key, allowed_chars, length):
+        """Returns the random string for the index-th identifier.
+        """
+        base = len(allowed_chars)
+        value = self.get_permutation(base ** length, key).permute(index)
+        chars = []
+        for _ in range(0, length):
+            value, remainder = divmod(value, base)
+            chars.append(allowed_chars[remainder])
+        return ''.join(reversed(chars))
+
+    def get_permutation(self, size, key):
+        permutation = self.permutations.get((size, key))
+        if not permutation:
+            permutation = self.permutation_cls(size=size, key=bytes.fromhex(key))
+            self.permutations[(size, key)] = permutation
+        return permutation
+
+
+class PoolAllocator:
+
+    """Allocates short identifiers from a pool of identifiers issued
+    in advance, see ShortIdentifierPool.
+
+    A claim removes the oldest identifier in the pool for the name
+    and prefix, skipping rows locked by concurrent claims, so it
+    costs the same however full the keyspace is. If the pool is
+    empty the identifier is drawn at random as without an allocator.
+
+    The pool is filled to `size` with the management command
+    `fill_short_identifier_pool` or, if `refill_interval` is set, by
+    a background thread started on the first claim in the process
+    that fills it every `refill_interval` seconds.
+
+    Usage:
+
+        class RequisitionIdentifier(ShortIdentifier):
+            identifier_allocator = PoolAllocator(size=1000)
+    """
+
+    short_identifier_pool_cls = ShortIdentifierPool
+    batch_size = 500
+
+    def __init__(self, size=None, refill_interval=None):
+        self.size = size or 1000
+        self.refill_interval = refill_interval
+        self.threads = {}
+        self.lock = threading.Lock()
+        pool_allocators.add(self)
+
+    def __repr__(self):
+        return (f'{self.__class__.__name__}(size={self.size}, '
+                f'refill_interval={self.refill_interval})')
+
+    def reset(self):
+        """Forgets the background threads, which do not survive a fork.
+        """
+        self.lock = threading.Lock()
+        self.threads = {}
+
+    def get_identifier(self, short_identifier):
+        """Returns an identifier claimed from the pool or, if the
+        pool is empty, drawn at random.
+        """
+        if self.refill_interval:
+            self.start(short_identifier)
+        identifier = self.short_identifier_pool_cls.objects.claim(
+            name=short_identifier.name, prefix=short_identifier.prefix)
+        if not identifier:
+            metrics.incr(f'short_identifier.{short_identifier.name}.pool_misses')
+            identifier = short_identifier.get_random_identifier()
+        return identifier
+
+    async def aget_identifier(self, short_identifier):
+        return await sync_to_async(
+            self.get_identifier, thread_sensitive=False)(short_identifier)
+
+    def fill(self, short_identifier, size=None):
+        """Adds new identifiers to the pool for the name and prefix of
+        short_identifier until it holds `size` and returns the number
+        added.
+
+        Each batch of candidates is checked in one query against all
+        identifiers, whatever their type, as `identifier` is unique,
+        and written, to IdentifierModel and the pool, with
+        `bulk_create` in one transaction. A batch that conflicts with
+        an identifier issued meanwhile is drawn again, any other
+        IntegrityError is raised.
+        """
+        size = size or self.size
+        name, prefix = short_identifier.name, short_identifier.prefix
+        model_cls = short_identifier.identifier_model_cls
+        allowed_chars = short_identifier.allowed_chars
+        max_tries = len(allowed_chars) ** (short_identifier.random_string_length + 1)
+        site = Site.objects.get_current()
+        needed = size - self.short_identifier_pool_cls.objects.available(
+            name=name, prefix=prefix)
+        added, tries = 0, 0
+        while needed > 0:
+            candidates = short_identifier.make_candidates(
+                allowed_chars, min(needed, self.batch_size))
+            tries += len(candidates)
+            existing = set(model_cls.objects.filter(
+                identifier__in=candidates).values_list('identifier', flat=True))
+            identifiers = [c for c in candidates if c not in existing]
+            try:
+                with transaction.atomic():
+                    model_cls.objects.bulk_create([
+                        model_cls(site=site, **short_identifier.get_identifier_model_options(
+                            identifier)) for identifier in identifiers])
+                    self.short_identifier_pool_cls.objects.bulk_create([
+                        self.short_identifier_pool_cls(
+                            name=name, prefix=prefix, identifier=identifier)
+                        for identifier in identifiers])
+            except IntegrityError:
+                if not model_cls.objects.filter(identifier__in=identifiers).exists():
+                    raise
+                metrics.incr(f'short_identifier.{name}.conflicts')
+            else:
+                added += len(identifiers)
+                needed -= len(identifiers)
+            if needed > 0 and tries >= max_tries:
+                short_identifier.raise_on_duplicate(tries, max_tries)
+        return added
+
+    def start(self, short_identifier):
+        """Starts the background thread that fills the pool for the
+        name and prefix of short_identifier, if not already started.
+        """
+        key = (short_identifier.name, short_identifier.prefix)
+        if key in self.threads:
+            return
+        with self.lock:
+            if key not in self.threads:
+                thread = threading.Thread(
+                    target=self.run,
+                    args=(short_identifier.__class__, self.get_fill_options(short_identifier)),
+                    name=f'short-identifier-pool-{key[0]}-{key[1]}', daemon=True)
+                self.threads[key] = thread
+                thread.start()
+
+    def get_fill_options(self, short_identifier):
+        """Returns the options to instantiate a ShortIdentifier that
+        fills the same pool as short_identifier.
+        """
+        prefix_pattern = short_identifier.prefix_pattern
+        return dict(
+            name=short_identifier.name,
+            prefix=short_identifier.prefix or None,
+            prefix_pattern=getattr(prefix_pattern, 'pattern', prefix_pattern),
+            template=short_identifier.template,
+            random_string_length=short_identifier.random_string_length,
+            random_string_pattern=short_identifier.random_string_pattern.pattern)
+
+    def run(self, short_identifier_cls, options):
+        short_identifier = short_identifier_cls(lazy=True, **options)
+        while True:
+            try:
+                self.fill(short_identifier)
+            except Exception as e:
+                logger.exception(f'Unable to fill the short identifier pool. Got {e}.')
+            finally:
+                connection.close()
+            time.sleep(self.refill_interval)
+
+
+pool_allocators = weakref.WeakSet()
+
+
+def reset_pool_allocators():
+    """Forgets the background threads of each PoolAllocator.
+
+    Called in a forked child, which does not inherit the threads of
+    its parent, so the first claim in the child starts its own.
+    """
+    for allocator in list(pool_allocators):
+        allocator.reset()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=reset_pool_allocators)
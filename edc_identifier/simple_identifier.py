@@ -1,10 +1,17 @@
-import random
 import re
 
+from asgiref.sync import sync_to_async
 from django.apps import apps as django_apps
-from django.core.exceptions import ObjectDoesNotExist
-from django.utils import timezone
-from edc_base.utils import get_utcnow
+from django.contrib.sites.models import Site
+from django.core.exceptions import FieldDoesNotExist
+from django.db import IntegrityError, router, transaction
+from django.db.models.functions import Length
+
+from .identifier_filter import get_identifier_filter
+from .keyspace import Keyspace, get_random_string_length
+from .random_string import ALPHABET, get_generator
+from .snowflake import get_snowflake
+from .timestamp_sequence import get_timestamp_sequence
 
 
 class DuplicateIdentifierError(Exception):
@@ -25,6 +32,9 @@ class SimpleIdentifier:
     template = '{device_id}{random_string}'
     identifier_prefix = None
 
+    # seeds the random strings in tests only, see get_generator
+    test_random_seed = None
+
     def __init__(self, template=None, random_string_length=None, identifier_prefix=None,
                  device_id=None):
         self._identifier = None
@@ -33,6 +43,7 @@ class SimpleIdentifier:
         self.device_id = device_id or django_apps.get_app_config(
             'edc_device').device_id
         self.identifier_prefix = identifier_prefix or self.identifier_prefix
+        self.random_string_generator = get_generator(ALPHABET, self.test_random_seed)
 
     def __str__(self):
         return self.identifier
@@ -40,44 +51,60 @@ class SimpleIdentifier:
     @property
     def identifier(self):
         if not self._identifier:
-            self._identifier = self.template.format(
-                device_id=self.device_id, random_string=self.random_string)
-            if self.identifier_prefix:
-                self._identifier = f'{self.identifier_prefix}{self._identifier}'
+            self._identifier = self.make_identifier()
         return self._identifier
 
+    def make_identifier(self):
+        """Returns a new identifier on each call.
+        """
+        identifier = self.template.format(
+            device_id=self.device_id, random_string=self.random_string)
+        if self.identifier_prefix:
+            identifier = f'{self.identifier_prefix}{identifier}'
+        return identifier
+
     @property
     def random_string(self):
-        return ''.join(
-            [random.choice('ABCDEFGHKMNPRTUVWXYZ2346789') for _ in range(
-                self.random_string_length)])
+        return self.random_string_generator.get_random_string(
+            self.random_string_length)
 
 
 class SimpleTimestampIdentifier(SimpleIdentifier):
 
-    @property
-    def identifier(self):
-        if not self._identifier:
-            self._identifier = self.template.format(
-                device_id=self.device_id,
-                timestamp=timezone.localtime().strftime('%y%m%d%H%M%S%f')[:14],
-                # timestamp=timezone.localtime().strftime('%y%m%d%H%M%S%f'),
-                random_string=self.random_string)
-            if self.identifier_prefix:
-                self._identifier = f'{self.identifier_prefix}{self._identifier}'
-        return self._identifier
+    """An identifier of the timestamp, to 1/100 s, and a random
+    string that does not repeat in this process, see
+    TimestampSequence.
+    """
+
+    def make_identifier(self):
+        timestamp, random_string = get_timestamp_sequence(
+            self.random_string_length).next(self.random_string_generator)
+        identifier = self.template.format(
+            device_id=self.device_id,
+            timestamp=timestamp,
+            random_string=random_string)
+        if self.identifier_prefix:
+            identifier = f'{self.identifier_prefix}{identifier}'
+        return identifier
 
 
 class SimpleSequentialIdentifier:
 
+    """An identifier of a snowflake number, unique and increasing
+    without database access, and a mod 11 check digit, see Snowflake.
+
+    The number is zero padded to 19 digits, the most a 63 bit number
+    has, so the identifier has the same length as the clock advances.
+    With the check digit, where 10 is written as 'X', it is 20
+    characters plus the prefix.
+    """
+
     prefix = None
 
     def __init__(self):
-        sequence = int(get_utcnow().timestamp())
-        random_number = random.choice(range(1000, 9999))
-        sequence = f'{sequence}{random_number}'
-        chk = int(sequence) % 11
-        self.identifier = f'{self.prefix or ""}{sequence}{chk}'
+        sequence = get_snowflake().next()
+        chk = sequence % 11
+        self.identifier = f'{self.prefix or ""}{sequence:019d}{"X" if chk == 10 else chk}'
 
     def __str__(self):
         return self.identifier
@@ -101,11 +128,20 @@ class SimpleUniqueIdentifier:
     identifier_prefix = None
     identifier_cls = SimpleIdentifier
     make_human_readable = None
+    insert_first = False  # requires a unique identifier field
+    collision_rates = {}
+    max_allocate_tries = 5  # bulk inserts per allocate, see allocate
+
+    # shared by all instances, see model_cls, identifier_field and
+    # identifier_generator
+    model_classes = {}
+    identifier_fields = {}
+    identifier_generators = {}
 
     def __init__(self, model=None, identifier_attr=None, identifier_type=None,
                  identifier_prefix=None, make_human_readable=None,
                  linked_identifier=None, protocol_number=None,
-                 source_model=None, subject_identifier=None):
+                 source_model=None, subject_identifier=None, lazy=None):
         self._identifier = None
         self.model = model or self.model
         self.identifier_attr = identifier_attr or self.identifier_attr
@@ -116,15 +152,12 @@ class SimpleUniqueIdentifier:
                 f'Expected identifier_prefix of length=2. Got {len(identifier_prefix)}')
         self.make_human_readable = make_human_readable or self.make_human_readable
         self.device_id = django_apps.get_app_config('edc_device').device_id
-        self.model_cls.objects.create(
-            identifier_type=self.identifier_type,
-            sequence_number=1,
-            device_id=self.device_id,
-            linked_identifier=linked_identifier,
-            protocol_number=protocol_number,
-            model=source_model,
-            subject_identifier=subject_identifier,
-            **{self.identifier_attr: self.identifier})
+        self.linked_identifier = linked_identifier
+        self.protocol_number = protocol_number
+        self.source_model = source_model
+        self.subject_identifier = subject_identifier
+        if not lazy:
+            self.create_identifier_model()
 
     def __str__(self):
         return self.identifier
@@ -132,37 +165,318 @@ class SimpleUniqueIdentifier:
     @property
     def identifier(self):
         if not self._identifier:
+            self.random_string_length = get_random_string_length(self)
+            identifier_filter = self.identifier_filter
             identifier = self._get_new_identifier()
             tries = 1
             while True:
                 tries += 1
-                try:
-                    self.model_cls.objects.get(
-                        identifier_type=self.identifier_type,
-                        ** {self.identifier_attr: identifier})
-                except ObjectDoesNotExist:
+                if not self.exists(identifier, identifier_filter):
                     break
-                else:
-                    identifier = self._get_new_identifier()
-                if tries == len('ABCDEFGHKMNPRTUVWXYZ2346789') ** self.random_string_length:
+                identifier = self._get_new_identifier()
+                if tries == len(ALPHABET) ** self.random_string_length:
                     raise DuplicateIdentifierError(
                         'Unable prepare a unique identifier, '
                         'all are taken. Increase the length of the random string')
+            self.update_collision_rate(tries - 2, tries - 1)
             self._identifier = identifier
-            if self.make_human_readable:
-                self._identifier = make_human_readable(identifier)
         return self._identifier
 
+    async def aidentifier(self):
+        """Returns a new unique identifier after creating the model
+        instance, see `create_identifier_model`.
+
+        The sync path, with its savepoints, runs with
+        `sync_to_async(thread_sensitive=False)`, on a thread and
+        connection of its own. Instantiate with lazy=True, for example:
+
+            obj = TrackingIdentifier(lazy=True, **options)
+            identifier = await obj.aidentifier()
+        """
+        await sync_to_async(self.create_identifier_model, thread_sensitive=False)()
+        return self._identifier
+
+    def create_identifier_model(self):
+        """Creates the model instance for a new unique identifier.
+
+        If the identifier filter is enabled the insert is made in a
+        savepoint and retried with a new identifier if another process
+        inserted it since it was checked, see `is_collision`.
+
+        If `insert_first`, see `insert_identifier_model`.
+        """
+        if self.insert_first:
+            return self.insert_identifier_model()
+        identifier_filter = self.identifier_filter
+        if not identifier_filter:
+            return self.model_cls.objects.create(
+                **self.get_identifier_model_options(self.identifier))
+        tries = 0
+        while True:
+            tries += 1
+            try:
+                with transaction.atomic():
+                    obj = self.model_cls.objects.create(
+                        **self.get_identifier_model_options(self.identifier))
+            except IntegrityError:
+                if not self.is_collision(self._identifier):
+                    raise
+                identifier_filter.conflict(self._identifier)
+                self._identifier = None
+                self.raise_on_duplicate(tries)
+            else:
+                identifier_filter.add(self._identifier)
+                return obj
+
+    def insert_identifier_model(self):
+        """Creates the model instance for a new identifier without
+        first checking that it is unused.
+
+        The insert is made in a savepoint. An IntegrityError on an
+        identifier that exists is a collision and the insert is
+        retried with a new identifier. Any other IntegrityError is
+        raised. One query per try and no window between check and
+        insert.
+        """
+        if not self.identifier_field.unique:
+            raise IdentifierError(
+                'Expected a unique identifier field with insert_first. '
+                f'Got {self.model}.{self.identifier_attr}.')
+        self.random_string_length = get_random_string_length(self)
+        identifier_filter = self.identifier_filter
+        tries = 0
+        while True:
+            identifier = self._get_new_identifier()
+            tries += 1
+            try:
+                with transaction.atomic():
+                    obj = self.model_cls.objects.create(
+                        **self.get_identifier_model_options(identifier))
+            except IntegrityError:
+                if not self.is_collision(identifier):
+                    raise
+                if identifier_filter:
+                    identifier_filter.conflict(identifier)
+                self.raise_on_duplicate(tries)
+            else:
+                break
+        if identifier_filter:
+            identifier_filter.add(identifier)
+        self.update_collision_rate(tries - 1, tries)
+        self._identifier = identifier
+        return obj
+
+    def is_collision(self, identifier):
+        """Returns True if an IntegrityError on inserting identifier
+        was caused by the identifier already existing.
+        """
+        return self.model_cls.objects.filter(**{self.identifier_attr: identifier}).exists()
+
+    def allocate(self, count, using=None):
+        """Returns a list of `count` new unique identifiers after
+        creating their model instances with one `bulk_create` on the
+        database `using`, by default that routed for writes.
+
+        The identifiers are drawn in memory. If the insert, made in a
+        savepoint, violates the unique constraint the identifiers
+        that exist are found with one query, replaced and the insert
+        retried, up to `max_allocate_tries` times. An IntegrityError
+        with none of the identifiers existing is raised.
+        """
+        self.random_string_length = get_random_string_length(self)
+        identifier_filter = self.identifier_filter
+        options = self.get_allocate_options()
+        identifiers = self.make_identifiers(count)
+        using = using or router.db_for_write(self.model_cls)
+        tries = 0
+        while True:
+            tries += 1
+            try:
+                with transaction.atomic(using=using):
+                    self.model_cls.objects.using(using).bulk_create([
+                        self.model_cls(**options, **self.get_identifier_model_options(identifier))
+                        for identifier in identifiers])
+            except IntegrityError:
+                existing = self.get_existing(identifiers, using=using)
+                if not existing:
+                    raise
+                if tries >= self.max_allocate_tries:
+                    raise DuplicateIdentifierError(
+                        f'Unable to allocate {count} unique identifiers. '
+                        f'tries={tries}, max_allocate_tries={self.max_allocate_tries}.')
+                identifiers = [identifier for identifier in identifiers
+                               if identifier not in existing]
+                identifiers.extend(self.make_identifiers(
+                    count - len(identifiers), exclude=identifiers))
+                if identifier_filter:
+                    for identifier in existing:
+                        identifier_filter.conflict(identifier)
+                self.raise_on_duplicate(tries)
+            else:
+                break
+        if identifier_filter:
+            for identifier in identifiers:
+                identifier_filter.add(identifier)
+        return identifiers
+
+    def get_allocate_options(self):
+        """Returns the options, other than those of the identifier,
+        of the model instances created by `allocate`.
+        """
+        try:
+            self.model_cls._meta.get_field('site')
+        except FieldDoesNotExist:
+            return {}
+        return dict(site=Site.objects.get_current())
+
+    def get_existing(self, identifiers, using=None):
+        """Returns the set of identifiers that exist in the model.
+        """
+        return set(self.model_cls.objects.db_manager(using).filter(
+            **{f'{self.identifier_attr}__in': identifiers}).values_list(
+                self.identifier_attr, flat=True))
+
+    def make_identifiers(self, count, exclude=None):
+        """Returns a list of `count` new identifiers, unique and not in
+        `exclude`, drawn in memory.
+        """
+        identifiers = dict.fromkeys(exclude or [])
+        size = len(identifiers) + count
+        max_draws = None
+        if '{timestamp}' not in self.template:
+            max_draws = count * 4 + len(ALPHABET) ** self.random_string_length
+        draws = 0
+        while len(identifiers) < size:
+            identifiers[self._get_new_identifier()] = None
+            draws += 1
+            if max_draws and draws > max_draws:
+                self.raise_on_duplicate(len(ALPHABET) ** self.random_string_length)
+        return list(identifiers)[size - count:]
+
+    def raise_on_duplicate(self, tries):
+        if tries >= len(ALPHABET) ** self.random_string_length:
+            raise DuplicateIdentifierError(
+                'Unable prepare a unique identifier, '
+                'all are taken. Increase the length of the random string')
+
+    def exists(self, identifier, identifier_filter=None):
+        """Returns True if the identifier exists.
+
+        If the identifier filter is enabled, the database is only
+        queried if the identifier may be in the filter. An identifier
+        issued by another process since the filter was filled is
+        caught on insert, see `create_identifier_model`.
+        """
+        if identifier_filter and identifier not in identifier_filter:
+            return False
+        exists = self.model_cls.objects.filter(
+            identifier_type=self.identifier_type,
+            ** {self.identifier_attr: identifier}).exists()
+        if identifier_filter:
+            identifier_filter.record(identifier, exists)
+        return exists
+
+    @property
+    def identifier_filter(self):
+        """Returns the IdentifierFilter for this identifier type or
+        None if not enabled.
+        """
+        return get_identifier_filter(self.model_cls, self.identifier_attr, self.identifier_type)
+
+    def update_collision_rate(self, collisions, checked):
+        key = (self.identifier_type, self.identifier_prefix, self.random_string_length)
+        rate = collisions / checked
+        self.collision_rates[key] = 0.5 * self.collision_rates.get(key, rate) + 0.5 * rate
+
+    def get_collision_rate(self, random_string_length=None):
+        """Returns the collision rate observed by this process for
+        the keyspace.
+        """
+        return self.collision_rates.get((
+            self.identifier_type, self.identifier_prefix,
+            random_string_length or self.random_string_length), 0.0)
+
+    def get_keyspace(self, random_string_length=None, count=True):
+        """Returns a Keyspace with the number of identifiers of this
+        type, prefix and device issued with a random string of
+        `random_string_length`.
+
+        Returns None if the template has a timestamp as each
+        timestamp has a keyspace of its own.
+        """
+        if '{timestamp}' in self.template:
+            return None
+        random_string_length = random_string_length or self.random_string_length
+        keyspace = Keyspace(
+            identifier_type=self.identifier_type,
+            prefix=self.identifier_prefix,
+            random_string_length=random_string_length,
+            alphabet=ALPHABET)
+        if count:
+            identifier = self.template.format(
+                device_id=self.device_id, random_string='X' * random_string_length)
+            identifier = f'{self.identifier_prefix or ""}{identifier}'
+            if self.make_human_readable:
+                identifier = make_human_readable(identifier)
+            opts = {'identifier_type': self.identifier_type,
+                    f'{self.identifier_attr}__startswith': self.identifier_prefix or ''}
+            if '{device_id}' in self.template:
+                opts.update(device_id=self.device_id)
+            keyspace.used = self.model_cls.objects.annotate(
+                identifier_length=Length(self.identifier_attr)).filter(
+                    identifier_length=len(identifier), **opts).count()
+        return keyspace
+
+    def get_identifier_model_options(self, identifier):
+        return dict(
+            identifier_type=self.identifier_type,
+            sequence_number=1,
+            device_id=self.device_id,
+            linked_identifier=self.linked_identifier,
+            protocol_number=self.protocol_number,
+            model=self.source_model,
+            subject_identifier=self.subject_identifier,
+            **{self.identifier_attr: identifier})
+
     def _get_new_identifier(self):
-        """Returns a new identifier.
+        """Returns a new identifier, human readable if
+        `make_human_readable`, as it will be stored.
         """
-        identifier_obj = self.identifier_cls(
-            template=self.template,
-            identifier_prefix=self.identifier_prefix,
-            random_string_length=self.random_string_length,
-            device_id=self.device_id)
-        return identifier_obj.identifier
+        identifier = self.identifier_generator.make_identifier()
+        if self.make_human_readable:
+            return make_human_readable(identifier)
+        return identifier
+
+    @property
+    def identifier_generator(self):
+        """Returns the shared `identifier_cls` instance for the
+        template, prefix, random string length and device.
+        """
+        key = (self.identifier_cls, self.template, self.identifier_prefix,
+               self.random_string_length, self.device_id)
+        identifier_generator = self.identifier_generators.get(key)
+        if not identifier_generator:
+            identifier_generator = self.identifier_cls(
+                template=self.template,
+                identifier_prefix=self.identifier_prefix,
+                random_string_length=self.random_string_length,
+                device_id=self.device_id)
+            self.identifier_generators[key] = identifier_generator
+        return identifier_generator
 
     @property
     def model_cls(self):
-        return django_apps.get_model(self.model)
+        model_cls = self.model_classes.get(self.model)
+        if not model_cls:
+            model_cls = django_apps.get_model(self.model)
+            self.model_classes[self.model] = model_cls
+        return model_cls
+
+    @property
+    def identifier_field(self):
+        key = (self.model, self.identifier_attr)
+        field = self.identifier_fields.get(key)
+        if not field:
+            field = self.model_cls._meta.get_field(self.identifier_attr)
+            self.identifier_fields[key] = field
+        return field
@@ -0,0 +1,157 @@
+import os
+import tempfile
+import threading
+import time
+
+from django.apps import apps as django_apps
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+
+class SnowflakeError(Exception):
+    pass
+
+
+class Snowflake:
+
+    """Returns unique, increasing 63 bit integers without database
+    access, snowflake style:
+
+        41 bits  milliseconds since `epoch` (until 2089)
+         7 bits  device_id (0-127)
+         5 bits  worker, one per process on the device (0-31)
+        10 bits  sequence within the millisecond
+
+    A worker issues up to 1024 numbers per millisecond. Once the
+    sequence is exhausted, or if the clock goes back, the next
+    millisecond is used ahead of the clock.
+
+    The worker is a slot held with `fcntl.flock` on a lock file in
+    `lock_dir` for the life of the process, see `acquire_worker_id`.
+    At most 32 processes per device can hold one at a time. The slots
+    are only exclusive among processes sharing `lock_dir`, so two
+    hosts with the same device_id, e.g. 99, may issue the same number.
+    """
+
+    epoch = 1577836800000  # 2020-01-01 UTC, in ms
+    time_bits = 41
+    device_bits = 7
+    worker_bits = 5
+    sequence_bits = 10
+
+    def __init__(self, device_id=None, worker_id=None, lock_dir=None):
+        self.device_id = int(device_id)
+        if not 0 <= self.device_id < 2 ** self.device_bits:
+            raise SnowflakeError(
+                f'Expected a device_id from 0 to {2 ** self.device_bits - 1}. '
+                f'Got {device_id}.')
+        self.lock_dir = lock_dir or tempfile.gettempdir()
+        self.lock_file = None
+        self.worker_id = self.acquire_worker_id() if worker_id is None else worker_id
+        if not 0 <= self.worker_id < 2 ** self.worker_bits:
+            raise SnowflakeError(
+                f'Expected a worker_id from 0 to {2 ** self.worker_bits - 1}. '
+                f'Got {worker_id}.')
+        self.lock = threading.Lock()
+        self.last = -1
+        self.sequence = 0
+
+    def __repr__(self):
+        return (f'{self.__class__.__name__}(device_id={self.device_id}, '
+                f'worker_id={self.worker_id})')
+
+    def next(self):
+        """Returns the next number.
+        """
+        now = int(time.time() * 1000) - self.epoch
+        with self.lock:
+            if now > self.last:
+                self.last, self.sequence = now, 0
+            else:
+                self.sequence = (self.sequence + 1) & (2 ** self.sequence_bits - 1)
+                if not self.sequence:
+                    self.last += 1
+            if self.last >= 2 ** self.time_bits:
+                raise SnowflakeError('Snowflake time bits exhausted.')
+            return ((self.last << (self.device_bits + self.worker_bits + self.sequence_bits))
+                    | (self.device_id << (self.worker_bits + self.sequence_bits))
+                    | (self.worker_id << self.sequence_bits)
+                    | self.sequence)
+
+    def acquire_worker_id(self):
+        """Returns the first worker slot not locked by another
+        process on this device and keeps it locked.
+
+        Raises SnowflakeError without `fcntl`, as a slot that is not
+        locked could be shared by two processes.
+        """
+        if not fcntl:
+            raise SnowflakeError(
+                'Unable to lock a snowflake worker slot, fcntl is not available. '
+                'Pass a worker_id unique to this process on this device.')
+        for worker_id in range(0, 2 ** self.worker_bits):
+            path = os.path.join(
+                self.lock_dir, f'edc_identifier_snowflake_{self.device_id}_{worker_id}.lock')
+            lock_file = open(path, 'a')
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                lock_file.close()
+            else:
+                self.lock_file = lock_file
+                return worker_id
+        raise SnowflakeError(
+            f'All {2 ** self.worker_bits} snowflake worker slots are in use. '
+            f'Got lock_dir={self.lock_dir}, device_id={self.device_id}.')
+
+    def release(self):
+        if self.lock_file:
+            self.lock_file.close()
+            self.lock_file = None
+
+
+snowflakes = {}
+snowflakes_lock = threading.Lock()
+
+
+def get_snowflake():
+    """Returns this process's Snowflake for the edc_device device_id.
+
+    The lock directory and, if set, the worker_id are
+    `snowflake_lock_dir` and `snowflake_worker_id` on
+    edc_identifier.AppConfig.
+    """
+    device_id = django_apps.get_app_config('edc_device').device_id
+    app_config = django_apps.get_app_config('edc_identifier')
+    snowflake = snowflakes.get(device_id)
+    if not snowflake:
+        with snowflakes_lock:
+            snowflake = snowflakes.get(device_id)
+            if not snowflake:
+                snowflake = Snowflake(
+                    device_id=device_id,
+                    worker_id=app_config.snowflake_worker_id,
+                    lock_dir=app_config.snowflake_lock_dir)
+                snowflakes[device_id] = snowflake
+    return snowflake
+
+
+def reset_snowflakes():
+    """Forgets this process's Snowflakes.
+
+    Called in a forked child so it takes a worker slot of its own.
+    The lock files inherited from the parent are closed, the parent
+    keeps its locks.
+    """
+    global snowflakes_lock
+    snowflakes_lock = threading.Lock()
+    for snowflake in list(snowflakes.values()):
+        snowflake.release()
+    snowflakes.clear()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=reset_snowflakes)
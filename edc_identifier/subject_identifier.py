@@ -9,6 +9,7 @@ class SubjectIdentifier(ResearchIdentifier):
     template = '{protocol_number}-{site_id}{device_id}{sequence}'
     label = 'subjectidentifier'
     padding = 4
+    last_name = None
 
     def __init__(self, last_name=None, **kwargs):
         self.last_name = last_name
@@ -28,3 +29,20 @@ class SubjectIdentifier(ResearchIdentifier):
             subject_type=self.identifier_type,
             last_name=self.last_name,
             registration_datetime=get_utcnow())
+
+    def bulk_post_identifier(self, identifiers):
+        """Creates a registered subject instance for each of these
+        subject identifiers.
+
+        Each is created with `create`, within the transaction of
+        `allocate`, so that its save() and signals run.
+        """
+        model = django_apps.get_app_config('edc_registration').model
+        registration_datetime = get_utcnow()
+        for identifier in identifiers:
+            model.objects.create(
+                subject_identifier=identifier,
+                site=self.site,
+                subject_type=self.identifier_type,
+                last_name=self.last_name,
+                registration_datetime=registration_datetime)
@@ -0,0 +1,36 @@
+from ..model_mixins import TrackingIdentifier
+from ..short_identifier import ShortIdentifier
+from ..simple_identifier import SimpleIdentifier, SimpleUniqueIdentifier
+
+
+class ListShortIdentifier(ShortIdentifier):
+
+    """A ShortIdentifier that draws its random strings, in order,
+    from `random_strings`.
+    """
+
+    max_candidates = 1
+    random_strings = []
+
+    def make_identifiers(self, allowed_chars, count):
+        return [f'{self.prefix}{self.random_strings.pop(0)}' for _ in range(0, count)]
+
+
+class ListSimpleIdentifier(SimpleIdentifier):
+
+    """A SimpleIdentifier that returns, in order, the identifiers
+    in `identifiers`.
+    """
+
+    identifiers = []
+
+    def make_identifier(self):
+        return self.identifiers.pop(0)
+
+
+class ListUniqueIdentifier(SimpleUniqueIdentifier):
+    identifier_cls = ListSimpleIdentifier
+
+
+class ListTrackingIdentifier(TrackingIdentifier):
+    identifier_cls = ListSimpleIdentifier
@@ -1,5 +1,7 @@
 from django.db import models
 
+from ..model_mixins import TrackingIdentifierModelMixin
+
 
 class Enrollment(models.Model):
     subject_identifier = models.CharField(max_length=25, null=True)
@@ -7,3 +9,7 @@ class Enrollment(models.Model):
 
 class EnrollmentThree(models.Model):
     subject_identifier = models.CharField(max_length=25, null=True)
+
+
+class TrackedItem(TrackingIdentifierModelMixin, models.Model):
+    name = models.CharField(max_length=25, null=True)
@@ -0,0 +1,84 @@
+from asgiref.sync import sync_to_async
+from django.apps import apps as django_apps
+from django.contrib.sites.models import Site
+from django.test import TransactionTestCase, tag
+
+from ..model_mixins import TrackingIdentifier
+from ..models import IdentifierModel
+from ..short_identifier import ShortIdentifier
+from ..subject_identifier import SubjectIdentifier
+
+
+class TestAsyncIdentifiers(TransactionTestCase):
+
+    """Allocations run on threads with their own connections, so
+    they commit outside of any test transaction.
+    """
+
+    async def test_subject_identifier(self):
+        subject_identifier = SubjectIdentifier(
+            identifier_type='subject',
+            requesting_model='edc_identifier.enrollment',
+            protocol_number='000',
+            device_id='99',
+            lazy=True)
+        identifier = await subject_identifier.aidentifier()
+        self.assertEqual(identifier, '000-40990001-6')
+        self.assertEqual(subject_identifier.identifier, identifier)
+        self.assertTrue(
+            await IdentifierModel.objects.filter(identifier=identifier).aexists())
+        model = django_apps.get_app_config('edc_registration').model
+        self.assertTrue(
+            await model.objects.filter(subject_identifier=identifier).aexists())
+
+    async def test_subject_identifier_increments(self):
+        site = await Site.objects.aget(pk=40)
+        for i in range(1, 4):
+            subject_identifier = SubjectIdentifier(
+                identifier_type='subject',
+                requesting_model='edc_identifier.enrollment',
+                protocol_number='000',
+                device_id='99',
+                site=site,
+                lazy=True)
+            identifier = await subject_identifier.aidentifier()
+            self.assertEqual(identifier[8:12], f'000{i}')
+
+    async def test_subject_identifier_shares_sequence(self):
+        """Asserts sync and async allocation share the counter.
+        """
+        await sync_to_async(SubjectIdentifier)(
+            identifier_type='subject',
+            requesting_model='edc_identifier.enrollment',
+            protocol_number='000',
+            device_id='99')
+        subject_identifier = SubjectIdentifier(
+            identifier_type='subject',
+            requesting_model='edc_identifier.enrollment',
+            protocol_number='000',
+            device_id='99',
+            lazy=True)
+        self.assertIsNone(subject_identifier._identifier)
+        identifier = await subject_identifier.aidentifier()
+        self.assertEqual(identifier[8:12], '0002')
+
+    async def test_short_identifier(self):
+        short_identifier = ShortIdentifier(
+            prefix_pattern='^[0-9]{2}$', prefix=22, lazy=True)
+        self.assertIsNone(short_identifier.identifier)
+        identifier = await short_identifier.aget_identifier()
+        self.assertEqual(short_identifier.identifier, identifier)
+        self.assertTrue(
+            await IdentifierModel.objects.filter(
+                identifier=identifier,
+                identifier_type=ShortIdentifier.name).aexists())
+
+    async def test_tracking_identifier(self):
+        tracking_identifier = TrackingIdentifier(
+            identifier_type='edc_identifier.box', lazy=True)
+        identifier = await tracking_identifier.aidentifier()
+        self.assertEqual(tracking_identifier.identifier, identifier)
+        self.assertTrue(
+            await IdentifierModel.objects.filter(
+                identifier=identifier,
+                identifier_type='edc_identifier.box').aexists())
@@ -1,7 +1,16 @@
+import random
+import string
+
 from django.test import TestCase, tag
 
-from ..checkdigit_mixins import LuhnMixin, LuhnOrdMixin
+from ..checkdigit_mixins import DammAlphaMixin, DammMixin, LuhnMixin, LuhnOrdMixin
+from ..checkdigit_mixins import CheckdigitMixin, VerhoeffMixin
 from ..identifier import Identifier
+from ..subject_identifier import SubjectIdentifier
+
+
+class DammSubjectIdentifier(SubjectIdentifier):
+    checkdigit = DammMixin()
 
 
 class TestIdentifier(TestCase):
@@ -22,6 +31,110 @@ class TestIdentifier(TestCase):
         self.assertEqual('8', mixin.calculate_checkdigit('ABCDEF'))
         self.assertEqual('0', mixin.calculate_checkdigit('ABCDEFG'))
 
+    def test_luhn_tables_match_digits_of(self):
+        for mixin, alphabet in [(LuhnMixin(), string.digits),
+                                (LuhnOrdMixin(), ''.join(map(chr, range(0, 128))))]:
+            for _ in range(0, 1000):
+                identifier = ''.join(
+                    random.choice(alphabet) for _ in range(0, random.randint(1, 20)))
+                self.assertEqual(
+                    mixin.calculate_checkdigit(identifier),
+                    mixin._calculate_checkdigit(identifier), msg=repr(identifier))
+
+    def test_luhn_leading_zeros(self):
+        self.assertEqual(
+            LuhnMixin().calculate_checkdigit('0098765'),
+            LuhnMixin().calculate_checkdigit('98765'))
+        self.assertEqual(
+            LuhnOrdMixin().calculate_checkdigit('\x00ABCDE'),
+            LuhnOrdMixin()._calculate_checkdigit('\x00ABCDE'))
+
+    def test_calculate_checkdigits(self):
+        for mixin, alphabet in [(LuhnMixin(), string.digits),
+                                (LuhnOrdMixin(), string.ascii_letters + string.digits),
+                                (LuhnOrdMixin(), ''.join(map(chr, range(0, 128))))]:
+            identifiers = [
+                ''.join(random.choice(alphabet) for _ in range(0, random.randint(1, 3)))
+                for _ in range(0, 2000)]
+            self.assertEqual(
+                mixin.calculate_checkdigits(identifiers),
+                [mixin.calculate_checkdigit(identifier) for identifier in identifiers])
+
+    def test_calculate_checkdigits_raises(self):
+        self.assertRaises(
+            ValueError, LuhnMixin().calculate_checkdigits, ['98765'] * 50 + ['9876A'])
+
+    def test_verify_checkdigits(self):
+        mixin = LuhnMixin()
+        identifiers = ['987651', '987669', '987677'] * 20
+        self.assertTrue(all(mixin.verify_checkdigits(identifiers)))
+        self.assertEqual(
+            mixin.verify_checkdigits(['987652', '9876A1', '1', '']),
+            [False, False, False, False])
+        mixin = LuhnOrdMixin()
+        self.assertEqual(
+            mixin.verify_checkdigits(['ABCDE4', 'ABCDEF8', 'ABCDEFG1']),
+            [True, True, False])
+
+    def test_verify_checkdigits_empty(self):
+        for mixin in [LuhnMixin(), DammMixin(), VerhoeffMixin(), DammAlphaMixin()]:
+            with self.subTest(mixin=mixin):
+                self.assertEqual(mixin.verify_checkdigits(['']), [False])
+
+    def test_damm(self):
+        self.assertEqual(DammMixin().calculate_checkdigit('572'), '4')
+        self.assertEqual(DammMixin().calculate_checkdigit('0572'), '4')
+        self.assertRaises(ValueError, DammMixin().calculate_checkdigit, '57A')
+
+    def test_verhoeff(self):
+        self.assertEqual(VerhoeffMixin().calculate_checkdigit('236'), '3')
+        self.assertEqual(VerhoeffMixin().calculate_checkdigit('12345'), '1')
+        self.assertEqual(VerhoeffMixin().calculate_checkdigit('142857'), '0')
+        self.assertRaises(ValueError, VerhoeffMixin().calculate_checkdigit, '2B6')
+
+    def test_damm_alpha(self):
+        mixin = DammAlphaMixin()
+        for row in mixin.get_table():
+            self.assertEqual(sorted(row), list(range(0, 36)))
+        for column in zip(*mixin.get_table()):
+            self.assertEqual(sorted(column), list(range(0, 36)))
+        self.assertIn(mixin.calculate_checkdigit('22ABCDE'), mixin.symbols)
+        self.assertRaises(ValueError, mixin.calculate_checkdigit, '22abcde')
+
+    def test_detects_substitutions_and_transpositions(self):
+        for mixin in [DammMixin(), DammAlphaMixin(), VerhoeffMixin()]:
+            alphabet = getattr(mixin, 'symbols', string.digits)
+            for _ in range(0, 200):
+                identifier = ''.join(random.choice(alphabet) for _ in range(0, 8))
+                identifier += mixin.calculate_checkdigit(identifier)
+                errors = []
+                for index in range(0, len(identifier)):
+                    for symbol in alphabet.replace(identifier[index], ''):
+                        errors.append(
+                            identifier[:index] + symbol + identifier[index + 1:])
+                    if index and identifier[index - 1] != identifier[index]:
+                        errors.append(
+                            identifier[:index - 1] + identifier[index]
+                            + identifier[index - 1] + identifier[index + 1:])
+                self.assertFalse(any(mixin.verify_checkdigits(errors)), msg=identifier)
+
+    def test_checkdigit_mixin_is_abstract(self):
+        self.assertRaises(TypeError, CheckdigitMixin)
+
+    def test_research_identifier_checkdigit(self):
+        identifier = DammSubjectIdentifier(
+            identifier_type='subject',
+            requesting_model='edc_identifier.enrollment').identifier
+        self.assertEqual(
+            identifier[-1], DammMixin().calculate_checkdigit(identifier[:-2].replace('-', '')))
+
+    def test_luhn_fallback(self):
+        self.assertEqual(
+            LuhnOrdMixin().calculate_checkdigit('ABCDÉ'),
+            LuhnOrdMixin()._calculate_checkdigit('ABCDÉ'))
+        self.assertRaises(ValueError, LuhnMixin().calculate_checkdigit, '9876A')
+        self.assertRaises(ValueError, LuhnMixin().calculate_checkdigit, '')
+
     def test_identifier(self):
         instance = Identifier()
         self.assertEqual('1', instance.identifier)
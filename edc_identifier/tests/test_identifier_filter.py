@@ -0,0 +1,135 @@
+from unittest import mock
+
+from django.apps import apps as django_apps
+from django.db import IntegrityError, connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from ..identifier_filter import BloomFilter, get_identifier_filter, identifier_filters
+from ..metrics import metrics
+from ..model_mixins import TrackingIdentifier
+from ..models import IdentifierModel
+from ..short_identifier import DuplicateIdentifierError, ShortIdentifier
+from ..simple_identifier import make_human_readable
+from .identifiers import ListShortIdentifier, ListSimpleIdentifier, ListTrackingIdentifier
+
+
+class TestBloomFilter(TestCase):
+
+    def test_no_false_negatives(self):
+        bloom_filter = BloomFilter(capacity=1000, error_rate=0.01)
+        for i in range(0, 1000):
+            bloom_filter.add(f'A{i}')
+        for i in range(0, 1000):
+            self.assertIn(f'A{i}', bloom_filter)
+        false_positives = len([i for i in range(0, 10000) if f'B{i}' in bloom_filter])
+        self.assertLess(false_positives, 300)
+        self.assertLess(bloom_filter.false_positive_rate, 0.02)
+
+
+class TestIdentifierFilter(TestCase):
+
+    def setUp(self):
+        self.app_config = django_apps.get_app_config('edc_identifier')
+        self.app_config.identifier_filter = True
+        identifier_filters.clear()
+        metrics.reset()
+        self.device_id = django_apps.get_app_config('edc_device').device_id
+
+    def tearDown(self):
+        self.app_config.identifier_filter = False
+        identifier_filters.clear()
+
+    def test_disabled(self):
+        self.app_config.identifier_filter = False
+        self.assertIsNone(
+            get_identifier_filter(IdentifierModel, 'identifier', ShortIdentifier.name))
+
+    def test_warm(self):
+        identifier = ShortIdentifier(prefix='22').identifier
+        identifier_filters.clear()
+        identifier_filter = get_identifier_filter(
+            IdentifierModel, 'identifier', ShortIdentifier.name)
+        self.assertIn(identifier, identifier_filter)
+        self.assertGreater(metrics.get('identifier_filter.shortidentifier.bytes'), 0)
+        self.assertEqual(metrics.get('identifier_filter.shortidentifier.count'), 1)
+        self.assertIsNotNone(metrics.get('identifier_filter.shortidentifier.warmup_seconds'))
+
+    def test_short_identifier_without_queries(self):
+        ShortIdentifier(prefix='22')
+        with CaptureQueriesContext(connection) as context:
+            for _ in range(0, 5):
+                ShortIdentifier(prefix='22')
+        selects = [q for q in context.captured_queries if q['sql'].startswith('SELECT')]
+        self.assertEqual(selects, [])
+        self.assertEqual(metrics.get('identifier_filter.shortidentifier.count'), 6)
+
+    def test_short_identifier_checks_filtered(self):
+        identifier = ShortIdentifier(prefix='22').identifier
+        ListShortIdentifier.random_strings = [identifier[2:], 'BBBBB']
+        with CaptureQueriesContext(connection) as context:
+            short_identifier = ListShortIdentifier(prefix='22')
+        self.assertEqual(short_identifier.identifier, '22BBBBB')
+        selects = [q['sql'] for q in context.captured_queries if q['sql'].startswith('SELECT')]
+        self.assertEqual(len(selects), 1)
+        self.assertIn(identifier, selects[0])
+        self.assertEqual(metrics.get('identifier_filter.shortidentifier.hits'), 1)
+        self.assertIsNone(metrics.get('identifier_filter.shortidentifier.false_positives'))
+
+    def test_short_identifier_conflict(self):
+        ShortIdentifier(prefix='22')
+        IdentifierModel.objects.bulk_create([IdentifierModel(
+            identifier='22AAAAA',
+            identifier_type=ShortIdentifier.name,
+            identifier_prefix='22',
+            device_id=self.device_id)])
+        ListShortIdentifier.random_strings = ['AAAAA', 'BBBBB']
+        short_identifier = ListShortIdentifier(prefix='22')
+        self.assertEqual(short_identifier.identifier, '22BBBBB')
+        self.assertEqual(metrics.get('identifier_filter.shortidentifier.conflicts'), 1)
+
+    def test_short_identifier_conflicts_bounded(self):
+        ShortIdentifier(prefix='22')
+        IdentifierModel.objects.bulk_create([IdentifierModel(
+            identifier='22AAAAA',
+            identifier_type=ShortIdentifier.name,
+            identifier_prefix='22',
+            device_id=self.device_id)])
+        ListShortIdentifier.random_strings = ['AAAAA'] * 5
+        with mock.patch.object(
+                ListShortIdentifier, 'get_unfiltered_candidate', return_value='22AAAAA'):
+            self.assertRaises(DuplicateIdentifierError, ListShortIdentifier, prefix='22')
+        self.assertEqual(
+            metrics.get('identifier_filter.shortidentifier.conflicts'),
+            ListShortIdentifier.max_conflicts + 1)
+
+    def test_short_identifier_raises_other_integrity_error(self):
+        ShortIdentifier(prefix='22')
+        ListShortIdentifier.random_strings = ['AAAAA']
+        with mock.patch.object(
+                IdentifierModel.objects, 'create', side_effect=IntegrityError('NOT NULL')):
+            self.assertRaises(IntegrityError, ListShortIdentifier, prefix='22')
+
+    def test_tracking_identifier_conflict(self):
+        identifier_type = 'edc_identifier.tracking'
+        TrackingIdentifier(identifier_type=identifier_type)
+        IdentifierModel.objects.bulk_create([IdentifierModel(
+            identifier=make_human_readable('14AAAAA'),
+            identifier_type=identifier_type,
+            device_id=self.device_id)])
+        ListSimpleIdentifier.identifiers = ['14AAAAA', '14BBBBB']
+        tracking_identifier = ListTrackingIdentifier(identifier_type=identifier_type)
+        self.assertEqual(tracking_identifier.identifier, make_human_readable('14BBBBB'))
+        self.assertEqual(
+            metrics.get(f'identifier_filter.{identifier_type}.conflicts'), 1)
+
+    def test_tracking_identifier_checks_human_readable(self):
+        self.app_config.identifier_filter = False
+        identifier_type = 'edc_identifier.tracking'
+        IdentifierModel.objects.create(
+            identifier=make_human_readable('14AAAAA'),
+            identifier_type=identifier_type,
+            device_id=self.device_id)
+        ListSimpleIdentifier.identifiers = ['14AAAAA', '14BBBBB']
+        tracking_identifier = ListTrackingIdentifier(identifier_type=identifier_type)
+        self.assertEqual(tracking_identifier.identifier, make_human_readable('14BBBBB'))
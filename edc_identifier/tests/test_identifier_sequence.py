@@ -0,0 +1,60 @@
+from django.contrib.sites.models import Site
+from django.test import TestCase, tag
+
+from ..models import IdentifierModel, IdentifierSequence
+from ..subject_identifier import SubjectIdentifier
+
+
+class TestIdentifierSequence(TestCase):
+
+    def setUp(self):
+        self.site = Site.objects.get_current()
+
+    def test_reserve_first(self):
+        sequence_number = IdentifierSequence.objects.reserve(
+            label='subjectidentifier', site=self.site, device_id=99)
+        self.assertEqual(sequence_number, 1)
+
+    def test_reserve_increments(self):
+        for i in range(1, 5):
+            sequence_number = IdentifierSequence.objects.reserve(
+                label='subjectidentifier', site=self.site, device_id=99)
+            self.assertEqual(sequence_number, i)
+        self.assertEqual(IdentifierSequence.objects.all().count(), 1)
+
+    def test_reserve_count(self):
+        sequence_number = IdentifierSequence.objects.reserve(
+            label='subjectidentifier', site=self.site, device_id=99, count=10)
+        self.assertEqual(sequence_number, 1)
+        sequence_number = IdentifierSequence.objects.reserve(
+            label='subjectidentifier', site=self.site, device_id=99)
+        self.assertEqual(sequence_number, 11)
+
+    def test_reserve_per_device_id(self):
+        IdentifierSequence.objects.reserve(
+            label='subjectidentifier', site=self.site, device_id=99)
+        sequence_number = IdentifierSequence.objects.reserve(
+            label='subjectidentifier', site=self.site, device_id=98)
+        self.assertEqual(sequence_number, 1)
+
+    def test_reserve_seeds_from_identifier_model(self):
+        IdentifierModel.objects.create(
+            name='subjectidentifier',
+            identifier='000-40990012-2',
+            sequence_number=12,
+            device_id=99,
+            site=self.site)
+        sequence_number = IdentifierSequence.objects.reserve(
+            label='subjectidentifier', site=self.site, device_id=99)
+        self.assertEqual(sequence_number, 13)
+
+    def test_subject_identifier_updates_sequence(self):
+        for _ in range(0, 3):
+            SubjectIdentifier(
+                identifier_type='subject',
+                requesting_model='edc_identifier.enrollment',
+                protocol_number='000',
+                device_id='99')
+        obj = IdentifierSequence.objects.get(
+            label=SubjectIdentifier.label, site=self.site, device_id=99)
+        self.assertEqual(obj.sequence_number, 3)
@@ -0,0 +1,94 @@
+from django.test import TestCase, tag
+
+from ..exceptions import IdentifierMissingTemplateValue
+from ..identifier_template import IdentifierTemplate, compile_template
+from ..research_identifier import ResearchIdentifier
+from ..subject_identifier import SubjectIdentifier
+
+
+class DummyIdentifier:
+    protocol_number = '000'
+    site_id = '40'
+    device_id = '99'
+
+
+class TestIdentifierTemplate(TestCase):
+
+    def test_fields(self):
+        identifier_template = IdentifierTemplate(
+            '{protocol_number}-{site_id}{device_id}{sequence}', padding=4)
+        self.assertEqual(
+            identifier_template.fields, ['protocol_number', 'site_id', 'device_id'])
+
+    def test_values(self):
+        identifier_template = IdentifierTemplate('{site_id}{device_id}{plot_id}{sequence}')
+        self.assertEqual(identifier_template.values(DummyIdentifier()), ('40', '99', None))
+
+    def test_format_escaped_braces(self):
+        identifier_template = IdentifierTemplate('{{P}}{device_id}{sequence}', padding=2)
+        self.assertEqual(
+            identifier_template.format(dict(device_id='99', sequence='01')), '{P}9901')
+
+    def test_format(self):
+        identifier_template = IdentifierTemplate(
+            '{protocol_number}-{site_id}{device_id}{sequence}', padding=4)
+        self.assertEqual(
+            identifier_template.format(dict(
+                protocol_number='000', site_id='40', device_id='99', sequence='0001')),
+            '000-40990001')
+
+    def test_format_raises_on_missing_or_none(self):
+        identifier_template = IdentifierTemplate('{device_id}{sequence}', padding=2)
+        self.assertRaises(
+            IdentifierMissingTemplateValue,
+            identifier_template.format, dict(sequence='01'))
+        self.assertRaises(
+            IdentifierMissingTemplateValue,
+            identifier_template.format, dict(device_id=None, sequence='01'))
+
+    def test_get_template_opts_override(self):
+
+        class MySubjectIdentifier(SubjectIdentifier):
+
+            def get_template_opts(self):
+                template_opts = super().get_template_opts()
+                template_opts.update(site_id='77')
+                return template_opts
+
+        identifier = MySubjectIdentifier(
+            identifier_type='subject',
+            requesting_model='edc_identifier.enrollment',
+            protocol_number='000',
+            device_id='99').identifier
+        self.assertTrue(identifier.startswith('000-7799'))
+        identifiers = MySubjectIdentifier.bulk_allocate(
+            2, identifier_type='subject',
+            requesting_model='edc_identifier.enrollment',
+            protocol_number='000',
+            device_id='99')
+        self.assertTrue(all(identifier.startswith('000-7799') for identifier in identifiers))
+
+    def test_compile_template_cached(self):
+        self.assertIs(
+            compile_template('{device_id}{sequence}', 4),
+            compile_template('{device_id}{sequence}', 4))
+
+    def test_subclass_compiled_once(self):
+        self.assertIs(
+            SubjectIdentifier.identifier_template,
+            compile_template(SubjectIdentifier.template, SubjectIdentifier.padding))
+
+    def test_subclass_missing_attribute_raises_on_definition(self):
+        with self.assertRaises(IdentifierMissingTemplateValue):
+
+            class BadIdentifier(ResearchIdentifier):
+                label = 'badidentifier'
+                template = '{plot_id}{sequence}'
+
+    def test_instance_template_validated(self):
+        self.assertRaises(
+            IdentifierMissingTemplateValue, SubjectIdentifier,
+            identifier_type='subject',
+            requesting_model='edc_identifier.enrollment',
+            template='{plot_id}{sequence}',
+            lazy=True)
@@ -5,8 +5,9 @@ from django.test import TestCase, tag
 
 from ..models import IdentifierModel
 from ..subject_identifier import SubjectIdentifier
-from ..infant_identifier import InfantIdentifier
-from django.test.utils import override_settings
+from ..infant_identifier import InfantIdentifier, InfantIdentifierError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext, override_settings
 from django.contrib.sites.models import Site
 from edc_registration.models import RegisteredSubject
 
@@ -126,3 +127,67 @@ class TestInfantIdentifier(TestCase):
             live_infants=3)
         self.assertEqual(
             infant_identifier.identifier, '000-40990001-6-36')
+
+    def test_allocate_triplets(self):
+        maternal_identifier = self.get_maternal_identifier()
+        with CaptureQueriesContext(connection) as context:
+            infant_identifiers = InfantIdentifier.allocate(
+                maternal_identifier=maternal_identifier,
+                requesting_model='edc_identifier.maternallabdel',
+                live_infants=3)
+        self.assertEqual(
+            [infant_identifier.identifier for infant_identifier in infant_identifiers],
+            ['000-40990001-6-36', '000-40990001-6-37', '000-40990001-6-38'])
+        self.assertEqual(
+            [infant_identifier.first_name for infant_identifier in infant_identifiers],
+            [f'Baby{i}{maternal_identifier.last_name.lower().title()}' for i in [1, 2, 3]])
+        # RegisteredSubject is created one by one so its save() runs
+        selects = [q for q in context.captured_queries if q['sql'].startswith('SELECT')
+                   and IdentifierModel._meta.db_table in q['sql']]
+        inserts = [q for q in context.captured_queries if q['sql'].startswith('INSERT')
+                   and IdentifierModel._meta.db_table in q['sql']]
+        self.assertEqual(len(selects), 1)
+        self.assertEqual(len(inserts), 1)
+        self.assertEqual(
+            IdentifierModel.objects.filter(
+                identifier_type='infant',
+                linked_identifier=maternal_identifier.identifier).count(), 3)
+        self.assertEqual(
+            RegisteredSubject.objects.filter(
+                subject_identifier__in=[i.identifier for i in infant_identifiers]).count(), 3)
+
+    def test_allocate_birth_orders(self):
+        maternal_identifier = self.get_maternal_identifier()
+        infant_identifiers = InfantIdentifier.allocate(
+            maternal_identifier=maternal_identifier,
+            requesting_model='edc_identifier.maternallabdel',
+            live_infants=3,
+            birth_orders=[3, 2])
+        self.assertEqual(
+            [infant_identifier.identifier for infant_identifier in infant_identifiers],
+            ['000-40990001-6-37', '000-40990001-6-38'])
+
+    def test_allocate_existing(self):
+        maternal_identifier = self.get_maternal_identifier()
+        InfantIdentifier(
+            maternal_identifier=maternal_identifier,
+            requesting_model='edc_identifier.maternallabdel',
+            birth_order=2,
+            live_infants=2)
+        self.assertRaises(
+            InfantIdentifierError, InfantIdentifier.allocate,
+            maternal_identifier=maternal_identifier,
+            requesting_model='edc_identifier.maternallabdel',
+            live_infants=2)
+        self.assertEqual(IdentifierModel.objects.filter(identifier_type='infant').count(), 1)
+
+    def test_allocate_invalid(self):
+        maternal_identifier = self.get_maternal_identifier()
+        invalid = [(0, None), (6, None), (2, [1, 1]), (2, [3]), (2, [0]), (None, [1, 2])]
+        for live_infants, birth_orders in invalid:
+            with self.subTest(live_infants=live_infants, birth_orders=birth_orders):
+                self.assertRaises(
+                    InfantIdentifierError, InfantIdentifier.allocate,
+                    maternal_identifier=maternal_identifier,
+                    live_infants=live_infants,
+                    birth_orders=birth_orders)
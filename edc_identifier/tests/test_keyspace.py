@@ -0,0 +1,115 @@
+import json
+
+from io import StringIO
+from django.apps import apps as django_apps
+from django.core.management import call_command
+from django.test import TestCase
+
+from ..keyspace import Keyspace, random_string_lengths
+from ..management.commands.keyspace_occupancy import get_registry
+from ..metrics import metrics
+from ..model_mixins import TrackingIdentifier
+from ..short_identifier import ShortIdentifier
+from ..simple_identifier import SimpleUniqueIdentifier
+
+
+class TestKeyspace(TestCase):
+
+    def setUp(self):
+        self.app_config = django_apps.get_app_config('edc_identifier')
+        random_string_lengths.clear()
+        ShortIdentifier.collision_rates.clear()
+
+    def tearDown(self):
+        self.app_config.keyspace_escalation_threshold = None
+        self.app_config.keyspace_max_random_string_length = None
+        random_string_lengths.clear()
+
+    def test_keyspace(self):
+        keyspace = Keyspace(
+            identifier_type='blah', random_string_length=2, alphabet='ABCD', used=8)
+        self.assertEqual(keyspace.size, 16)
+        self.assertEqual(keyspace.fill_ratio, 0.5)
+        self.assertEqual(keyspace.expected_tries, 2.0)
+        keyspace.used = 16
+        self.assertIsNone(keyspace.expected_tries)
+
+    def test_short_identifier_keyspace(self):
+        for _ in range(0, 5):
+            ShortIdentifier(prefix='22', random_string_length=2)
+        ShortIdentifier(prefix='33', random_string_length=2)
+        ShortIdentifier(prefix='22', random_string_length=3)
+        keyspace = ShortIdentifier(
+            prefix='22', random_string_length=2, lazy=True).get_keyspace()
+        self.assertEqual(keyspace.used, 5)
+        self.assertEqual(keyspace.size, 27 ** 2)
+        self.assertEqual(keyspace.prefix, '22')
+
+    def test_simple_unique_identifier_keyspace(self):
+        for _ in range(0, 3):
+            SimpleUniqueIdentifier()
+        keyspace = SimpleUniqueIdentifier(lazy=True).get_keyspace()
+        self.assertEqual(keyspace.used, 3)
+        self.assertEqual(keyspace.size, 27 ** 5)
+
+    def test_timestamp_keyspace(self):
+        self.assertIsNone(TrackingIdentifier(lazy=True).get_keyspace())
+
+    def test_not_escalated_by_default(self):
+        for _ in range(0, 20):
+            ShortIdentifier(prefix='22', random_string_length=1)
+        identifier = ShortIdentifier(prefix='22', random_string_length=1).identifier
+        self.assertEqual(len(identifier), 3)
+
+    def test_escalates(self):
+        for _ in range(0, 3):
+            ShortIdentifier(prefix='22', random_string_length=1)
+        self.app_config.keyspace_escalation_threshold = 0.1
+        escalations = metrics.get('keyspace.shortidentifier.22.escalations', 0)
+        identifier = ShortIdentifier(prefix='22', random_string_length=1).identifier
+        self.assertEqual(len(identifier), 4)
+        self.assertEqual(
+            metrics.get('keyspace.shortidentifier.22.escalations'), escalations + 1)
+        identifier = ShortIdentifier(prefix='22', random_string_length=1).identifier
+        self.assertEqual(len(identifier), 4)
+
+    def test_escalates_up_to_max_length(self):
+        for _ in range(0, 3):
+            ShortIdentifier(prefix='22', random_string_length=1)
+        self.app_config.keyspace_escalation_threshold = 0.1
+        self.app_config.keyspace_max_random_string_length = 1
+        identifier = ShortIdentifier(prefix='22', random_string_length=1).identifier
+        self.assertEqual(len(identifier), 3)
+
+    def test_simple_unique_identifier_escalates(self):
+        obj = SimpleUniqueIdentifier(lazy=True)
+        obj.random_string_length = 1
+        obj.create_identifier_model()
+        self.app_config.keyspace_escalation_threshold = 0.01
+        obj = SimpleUniqueIdentifier(lazy=True)
+        obj.random_string_length = 1
+        self.assertEqual(len(obj.identifier), len('14') + 2)
+
+    def test_registry(self):
+        ShortIdentifier(prefix='22')
+        registry = get_registry()
+        self.assertEqual(
+            [obj.prefix for obj in registry['shortidentifier']], ['22'])
+        self.assertIn('simple_identifier', registry)
+
+    def test_command(self):
+        for _ in range(0, 3):
+            ShortIdentifier(prefix='22', random_string_length=1)
+        self.app_config.keyspace_escalation_threshold = 0.1
+        ShortIdentifier.random_string_length, length = 1, ShortIdentifier.random_string_length
+        try:
+            out = StringIO()
+            call_command(
+                'keyspace_occupancy', '--identifier-type', 'shortidentifier', '--json',
+                stdout=out)
+        finally:
+            ShortIdentifier.random_string_length = length
+        rows = [json.loads(line) for line in out.getvalue().splitlines()]
+        self.assertEqual([row['random_string_length'] for row in rows], [1, 2])
+        self.assertEqual(rows[0]['used'], 3)
+        self.assertEqual(rows[0]['size'], 27)
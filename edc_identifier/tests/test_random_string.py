@@ -0,0 +1,55 @@
+from collections import Counter
+from django.test import TestCase
+
+from ..random_string import ALPHABET, RandomStringGenerator, get_generator, reset_generators
+from ..simple_identifier import SimpleIdentifier
+
+
+class TestRandomString(TestCase):
+
+    def test_random_strings(self):
+        random_strings = RandomStringGenerator().get_random_strings(5, 10000)
+        self.assertEqual(len(random_strings), 10000)
+        self.assertTrue(all(len(random_string) == 5 for random_string in random_strings))
+        counter = Counter(''.join(random_strings))
+        self.assertEqual(set(counter), set(ALPHABET))
+        # 50000 characters, expected 1852 per character
+        self.assertGreater(min(counter.values()), 1600)
+        self.assertLess(max(counter.values()), 2100)
+
+    def test_alphabet(self):
+        generator = RandomStringGenerator('AB')
+        self.assertEqual(set(generator.get_random_string(100)), {'A', 'B'})
+        self.assertRaises(ValueError, RandomStringGenerator, 'ABΔ')
+        self.assertRaises(ValueError, RandomStringGenerator, 'A' * 257)
+
+    def test_seed(self):
+        self.assertEqual(
+            RandomStringGenerator(seed=1).get_random_strings(5, 10),
+            RandomStringGenerator(seed=1).get_random_strings(5, 10))
+        self.assertNotEqual(
+            RandomStringGenerator(seed=1).get_random_strings(5, 10),
+            RandomStringGenerator(seed=2).get_random_strings(5, 10))
+
+    def test_shared_generator(self):
+        self.assertIs(get_generator(), get_generator(ALPHABET))
+        self.assertIsNot(get_generator(), get_generator(seed=1))
+
+    def test_test_random_seed(self):
+
+        class SeedSimpleIdentifier(SimpleIdentifier):
+            seed = 1
+
+        class TestSeedSimpleIdentifier(SimpleIdentifier):
+            test_random_seed = 1
+
+        self.assertIs(SeedSimpleIdentifier().random_string_generator, get_generator())
+        self.assertIs(
+            TestSeedSimpleIdentifier().random_string_generator, get_generator(seed=1))
+
+    def test_reset(self):
+        generator = get_generator('AB')
+        generator.get_random_string(1)
+        self.assertTrue(generator.buffer)
+        reset_generators()
+        self.assertEqual(generator.buffer, '')
@@ -0,0 +1,256 @@
+from io import StringIO
+from unittest import mock
+
+from django.contrib.sites.models import Site
+from django.core.management import call_command
+from django.db import IntegrityError
+from django.test import TestCase, tag
+
+from ..exceptions import IdentifierSequenceRangeError
+from ..metrics import metrics
+from ..models import IdentifierModel, IdentifierSequence, IdentifierSequenceGap
+from ..models import IdentifierSequenceRange
+from ..sequence_allocators import BlockSequenceAllocator, OptimisticSequenceAllocator
+from ..sequence_allocators import SequenceAllocator
+from ..sequence_allocators import ReservedRangeSequenceAllocator
+from ..sequence_allocators import reset_block_sequence_allocators
+from ..subject_identifier import SubjectIdentifier
+
+
+class TestBlockSequenceAllocator(TestCase):
+
+    def setUp(self):
+        self.site = Site.objects.get_current()
+        self.opts = dict(
+            label='subjectidentifier', site=self.site, device_id=99)
+
+    def test_reserves_block(self):
+        allocator = BlockSequenceAllocator(block_size=5)
+        with self.captureOnCommitCallbacks(execute=True):
+            sequence_number = allocator.next_sequence_number(**self.opts)
+        self.assertEqual(sequence_number, 1)
+        obj = IdentifierSequence.objects.get(
+            label='subjectidentifier', site=self.site, device_id=99)
+        self.assertEqual(obj.sequence_number, 5)
+
+    def test_allocates_from_block(self):
+        allocator = BlockSequenceAllocator(block_size=5)
+        sequence_numbers = []
+        for _ in range(0, 7):
+            with self.captureOnCommitCallbacks(execute=True):
+                sequence_numbers.append(
+                    allocator.next_sequence_number(**self.opts))
+        self.assertEqual(sequence_numbers, [1, 2, 3, 4, 5, 6, 7])
+        obj = IdentifierSequence.objects.get(
+            label='subjectidentifier', site=self.site, device_id=99)
+        self.assertEqual(obj.sequence_number, 10)
+
+    def test_block_not_used_before_commit(self):
+        allocator = BlockSequenceAllocator(block_size=5)
+        allocator.next_sequence_number(**self.opts)
+        self.assertEqual(allocator.blocks, {})
+
+    def test_release_records_gaps(self):
+        allocator = BlockSequenceAllocator(block_size=5)
+        with self.captureOnCommitCallbacks(execute=True):
+            allocator.next_sequence_number(**self.opts)
+        allocator.next_sequence_number(**self.opts)
+        allocator.release()
+        gap = IdentifierSequenceGap.objects.get(label='subjectidentifier')
+        self.assertEqual(gap.first_sequence_number, 3)
+        self.assertEqual(gap.last_sequence_number, 5)
+        self.assertEqual(allocator.blocks, {})
+
+    def test_reset_after_fork(self):
+        allocator = BlockSequenceAllocator(block_size=5)
+        with self.captureOnCommitCallbacks(execute=True):
+            allocator.next_sequence_number(**self.opts)
+        reset_block_sequence_allocators()
+        self.assertEqual(allocator.blocks, {})
+        with self.captureOnCommitCallbacks(execute=True):
+            sequence_number = allocator.next_sequence_number(**self.opts)
+        self.assertEqual(sequence_number, 6)
+        self.assertEqual(IdentifierSequenceGap.objects.all().count(), 0)
+
+    def test_subject_identifier(self):
+
+        class MySubjectIdentifier(SubjectIdentifier):
+            sequence_allocator = BlockSequenceAllocator(block_size=5)
+
+        identifiers = []
+        for _ in range(0, 3):
+            with self.captureOnCommitCallbacks(execute=True):
+                identifiers.append(MySubjectIdentifier(
+                    identifier_type='subject',
+                    requesting_model='edc_identifier.enrollment',
+                    protocol_number='000',
+                    device_id='99').identifier)
+        self.assertEqual(
+            [identifier[8:12] for identifier in identifiers],
+            ['0001', '0002', '0003'])
+
+
+class ConflictingSequenceAllocator(OptimisticSequenceAllocator):
+
+    """Returns sequence number 1 on the first `conflicts` calls.
+    """
+
+    def __init__(self, conflicts=None, **kwargs):
+        super().__init__(**kwargs)
+        self.conflicts = conflicts
+
+    def next_sequence_number(self, **kwargs):
+        if self.conflicts:
+            self.conflicts -= 1
+            return 1
+        return super().next_sequence_number(**kwargs)
+
+
+class TestOptimisticSequenceAllocator(TestCase):
+
+    def setUp(self):
+        metrics.reset()
+        self.opts = dict(
+            identifier_type='subject',
+            requesting_model='edc_identifier.enrollment',
+            protocol_number='000',
+            device_id='99')
+
+    def test_next_sequence_number(self):
+
+        class MySubjectIdentifier(SubjectIdentifier):
+            sequence_allocator = OptimisticSequenceAllocator(jitter=0)
+
+        for i in range(1, 4):
+            identifier = MySubjectIdentifier(**self.opts).identifier
+            self.assertEqual(identifier[8:12], f'000{i}')
+        self.assertFalse(IdentifierSequence.objects.all().exists())
+
+    def test_retries_on_conflict(self):
+
+        class MySubjectIdentifier(SubjectIdentifier):
+            sequence_allocator = ConflictingSequenceAllocator(
+                conflicts=2, jitter=0)
+
+        MySubjectIdentifier.sequence_allocator.conflicts = 0
+        MySubjectIdentifier(**self.opts)
+        MySubjectIdentifier.sequence_allocator.conflicts = 2
+        identifier = MySubjectIdentifier(**self.opts).identifier
+        self.assertEqual(identifier[8:12], '0002')
+        self.assertEqual(
+            metrics.get('research_identifier.subjectidentifier.retries'), 2)
+
+    def test_raises_when_retries_exhausted(self):
+
+        class MySubjectIdentifier(SubjectIdentifier):
+            sequence_allocator = ConflictingSequenceAllocator(
+                conflicts=0, retries=2, jitter=0)
+
+        MySubjectIdentifier(**self.opts)
+        MySubjectIdentifier.sequence_allocator.conflicts = 3
+        self.assertRaises(IntegrityError, MySubjectIdentifier, **self.opts)
+        self.assertEqual(
+            metrics.get('research_identifier.subjectidentifier.failures'), 1)
+
+    def test_no_delay_within_transaction(self):
+
+        class MySubjectIdentifier(SubjectIdentifier):
+            sequence_allocator = ConflictingSequenceAllocator(
+                conflicts=0, jitter=10)
+
+        MySubjectIdentifier(**self.opts)
+        MySubjectIdentifier.sequence_allocator.conflicts = 1
+        with mock.patch('edc_identifier.research_identifier.time.sleep') as sleep:
+            MySubjectIdentifier(**self.opts)
+        sleep.assert_not_called()
+
+    def test_counter_reconciled_after_switch(self):
+
+        class MySubjectIdentifier(SubjectIdentifier):
+            sequence_allocator = SequenceAllocator()
+
+        class MyOptimisticSubjectIdentifier(SubjectIdentifier):
+            sequence_allocator = OptimisticSequenceAllocator(jitter=0)
+
+        MySubjectIdentifier(**self.opts)
+        for _ in range(0, 3):
+            MyOptimisticSubjectIdentifier(**self.opts)
+        MySubjectIdentifier.sequence_allocator = SequenceAllocator()
+        identifier = MySubjectIdentifier(**self.opts).identifier
+        self.assertEqual(identifier[8:12], '0005')
+
+
+class TestReservedRangeSequenceAllocator(TestCase):
+
+    def setUp(self):
+        self.site = Site.objects.get_current()
+        self.opts = dict(
+            label='subjectidentifier', site=self.site, device_id=99)
+
+    def test_grant(self):
+        obj = IdentifierSequenceRange.objects.grant(count=10, **self.opts)
+        self.assertEqual(obj.first_sequence_number, 1)
+        self.assertEqual(obj.last_sequence_number, 10)
+        obj = IdentifierSequenceRange.objects.grant(count=10, **self.opts)
+        self.assertEqual(obj.first_sequence_number, 11)
+        self.assertEqual(IdentifierSequenceRange.objects.remaining(**self.opts), 20)
+
+    def test_grant_after_issued_and_granted(self):
+        IdentifierSequenceRange.objects.grant(count=10, **self.opts)
+        IdentifierSequence.objects.filter(
+            label='subjectidentifier', site=self.site, device_id=99).update(
+                sequence_number=0)
+        obj = IdentifierSequenceRange.objects.grant(count=10, **self.opts)
+        self.assertEqual(obj.first_sequence_number, 11)
+        IdentifierModel.objects.create(
+            name='subjectidentifier', identifier='000-40990025-1', sequence_number=25,
+            device_id=99, site=self.site)
+        obj = IdentifierSequenceRange.objects.grant(count=10, **self.opts)
+        self.assertEqual(obj.first_sequence_number, 26)
+
+    def test_allocates_from_range(self):
+        IdentifierSequenceRange.objects.grant(count=2, **self.opts)
+        IdentifierSequenceRange.objects.grant(count=2, **self.opts)
+        allocator = ReservedRangeSequenceAllocator(low_watermark=0)
+        sequence_numbers = [
+            allocator.next_sequence_number(**self.opts) for _ in range(0, 4)]
+        self.assertEqual(sequence_numbers, [1, 2, 3, 4])
+        self.assertEqual(IdentifierSequenceRange.objects.remaining(**self.opts), 0)
+
+    def test_raises_when_empty(self):
+        IdentifierSequenceRange.objects.grant(count=1, **self.opts)
+        allocator = ReservedRangeSequenceAllocator(low_watermark=0)
+        allocator.next_sequence_number(**self.opts)
+        self.assertRaises(
+            IdentifierSequenceRangeError,
+            allocator.next_sequence_number, **self.opts)
+
+    def test_warns_below_low_watermark(self):
+        IdentifierSequenceRange.objects.grant(count=5, **self.opts)
+        allocator = ReservedRangeSequenceAllocator(low_watermark=3)
+        allocator.next_sequence_number(**self.opts)
+        with self.assertLogs('edc_identifier.sequence_allocators', level='WARNING'):
+            allocator.next_sequence_number(**self.opts)
+            allocator.next_sequence_number(**self.opts)
+
+    def test_subject_identifier(self):
+
+        class MySubjectIdentifier(SubjectIdentifier):
+            sequence_allocator = ReservedRangeSequenceAllocator(low_watermark=0)
+
+        IdentifierSequenceRange.objects.grant(
+            label=MySubjectIdentifier.label, site=self.site, device_id=99, count=10)
+        identifier = MySubjectIdentifier(
+            identifier_type='subject',
+            requesting_model='edc_identifier.enrollment',
+            protocol_number='000',
+            device_id='99').identifier
+        self.assertEqual(identifier, '000-40990001-6')
+
+    def test_grant_command(self):
+        out = StringIO()
+        call_command(
+            'grant_identifier_range', 'subjectidentifier', '99', '10',
+            stdout=out, stderr=StringIO())
+        self.assertIn('edc_identifier.identifiersequencerange', out.getvalue())
+        self.assertEqual(IdentifierSequenceRange.objects.remaining(**self.opts), 10)
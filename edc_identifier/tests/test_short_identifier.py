@@ -2,8 +2,12 @@ from faker import Faker
 
 from django.apps import apps as django_apps
 from django.core.exceptions import ObjectDoesNotExist
+from django.db import connection
 from django.test import TestCase, tag
+from django.test.utils import CaptureQueriesContext
+from itertools import product
 
+from ..checkdigit_mixins import DammAlphaMixin
 from ..models import IdentifierModel
 from ..short_identifier import DuplicateIdentifierError, ShortIdentifierPrefixPatternError
 from ..short_identifier import ShortIdentifier, ShortIdentifierPrefixError
@@ -60,6 +64,17 @@ class TestShortIdentifier(TestCase):
             ShortIdentifier,
             prefix_pattern='^[0-9]{2}$', prefix='AA')
 
+    def test_short_identifier_checkdigit(self):
+
+        class CheckdigitShortIdentifier(ShortIdentifier):
+            template = '{prefix}{random_string}{checkdigit}'
+            checkdigit = DammAlphaMixin()
+
+        identifier = CheckdigitShortIdentifier(prefix=22).identifier
+        self.assertEqual(len(identifier), 8)
+        self.assertEqual(DammAlphaMixin().verify_checkdigits([identifier]), [True])
+        self.assertEqual(len(ShortIdentifier(prefix=22).identifier), 7)
+
     def test_short_identifier_identifier_model(self):
         short_identifier = ShortIdentifier(
             prefix_pattern='^[0-9]{2}$', prefix=22)
@@ -151,3 +166,37 @@ class TestShortIdentifier(TestCase):
                 break
         self.assertGreater(n, 32)
         self.assertLess(n, 35)
+
+    def test_short_identifier_candidate_count(self):
+        short_identifier = ShortIdentifier(prefix='22', lazy=True)
+        allowed_chars = short_identifier.allowed_chars
+        key = short_identifier.get_keyspace_key(allowed_chars)
+        ShortIdentifier.collision_rates[key] = 0.0
+        self.assertEqual(short_identifier.get_candidate_count(allowed_chars), 1)
+        self.assertEqual(short_identifier.get_candidate_count(allowed_chars, 2), 4)
+        ShortIdentifier.collision_rates[key] = 0.8
+        self.assertEqual(short_identifier.get_candidate_count(allowed_chars), 14)
+        ShortIdentifier.collision_rates[key] = 1.0
+        self.assertEqual(short_identifier.get_candidate_count(allowed_chars), 64)
+        ShortIdentifier.collision_rates.pop(key)
+
+    def test_short_identifier_queries_when_keyspace_mostly_full(self):
+        """Asserts one or two queries per identifier with the keyspace
+        about 80% full.
+        """
+        options = dict(random_string_pattern=r'[AB]+', random_string_length=7)
+        random_strings = [''.join(chars) for chars in product('AB', repeat=7)]
+        IdentifierModel.objects.bulk_create([
+            IdentifierModel(
+                identifier=f'22{random_string}',
+                identifier_type=ShortIdentifier.name,
+                identifier_prefix='22',
+                device_id=self.device_id)
+            for random_string in random_strings[:100]])
+        ShortIdentifier(prefix='22', **options)
+        with CaptureQueriesContext(connection) as context:
+            for _ in range(0, 10):
+                ShortIdentifier(prefix='22', **options)
+        selects = [q for q in context.captured_queries
+                   if q['sql'].startswith('SELECT')]
+        self.assertLessEqual(len(selects), 20)
@@ -0,0 +1,217 @@
+from io import StringIO
+from unittest import mock
+
+from django.apps import apps as django_apps
+from django.core.management import call_command
+from django.db import IntegrityError, connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from ..metrics import metrics
+from ..models import IdentifierModel, ShortIdentifierPool, ShortIdentifierSequence
+from ..permutation import FeistelPermutation
+from ..short_identifier import DuplicateIdentifierError, ShortIdentifier
+from ..short_identifier_allocators import (
+    PermutationAllocator, PoolAllocator, reset_pool_allocators)
+
+
+class PermutationShortIdentifier(ShortIdentifier):
+    identifier_allocator = PermutationAllocator()
+
+
+class PoolShortIdentifier(ShortIdentifier):
+    name = 'poolshortidentifier'
+    identifier_allocator = PoolAllocator(size=5)
+
+
+class TestFeistelPermutation(TestCase):
+
+    def test_permutation(self):
+        for size in [1, 2, 8, 27, 1000]:
+            permutation = FeistelPermutation(size=size, key=b'key')
+            self.assertEqual(
+                sorted(permutation.permute(value) for value in range(0, size)),
+                list(range(0, size)))
+
+    def test_key(self):
+        values = range(0, 100)
+        self.assertNotEqual(
+            [FeistelPermutation(size=27 ** 5, key=b'key1').permute(v) for v in values],
+            [FeistelPermutation(size=27 ** 5, key=b'key2').permute(v) for v in values])
+
+    def test_out_of_range(self):
+        permutation = FeistelPermutation(size=10, key=b'key')
+        self.assertRaises(ValueError, permutation.permute, 10)
+        self.assertRaises(ValueError, permutation.permute, -1)
+
+
+class TestPermutationAllocator(TestCase):
+
+    def setUp(self):
+        self.options = dict(
+            prefix='22', random_string_pattern=r'[AB]+', random_string_length=3)
+
+    def test_unique_without_existence_query(self):
+        with CaptureQueriesContext(connection) as context:
+            identifiers = [
+                PermutationShortIdentifier(**self.options).identifier
+                for _ in range(0, 8)]
+        self.assertEqual(len(set(identifiers)), 8)
+        selects = [q for q in context.captured_queries
+                   if q['sql'].startswith('SELECT')
+                   and IdentifierModel._meta.db_table in q['sql']]
+        self.assertEqual(selects, [])
+        self.assertEqual(
+            ShortIdentifierSequence.objects.get(name='shortidentifier', prefix='22')
+            .sequence_number, 8)
+
+    def test_raises_when_all_taken(self):
+        for _ in range(0, 8):
+            PermutationShortIdentifier(**self.options)
+        self.assertRaises(
+            DuplicateIdentifierError, PermutationShortIdentifier, **self.options)
+
+    def test_skips_existing(self):
+        short_identifier = PermutationShortIdentifier(lazy=True, **self.options)
+        allocator = short_identifier.identifier_allocator
+        ShortIdentifierSequence.objects.reserve(name='shortidentifier', prefix='22')
+        obj = ShortIdentifierSequence.objects.get(name='shortidentifier', prefix='22')
+        obj.sequence_number = 0
+        obj.save()
+        existing = short_identifier.format_identifier(allocator.get_random_string(
+            0, obj.key, short_identifier.allowed_chars, 3))
+        IdentifierModel.objects.create(
+            identifier=existing,
+            identifier_type='shortidentifier',
+            identifier_prefix='22',
+            device_id=django_apps.get_app_config('edc_device').device_id)
+        identifier = short_identifier.get_identifier()
+        self.assertNotEqual(identifier, existing)
+        self.assertEqual(
+            identifier,
+            short_identifier.format_identifier(allocator.get_random_string(
+                1, obj.key, short_identifier.allowed_chars, 3)))
+
+    def test_raises_other_integrity_error(self):
+        short_identifier = PermutationShortIdentifier(lazy=True, **self.options)
+        with mock.patch.object(
+                IdentifierModel.objects, 'create',
+                side_effect=IntegrityError('NOT NULL constraint failed')) as create:
+            self.assertRaises(IntegrityError, short_identifier.get_identifier)
+        self.assertEqual(create.call_count, 1)
+        self.assertEqual(
+            ShortIdentifierSequence.objects.get(name='shortidentifier', prefix='22')
+            .sequence_number, 1)
+
+    async def test_async(self):
+        short_identifier = PermutationShortIdentifier(lazy=True, **self.options)
+        identifier = await short_identifier.aget_identifier()
+        self.assertEqual(short_identifier.identifier, identifier)
+        self.assertTrue(
+            await IdentifierModel.objects.filter(identifier=identifier).aexists())
+
+
+class TestPoolAllocator(TestCase):
+
+    def setUp(self):
+        self.options = dict(
+            prefix='22', random_string_pattern=r'[AB]+', random_string_length=3)
+
+    def test_fill(self):
+        short_identifier = PoolShortIdentifier(lazy=True, **self.options)
+        allocator = short_identifier.identifier_allocator
+        self.assertEqual(allocator.fill(short_identifier), 5)
+        self.assertEqual(allocator.fill(short_identifier), 0)
+        identifiers = ShortIdentifierPool.objects.filter(
+            name='poolshortidentifier', prefix='22').values_list('identifier', flat=True)
+        self.assertEqual(len(set(identifiers)), 5)
+        self.assertEqual(IdentifierModel.objects.filter(
+            identifier__in=identifiers, identifier_type='poolshortidentifier',
+            identifier_prefix='22').count(), 5)
+
+    def test_fill_skips_existing(self):
+        for _ in range(0, 4):
+            ShortIdentifier(name='poolshortidentifier', **self.options)
+        short_identifier = PoolShortIdentifier(lazy=True, **self.options)
+        self.assertEqual(
+            short_identifier.identifier_allocator.fill(short_identifier, size=4), 4)
+        self.assertRaises(
+            DuplicateIdentifierError,
+            short_identifier.identifier_allocator.fill, short_identifier, 5)
+
+    def test_fill_skips_existing_of_other_type(self):
+        for _ in range(0, 4):
+            ShortIdentifier(name='othershortidentifier', **self.options)
+        short_identifier = PoolShortIdentifier(lazy=True, **self.options)
+        self.assertEqual(
+            short_identifier.identifier_allocator.fill(short_identifier, size=4), 4)
+        self.assertEqual(IdentifierModel.objects.filter(identifier_prefix='22').count(), 8)
+
+    def test_fill_raises_other_integrity_error(self):
+        short_identifier = PoolShortIdentifier(lazy=True, **self.options)
+        with mock.patch.object(
+                ShortIdentifierPool.objects, 'bulk_create',
+                side_effect=IntegrityError('NOT NULL constraint failed')) as bulk_create:
+            self.assertRaises(
+                IntegrityError, short_identifier.identifier_allocator.fill, short_identifier)
+        self.assertEqual(bulk_create.call_count, 1)
+        self.assertFalse(IdentifierModel.objects.filter(identifier_prefix='22').exists())
+
+    def test_claim_without_existence_query(self):
+        short_identifier = PoolShortIdentifier(lazy=True, **self.options)
+        short_identifier.identifier_allocator.fill(short_identifier)
+        pool = set(ShortIdentifierPool.objects.values_list('identifier', flat=True))
+        with CaptureQueriesContext(connection) as context:
+            identifiers = [
+                PoolShortIdentifier(**self.options).identifier for _ in range(0, 5)]
+        self.assertEqual(set(identifiers), pool)
+        selects = [q for q in context.captured_queries
+                   if q['sql'].startswith('SELECT')
+                   and IdentifierModel._meta.db_table in q['sql']]
+        self.assertEqual(selects, [])
+        self.assertEqual(ShortIdentifierPool.objects.count(), 0)
+
+    def test_empty_pool(self):
+        misses = metrics.get('short_identifier.poolshortidentifier.pool_misses', 0)
+        identifier = PoolShortIdentifier(**self.options).identifier
+        self.assertTrue(IdentifierModel.objects.filter(identifier=identifier).exists())
+        self.assertEqual(
+            metrics.get('short_identifier.poolshortidentifier.pool_misses'), misses + 1)
+
+    def test_run_fill_options(self):
+        short_identifier = PoolShortIdentifier(
+            lazy=True, template='{prefix}-{random_string}', **self.options)
+        allocator = PoolAllocator(size=5, refill_interval=1)
+        with mock.patch.object(allocator, 'fill') as fill, \
+                mock.patch('edc_identifier.short_identifier_allocators.connection'), \
+                mock.patch('edc_identifier.short_identifier_allocators.time.sleep',
+                           side_effect=StopIteration):
+            self.assertRaises(
+                StopIteration, allocator.run, PoolShortIdentifier,
+                allocator.get_fill_options(short_identifier))
+        filled = fill.call_args[0][0]
+        self.assertEqual(filled.name, 'poolshortidentifier')
+        self.assertEqual(filled.prefix, '22')
+        self.assertEqual(filled.template, '{prefix}-{random_string}')
+        self.assertEqual(filled.random_string_length, 3)
+        self.assertEqual(filled.allowed_chars, 'AB')
+
+    def test_reset_after_fork(self):
+        allocator = PoolAllocator(size=5, refill_interval=60)
+        allocator.threads[('poolshortidentifier', '22')] = mock.Mock()
+        reset_pool_allocators()
+        self.assertEqual(allocator.threads, {})
+
+    def test_command(self):
+        err = StringIO()
+        call_command(
+            'fill_short_identifier_pool', 'poolshortidentifier',
+            '--prefix', '22', '--prefix', '33', stdout=StringIO(), stderr=err)
+        self.assertEqual(ShortIdentifierPool.objects.filter(prefix='22').count(), 5)
+        self.assertEqual(ShortIdentifierPool.objects.filter(prefix='33').count(), 5)
+        self.assertIn('Added 5 identifiers', err.getvalue())
+
+    async def test_async(self):
+        short_identifier = PoolShortIdentifier(lazy=True, **self.options)
+        identifier = await short_identifier.aget_identifier()
+        self.assertEqual(short_identifier.identifier, identifier)
@@ -1,10 +1,25 @@
+from unittest import mock
+
+from django.apps import apps as django_apps
+from django.db import IntegrityError, connection
 from django.test import TestCase, tag
+from django.test.utils import CaptureQueriesContext
 
-from ..simple_identifier import SimpleIdentifier
+from ..model_mixins import TrackingIdentifier
+from ..simple_identifier import (
+    DuplicateIdentifierError, IdentifierError, SimpleIdentifier, SimpleTimestampIdentifier)
+from ..timestamp_sequence import TimestampSequence, reset_timestamp_sequences
 from edc_identifier.simple_identifier import SimpleUniqueIdentifier
 from edc_identifier.models import IdentifierModel
 from django.core.exceptions import ObjectDoesNotExist
 
+from .identifiers import ListSimpleIdentifier, ListUniqueIdentifier
+from .models import TrackedItem
+
+
+class InsertFirstIdentifier(SimpleUniqueIdentifier):
+    insert_first = True
+
 
 class TestSimpleIdentifier(TestCase):
 
@@ -19,3 +34,147 @@ class TestSimpleIdentifier(TestCase):
             IdentifierModel.objects.get(identifier=obj.identifier)
         except ObjectDoesNotExist:
             self.fail('Identifier not add to history')
+
+    def test_insert_first(self):
+        with CaptureQueriesContext(connection) as context:
+            obj = InsertFirstIdentifier()
+        self.assertTrue(IdentifierModel.objects.filter(identifier=obj.identifier).exists())
+        selects = [q for q in context.captured_queries if q['sql'].startswith('SELECT')]
+        inserts = [q for q in context.captured_queries if q['sql'].startswith('INSERT')]
+        self.assertEqual(selects, [])
+        self.assertEqual(len(inserts), 1)
+
+    def test_insert_first_collision(self):
+        IdentifierModel.objects.create(
+            identifier='14AAAAA',
+            identifier_type='simple_identifier',
+            device_id=django_apps.get_app_config('edc_device').device_id)
+        ListSimpleIdentifier.identifiers = ['14AAAAA', '14BBBBB']
+
+        class MyIdentifier(InsertFirstIdentifier):
+            identifier_cls = ListSimpleIdentifier
+
+        obj = MyIdentifier()
+        self.assertEqual(obj.identifier, '14BBBBB')
+        self.assertEqual(IdentifierModel.objects.filter(
+            identifier__in=['14AAAAA', '14BBBBB']).count(), 2)
+
+    def test_insert_first_raises_other_integrity_error(self):
+        with mock.patch.object(
+                IdentifierModel.objects, 'create', side_effect=IntegrityError('NOT NULL')) as create:
+            self.assertRaises(IntegrityError, InsertFirstIdentifier)
+        self.assertEqual(create.call_count, 1)
+
+    def test_tracking_identifier_inserts_first(self):
+        with CaptureQueriesContext(connection) as context:
+            TrackingIdentifier(identifier_type='edc_identifier.box')
+        selects = [q for q in context.captured_queries if q['sql'].startswith('SELECT')]
+        self.assertEqual(selects, [])
+
+    def test_insert_first_requires_unique_field(self):
+        self.assertRaises(
+            IdentifierError, InsertFirstIdentifier, identifier_attr='linked_identifier')
+
+    def test_shared_model_cls_and_generator(self):
+        obj1 = TrackingIdentifier(identifier_type='edc_identifier.box', lazy=True)
+        obj2 = TrackingIdentifier(identifier_type='edc_identifier.box', lazy=True)
+        self.assertIs(obj1.model_cls, IdentifierModel)
+        self.assertIs(obj1.identifier_field, IdentifierModel._meta.get_field('identifier'))
+        self.assertIs(obj1.identifier_generator, obj2.identifier_generator)
+        self.assertNotEqual(obj1._get_new_identifier(), obj2._get_new_identifier())
+
+    def test_allocate(self):
+        identifiers = SimpleUniqueIdentifier(lazy=True).allocate(50)
+        self.assertEqual(len(set(identifiers)), 50)
+        self.assertEqual(IdentifierModel.objects.filter(
+            identifier__in=identifiers, identifier_type='simple_identifier').count(), 50)
+
+    def test_allocate_collision(self):
+        IdentifierModel.objects.create(
+            identifier='14AAAAA',
+            identifier_type='simple_identifier',
+            device_id=django_apps.get_app_config('edc_device').device_id)
+        ListSimpleIdentifier.identifiers = ['14AAAAA', '14BBBBB', '14CCCCC']
+
+        identifiers = ListUniqueIdentifier(lazy=True).allocate(2)
+        self.assertEqual(identifiers, ['14BBBBB', '14CCCCC'])
+        self.assertEqual(IdentifierModel.objects.filter(
+            identifier__in=['14AAAAA', '14BBBBB', '14CCCCC']).count(), 3)
+
+    def test_allocate_raises_other_integrity_error(self):
+        with mock.patch.object(
+                IdentifierModel.objects, 'bulk_create',
+                side_effect=IntegrityError('NOT NULL')) as bulk_create:
+            self.assertRaises(IntegrityError, SimpleUniqueIdentifier(lazy=True).allocate, 2)
+        self.assertEqual(bulk_create.call_count, 1)
+
+    def test_allocate_tries_bounded(self):
+        IdentifierModel.objects.create(
+            identifier='14AAAAA',
+            identifier_type='simple_identifier',
+            device_id=django_apps.get_app_config('edc_device').device_id)
+        ListSimpleIdentifier.identifiers = ['14AAAAA'] * 10
+
+        class MyIdentifier(ListUniqueIdentifier):
+            max_allocate_tries = 2
+
+            def make_identifiers(self, count, exclude=None):
+                return [self._get_new_identifier() for _ in range(0, count)]
+
+        self.assertRaises(DuplicateIdentifierError, MyIdentifier(lazy=True).allocate, 1)
+
+    def test_timestamp_identifier_unique_in_process(self):
+        obj = SimpleTimestampIdentifier(
+            template='{device_id}{timestamp}{random_string}', random_string_length=2)
+        identifiers = [obj.make_identifier() for _ in range(0, 2000)]
+        self.assertEqual(len(set(identifiers)), 2000)
+        self.assertEqual({len(identifier) for identifier in identifiers}, {2 + 14 + 2})
+        timestamps = [identifier[2:16] for identifier in identifiers]
+        self.assertEqual(timestamps, sorted(timestamps))
+
+    def test_timestamp_sequence_wraps(self):
+        timestamp_sequence = TimestampSequence(random_string_length=1)
+        generator = SimpleIdentifier().random_string_generator
+        values = [timestamp_sequence.next(generator) for _ in range(0, 27 * 3)]
+        self.assertEqual(len(set(values)), 27 * 3)
+        self.assertGreaterEqual(len({timestamp for timestamp, _ in values}), 3)
+
+    def test_timestamp_sequence_reset(self):
+        obj = SimpleTimestampIdentifier(
+            template='{device_id}{timestamp}{random_string}', random_string_length=2)
+        obj.make_identifier()
+        reset_timestamp_sequences()
+        self.assertIsNotNone(obj.make_identifier())
+
+
+class TestTrackingIdentifierManager(TestCase):
+
+    def test_bulk_create(self):
+        items = [TrackedItem(name=str(i)) for i in range(0, 20)]
+        items.append(TrackedItem(name='20', tracking_identifier='ABC-123'))
+        with CaptureQueriesContext(connection) as context:
+            TrackedItem.objects.bulk_create(items)
+        inserts = [q for q in context.captured_queries if q['sql'].startswith('INSERT')]
+        self.assertEqual(len(inserts), 2)
+        tracking_identifiers = TrackedItem.objects.values_list('tracking_identifier', flat=True)
+        self.assertEqual(len(set(tracking_identifiers)), 21)
+        self.assertIn('ABC-123', tracking_identifiers)
+        self.assertEqual(IdentifierModel.objects.filter(
+            identifier_type='edc_identifier.trackeditem').count(), 20)
+
+    def test_bulk_create_allocates_on_same_database(self):
+        with mock.patch.object(
+                TrackingIdentifier, 'allocate', autospec=True,
+                side_effect=TrackingIdentifier.allocate) as allocate:
+            TrackedItem.objects.db_manager('default').bulk_create([TrackedItem(name='1')])
+        self.assertEqual(allocate.call_args[1], dict(using='default'))
+
+    def test_bulk_create_requires_insert_first(self):
+
+        class MyTrackingIdentifier(TrackingIdentifier):
+            insert_first = False
+
+        with mock.patch.object(TrackedItem, 'tracking_identifier_cls', MyTrackingIdentifier):
+            self.assertRaises(
+                IdentifierError, TrackedItem.objects.bulk_create, [TrackedItem(name='1')])
+        self.assertEqual(TrackedItem.objects.count(), 0)
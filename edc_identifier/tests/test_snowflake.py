@@ -0,0 +1,89 @@
+import tempfile
+
+from unittest import mock
+
+from django.apps import apps as django_apps
+from django.test import TestCase
+
+from ..simple_identifier import SimpleSequentialIdentifier
+from ..snowflake import Snowflake, SnowflakeError, get_snowflake, reset_snowflakes
+
+
+class TestSnowflake(TestCase):
+
+    def setUp(self):
+        self.lock_dir = tempfile.TemporaryDirectory()
+        self.snowflakes = []
+
+    def tearDown(self):
+        for snowflake in self.snowflakes:
+            snowflake.release()
+        self.lock_dir.cleanup()
+
+    def get_snowflake(self, **kwargs):
+        snowflake = Snowflake(lock_dir=self.lock_dir.name, **kwargs)
+        self.snowflakes.append(snowflake)
+        return snowflake
+
+    def test_unique_and_increasing(self):
+        snowflake = self.get_snowflake(device_id=14)
+        values = [snowflake.next() for _ in range(0, 10000)]
+        self.assertEqual(len(set(values)), 10000)
+        self.assertEqual(values, sorted(values))
+
+    def test_layout(self):
+        snowflake = self.get_snowflake(device_id=14, worker_id=3)
+        value = snowflake.next()
+        self.assertEqual((value >> 15) & 127, 14)
+        self.assertEqual((value >> 10) & 31, 3)
+        self.assertLess(value, 2 ** 63)
+
+    def test_sequence_exhausted(self):
+        snowflake = self.get_snowflake(device_id=14, worker_id=0)
+        values = [snowflake.next() for _ in range(0, 1025)]
+        self.assertEqual(len(set(values)), 1025)
+        self.assertGreater(values[-1] >> 22, values[0] >> 22)
+
+    def test_worker_slots(self):
+        worker_ids = [self.get_snowflake(device_id=14).worker_id for _ in range(0, 32)]
+        self.assertEqual(sorted(worker_ids), list(range(0, 32)))
+        self.assertRaises(SnowflakeError, self.get_snowflake, device_id=14)
+        self.assertEqual(self.get_snowflake(device_id=15).worker_id, 0)
+        self.snowflakes[0].release()
+        self.assertEqual(self.get_snowflake(device_id=14).worker_id, 0)
+
+    def test_invalid_device_id(self):
+        self.assertRaises(SnowflakeError, Snowflake, device_id=128, worker_id=0)
+
+    def test_simple_sequential_identifier(self):
+
+        class MyIdentifier(SimpleSequentialIdentifier):
+            prefix = 'X'
+
+        identifiers = [MyIdentifier().identifier for _ in range(0, 100)]
+        self.assertEqual(len(set(identifiers)), 100)
+        for identifier in identifiers:
+            self.assertTrue(identifier.startswith('X'))
+            sequence = int(identifier[1:-1])
+            self.assertEqual(identifier[-1], '0123456789X'[sequence % 11])
+            self.assertEqual(len(identifier), 21)
+
+    def test_simple_sequential_identifier_checkdigit_10(self):
+        snowflake = mock.Mock()
+        snowflake.next.return_value = 21
+        with mock.patch('edc_identifier.simple_identifier.get_snowflake', return_value=snowflake):
+            self.assertEqual(
+                SimpleSequentialIdentifier().identifier, '0000000000000000021X')
+
+    def test_without_fcntl(self):
+        with mock.patch('edc_identifier.snowflake.fcntl', None):
+            self.assertRaises(SnowflakeError, self.get_snowflake, device_id=14)
+            self.assertEqual(self.get_snowflake(device_id=14, worker_id=3).worker_id, 3)
+
+    def test_get_snowflake_worker_id(self):
+        app_config = django_apps.get_app_config('edc_identifier')
+        reset_snowflakes()
+        self.addCleanup(reset_snowflakes)
+        with mock.patch.object(app_config, 'snowflake_worker_id', 7), \
+                mock.patch('edc_identifier.snowflake.fcntl', None):
+            self.assertEqual(get_snowflake().worker_id, 7)
@@ -171,3 +171,47 @@ class TestSubjectIdentifier(TestCase):
                 model='edc_identifier.enrollmentthree',
                 protocol_number='000',
                 device_id='99').count(), 5)
+
+    def test_bulk_allocate(self):
+        """Asserts bulk allocated identifiers are in allocation
+        order and match those of single allocation.
+        """
+        identifiers = SubjectIdentifier.bulk_allocate(
+            3,
+            identifier_type='subject',
+            requesting_model='edc_identifier.enrollment',
+            protocol_number='000',
+            device_id='99')
+        self.assertEqual(
+            identifiers, ['000-40990001-6', '000-40990002-4', '000-40990003-2'])
+        subject_identifier = SubjectIdentifier(
+            identifier_type='subject',
+            requesting_model='edc_identifier.enrollment',
+            protocol_number='000',
+            device_id='99')
+        self.assertEqual(subject_identifier.identifier[8:12], '0004')
+
+    def test_bulk_allocate_updates_identifier_model(self):
+        identifiers = SubjectIdentifier.bulk_allocate(
+            5,
+            identifier_type='subject',
+            requesting_model='edc_identifier.enrollment',
+            protocol_number='000',
+            device_id='99')
+        self.assertEqual(
+            list(IdentifierModel.objects.filter(
+                identifier_type='subject',
+                model='edc_identifier.enrollment').order_by(
+                    'sequence_number').values_list('identifier', flat=True)),
+            identifiers)
+
+    def test_bulk_allocate_creates_registered_subject(self):
+        identifiers = SubjectIdentifier.bulk_allocate(
+            5,
+            identifier_type='subject',
+            requesting_model='edc_identifier.enrollment',
+            protocol_number='000',
+            device_id='99')
+        model = django_apps.get_app_config('edc_registration').model
+        self.assertEqual(
+            model.objects.filter(subject_identifier__in=identifiers).count(), 5)
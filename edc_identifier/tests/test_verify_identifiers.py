@@ -0,0 +1,73 @@
+import json
+
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from io import StringIO
+from multiprocessing import get_context
+from unittest import mock
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase
+
+from ..checkdigit_mixins import DammMixin
+from ..management.commands.verify_identifiers import get_registry, verify_chunk
+from ..models import IdentifierModel
+from ..subject_identifier import SubjectIdentifier
+
+
+class TestVerifyIdentifiers(TestCase):
+
+    def setUp(self):
+        self.identifiers = [
+            SubjectIdentifier(
+                identifier_type='subject',
+                requesting_model='edc_identifier.enrollment').identifier
+            for _ in range(0, 5)]
+        obj = IdentifierModel.objects.get(identifier=self.identifiers[2])
+        check_digit = (int(obj.identifier[-1]) + 1) % 10
+        obj.identifier = f'{obj.identifier[:-1]}{check_digit}'
+        obj.save()
+        self.invalid = obj
+
+    def verify(self, *args):
+        out = StringIO()
+        err = StringIO()
+        call_command('verify_identifiers', *args, stdout=out, stderr=err)
+        return [json.loads(line) for line in out.getvalue().splitlines()], err.getvalue()
+
+    def test_registry(self):
+        self.assertIn('subjectidentifier', get_registry())
+
+    def test_verify(self):
+        rows, message = self.verify('--chunk-size', '2')
+        self.assertEqual([row['identifier'] for row in rows], [self.invalid.identifier])
+        self.assertEqual(rows[0]['id'], str(self.invalid.pk))
+        self.assertIn('Verified 5 identifiers', message)
+        self.assertIn('1 invalid', message)
+
+    def test_verify_with_workers(self):
+        rows, message = self.verify('--chunk-size', '1', '--workers', '2')
+        self.assertEqual([row['identifier'] for row in rows], [self.invalid.identifier])
+        self.assertIn('Verified 5 identifiers', message)
+
+    def test_verify_with_spawned_workers(self):
+        executor_cls = partial(ProcessPoolExecutor, mp_context=get_context('spawn'))
+        with mock.patch(
+                'edc_identifier.management.commands.verify_identifiers.ProcessPoolExecutor',
+                executor_cls):
+            rows, message = self.verify('--chunk-size', '2', '--workers', '2')
+        self.assertEqual([row['identifier'] for row in rows], [self.invalid.identifier])
+
+    def test_verify_chunk_malformed(self):
+        registry = {'dammidentifier': (DammMixin(), '-')}
+        rows = [(1, 'dammidentifier', 'subject', ''),
+                (2, 'dammidentifier', 'subject', None),
+                (3, 'dammidentifier', 'subject', 'BAD'),
+                (4, 'dammidentifier', 'subject', '572-4')]
+        self.assertEqual(verify_chunk(registry, rows), rows[:3])
+
+    def test_unknown_label(self):
+        self.assertRaises(
+            CommandError, call_command, 'verify_identifiers',
+            '--label', 'blah', stdout=StringIO(), stderr=StringIO())
@@ -0,0 +1,111 @@
+import os
+import threading
+
+from datetime import timedelta
+from django.utils import timezone
+
+from .random_string import ALPHABET
+
+
+class TimestampSequence:
+
+    """Returns (timestamp, random string) pairs that do not repeat in
+    this process, ULID style.
+
+    The timestamp is `%y%m%d%H%M%S%f` truncated to 14 characters
+    (1/100 s). The first random string in a timestamp is drawn at
+    random. The next, in the same timestamp, follows it in base
+    len(ALPHABET) and wraps around. Once every random string of the
+    timestamp has been used, the timestamp is moved on by 1/100 s.
+    The timestamp never goes back, even if the clock does.
+
+    Use the shared instance per length, see `get_timestamp_sequence`.
+    """
+
+    timestamp_format = '%y%m%d%H%M%S%f'
+    timestamp_length = 14
+    tick = timedelta(microseconds=10000)
+
+    def __init__(self, random_string_length=None):
+        self.random_string_length = random_string_length
+        self.size = len(ALPHABET) ** random_string_length
+        self.lock = threading.Lock()
+        self.reset()
+
+    def __repr__(self):
+        return f'{self.__class__.__name__}(random_string_length={self.random_string_length})'
+
+    def reset(self):
+        self.time = None
+        self.timestamp = None
+        self.value = None
+        self.first = None
+
+    def next(self, random_string_generator):
+        """Returns the next (timestamp, random string).
+
+        The first random string in a timestamp is drawn from
+        random_string_generator.
+        """
+        now = timezone.localtime()
+        timestamp = self.format(now)
+        with self.lock:
+            if self.timestamp is None or timestamp > self.timestamp:
+                self.time, self.timestamp = now, timestamp
+                self.value = self.first = self.decode(
+                    random_string_generator.get_random_string(self.random_string_length))
+            else:
+                self.value = (self.value + 1) % self.size
+                if self.value == self.first:
+                    self.time += self.tick
+                    self.timestamp = self.format(self.time)
+                    self.value = self.first = self.decode(
+                        random_string_generator.get_random_string(self.random_string_length))
+            return self.timestamp, self.encode(self.value)
+
+    def format(self, value):
+        return value.strftime(self.timestamp_format)[:self.timestamp_length]
+
+    def encode(self, value):
+        chars = []
+        for _ in range(0, self.random_string_length):
+            value, remainder = divmod(value, len(ALPHABET))
+            chars.append(ALPHABET[remainder])
+        return ''.join(reversed(chars))
+
+    def decode(self, random_string):
+        value = 0
+        for char in random_string:
+            value = value * len(ALPHABET) + ALPHABET.index(char)
+        return value
+
+
+timestamp_sequences = {}
+timestamp_sequences_lock = threading.Lock()
+
+
+def get_timestamp_sequence(random_string_length):
+    """Returns the shared TimestampSequence for this random string
+    length.
+    """
+    timestamp_sequence = timestamp_sequences.get(random_string_length)
+    if not timestamp_sequence:
+        with timestamp_sequences_lock:
+            timestamp_sequence = timestamp_sequences.setdefault(
+                random_string_length, TimestampSequence(random_string_length))
+    return timestamp_sequence
+
+
+def reset_timestamp_sequences():
+    """Resets each shared sequence.
+
+    Called in a forked child so it does not continue the sequence of
+    its parent.
+    """
+    for timestamp_sequence in list(timestamp_sequences.values()):
+        timestamp_sequence.lock = threading.Lock()
+        timestamp_sequence.reset()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=reset_timestamp_sequences)
@@ -21,6 +21,7 @@ setup(
     description='Manage identifiers in the Edc',
     long_description=README,
     zip_safe=False,
+    extras_require={'numpy': ['numpy']},
     keywords='django base classes for identifiers',
     classifiers=[
         'Environment :: Web Environment',